@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import connection
+
+# Histogram bucket upper bounds in milliseconds (last bucket catches everything slower)
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf')]
+
+
+class QueryRecorder:
+    """execute_wrapper that counts queries and keeps the slowest statements; safe to share across threads"""
+    def __init__(self, keep_slowest=5):
+        self.keep_slowest = keep_slowest
+        self.lock = threading.Lock()
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.count += 1
+                self.total_seconds += elapsed
+                self.slowest.append((elapsed, sql))
+                if len(self.slowest) > self.keep_slowest:
+                    self.slowest.sort(key=lambda item: item[0], reverse=True)
+                    self.slowest.pop()
+
+
+class RequestStats:
+    """Rolling in-memory window of request timings per URL name (per process)"""
+    def __init__(self, window=500):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+        self.slowest = {}
+
+    def record(self, url_name, view_ms, query_count, db_ms, slowest):
+        with self.lock:
+            self.samples[url_name].append((view_ms, query_count, db_ms))
+            self.slowest[url_name] = slowest
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.slowest.clear()
+
+    def summary(self):
+        """Per-URL percentiles, averages and latency histogram for the current window"""
+        with self.lock:
+            snapshot = {name: list(samples) for name, samples in self.samples.items()}
+            slowest = dict(self.slowest)
+
+        rows = []
+        for url_name, samples in sorted(snapshot.items()):
+            timings = sorted(sample[0] for sample in samples)
+            histogram = [0] * len(LATENCY_BUCKETS_MS)
+            for view_ms in timings:
+                for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                    if view_ms <= bound:
+                        histogram[i] += 1
+                        break
+
+            rows.append({
+                'url_name': url_name,
+                'requests': len(samples),
+                'p50_ms': timings[len(timings) // 2],
+                'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+                'max_ms': timings[-1],
+                'avg_queries': sum(sample[1] for sample in samples) / len(samples),
+                'avg_db_ms': sum(sample[2] for sample in samples) / len(samples),
+                'histogram': histogram,
+                'slowest': slowest.get(url_name, []),
+            })
+        return rows
+
+
+request_stats = RequestStats(window=getattr(settings, 'QUERY_INSTRUMENTATION_WINDOW', 500))
+
+
+class QueryInstrumentationMiddleware:
+    """Opt-in per-request SQL/latency instrumentation (enable with QUERY_INSTRUMENTATION=True)"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        # Views that query on worker threads (run_in_worker) install this recorder on those connections too
+        request.query_recorder = recorder
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        if settings.DEBUG:
+            # For a streamed response these only cover what ran before the first byte
+            response['X-DB-Query-Count'] = str(recorder.count)
+            response['X-DB-Time-Ms'] = f"{recorder.total_seconds * 1000:.1f}"
+            response['X-View-Time-Ms'] = f"{(time.perf_counter() - started) * 1000:.1f}"
+
+        if response.streaming:
+            # Streamed parts still query after the view returns - record once the last chunk is out
+            response.streaming_content = self.record_when_done(response, request, recorder, started)
+        else:
+            self.record(request, recorder, started)
+        return response
+
+    def record(self, request, recorder, started):
+        view_ms = (time.perf_counter() - started) * 1000
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.view_name if match else None) or request.path
+        slowest = [
+            {'ms': round(elapsed * 1000, 2), 'sql': sql}
+            for elapsed, sql in sorted(recorder.slowest, key=lambda item: item[0], reverse=True)
+        ]
+        request_stats.record(url_name, view_ms, recorder.count, recorder.total_seconds * 1000, slowest)
+
+    def record_when_done(self, response, request, recorder, started):
+        content = response.streaming_content
+        if response.is_async:
+            async def chunks():
+                try:
+                    async for chunk in content:
+                        yield chunk
+                finally:
+                    self.record(request, recorder, started)
+        else:
+            def chunks():
+                try:
+                    yield from content
+                finally:
+                    self.record(request, recorder, started)
+        return chunks()
@@ -6,6 +6,11 @@ app_name = 'analytics'
 urlpatterns = [
     path('', views.AnalyticsDashboardView.as_view(), name='dashboard'),
     path('games/', views.GameStatsView.as_view(), name='games'),
+    path('partners/', views.PlayPartnersView.as_view(), name='partners'),
+    path('heatmap/', views.ActivityHeatmapView.as_view(), name='heatmap'),
     path('voice/', views.VoiceStatsView.as_view(), name='voice'),
+    path('voice/channels/<int:channel_id>/', views.VoiceChannelView.as_view(), name='voice_channel'),
     path('messages/', views.MessageStatsView.as_view(), name='messages'),
+    path('performance/', views.PerformanceView.as_view(), name='performance'),
+    path('export/<slug:name>/', views.ExportView.as_view(), name='export'),
 ]
@@ -1,7 +1,18 @@
-from django.shortcuts import render
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views import View
-from django.db.models import Count
-from tracker.models import DiscordUser, GameSession, VoiceSession, Message, GameStatistic, UserStatistic, ActivityEvent
+from django.db.models import Count, F, Max, Q
+from tracker.models import DiscordUser, GameSession, VoiceSession, Message, GameStatistic, UserStatistic, UserGameStatistic, GameConcurrency, PlayPartner, Channel, UserWeeklyActivity, ServerWeeklyActivity
+from tracker.exports import EXPORTS, EXPORT_FORMATS, parse_export_filters, parse_moment
+from tracker.distributions import SESSION_LENGTH_BINS
+from tracker.occupancy import hourly_occupancy, occupants
+from .instrumentation import request_stats, LATENCY_BUCKETS_MS
 
 class AnalyticsDashboardView(View):
     def get(self, request):
@@ -13,20 +24,193 @@ class AnalyticsDashboardView(View):
         }
         return render(request, 'analytics/dashboard.html', context)
 
+def duration_label(seconds):
+    return f"{seconds / 3600:g}h" if seconds >= 3600 else f"{seconds / 60:g}m"
+
+# Histogram bin labels, e.g. "≤30m", ">8h"
+SESSION_LENGTH_LABELS = [f"≤{duration_label(bound)}" for bound in SESSION_LENGTH_BINS[:-1]] + [f">{duration_label(SESSION_LENGTH_BINS[-2])}"]
+
 class GameStatsView(View):
     def get(self, request):
-        games = GameStatistic.objects.order_by('-total_seconds')
-        context = {'games': games}
+        games = GameStatistic.objects.select_related('game', 'game__session_lengths').order_by('-total_seconds')
+        players = dict(UserGameStatistic.objects.values('game_id').annotate(players=Count('user_id')).values_list('game_id', 'players'))
+        # Concurrency comes precomputed per day, so this is two small reads rather than a sweep
+        peaks = dict(GameConcurrency.objects.values('game_id').annotate(peak=Max('peak_players')).values_list('game_id', 'peak'))
+        curve_day = GameConcurrency.objects.aggregate(day=Max('day'))['day']
+        curves = dict(GameConcurrency.objects.filter(day=curve_day).values_list('game_id', 'hourly_peaks'))
+
+        game_stats = []
+        for stat in games:
+            curve = curves.get(stat.game_id)
+            top = max(curve or [0])
+            # Estimates are stored by aggregation, so reading them costs nothing extra
+            lengths = getattr(stat.game, 'session_lengths', None)
+            histogram = lengths.histogram if lengths else []
+            game_stats.append({
+                'name': stat.game.name,
+                'hours': stat.total_seconds // 3600,
+                'sessions': stat.total_sessions,
+                'players': players.get(stat.game_id, 0),
+                'avg_session': round(stat.total_seconds / stat.total_sessions / 3600, 1) if stat.total_sessions else 0,
+                'peak_players': peaks.get(stat.game_id, 0),
+                'curve': [(hour, online, 100 * online // top if top else 0) for hour, online in enumerate(curve or [])],
+                'median_session': round(lengths.median_seconds / 3600, 1) if lengths else None,
+                'p90_session': round(lengths.p90_seconds / 3600, 1) if lengths else None,
+                'lengths': [
+                    (label, count, 100 * count // max(histogram))
+                    for label, count in zip(SESSION_LENGTH_LABELS, histogram)
+                ] if any(histogram) else [],
+            })
+        context = {'game_stats': game_stats, 'curve_day': curve_day}
         return render(request, 'analytics/games.html', context)
 
+class PlayPartnersView(View):
+    """Pairs who spend the most time in the same game or voice channel - ?user=<discord id> narrows to one member"""
+    def get(self, request):
+        pairs = PlayPartner.objects.select_related('user_a', 'user_b').annotate(
+            total_seconds=F('game_seconds') + F('voice_seconds')
+        ).order_by('-total_seconds')
+
+        member = None
+        discord_id = request.GET.get('user')
+        if discord_id:
+            if not discord_id.isdigit():
+                return HttpResponseBadRequest(f"Invalid Discord user id: {discord_id}")
+            member = get_object_or_404(DiscordUser, discord_id=discord_id)
+            pairs = pairs.filter(Q(user_a=member) | Q(user_b=member))
+
+        partners = [
+            {
+                'members': [user for user in (pair.user_a, pair.user_b) if user != member],
+                'game_hours': round(pair.game_seconds / 3600, 1),
+                'voice_hours': round(pair.voice_seconds / 3600, 1),
+            }
+            for pair in pairs[:25]
+        ]
+        context = {'member': member, 'partners': partners}
+        return render(request, 'analytics/partners.html', context)
+
+HEATMAP_METRICS = {
+    # metric: (column, divisor, unit)
+    'gaming': ('gaming_seconds', 3600, 'h'),
+    'voice': ('voice_seconds', 3600, 'h'),
+    'messages': ('messages', 1, ' messages'),
+}
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+class ActivityHeatmapView(View):
+    """Weekday x hour heatmap (UTC) read from 168 precomputed cells - ?metric=gaming|voice|messages, ?user=<discord id>"""
+    def get(self, request):
+        metric = request.GET.get('metric', 'gaming')
+        if metric not in HEATMAP_METRICS:
+            return HttpResponseBadRequest(f"Unknown metric: {metric}")
+        column, divisor, unit = HEATMAP_METRICS[metric]
+
+        member = None
+        discord_id = request.GET.get('user')
+        if discord_id:
+            if not discord_id.isdigit():
+                return HttpResponseBadRequest(f"Invalid Discord user id: {discord_id}")
+            member = get_object_or_404(DiscordUser, discord_id=discord_id)
+            cells = UserWeeklyActivity.objects.filter(user=member)
+        else:
+            cells = ServerWeeklyActivity.objects.all()
+
+        values = {(weekday, hour): value for weekday, hour, value in cells.values_list('weekday', 'hour', column)}
+        busiest = max(values.values(), default=0)
+        heatmap = []
+        for weekday, name in enumerate(WEEKDAYS):
+            hours = []
+            for hour in range(24):
+                value = values.get((weekday, hour), 0)
+                hours.append((hour, round(value / divisor, 1) if divisor > 1 else value, value / busiest if busiest else 0))
+            heatmap.append((name, hours))
+        context = {
+            'member': member,
+            'metric': metric,
+            'metrics': list(HEATMAP_METRICS),
+            'unit': unit,
+            'heatmap': heatmap,
+        }
+        return render(request, 'analytics/heatmap.html', context)
+
 class VoiceStatsView(View):
     def get(self, request):
         top_voice = UserStatistic.objects.order_by('-total_voice_seconds')[:10]
-        context = {'top_voice': top_voice}
+        context = {'top_voice': top_voice, 'channels': Channel.objects.filter(voicespan__isnull=False).distinct().order_by('name')}
         return render(request, 'analytics/voice.html', context)
 
+class VoiceChannelView(View):
+    """Occupancy from the voice archive - ?at=<datetime> lists who was there, ?since=&until= (UTC days, default the last 14) bound the heatmap"""
+    MAX_DAYS = 366
+
+    def get(self, request, channel_id):
+        channel = get_object_or_404(Channel, pk=channel_id)
+        today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        try:
+            since = parse_moment(request.GET['since']) if request.GET.get('since') else today - timedelta(days=13)
+            until = parse_moment(request.GET['until'], end_of_day=True) if request.GET.get('until') else today + timedelta(days=1)
+            at = parse_moment(request.GET['at']) if request.GET.get('at') else None
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+
+        # Heatmap rows are whole days
+        since = since.replace(hour=0, minute=0, second=0, microsecond=0)
+        if until != until.replace(hour=0, minute=0, second=0, microsecond=0):
+            until = until.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        if not timedelta(0) < until - since <= timedelta(days=self.MAX_DAYS):
+            return HttpResponseBadRequest(f"The date range must cover 1 to {self.MAX_DAYS} days")
+
+        days = hourly_occupancy(channel.id, since, until)
+        busiest = max((value for _, hours in days for value in hours), default=0)
+        heatmap = [
+            (day, [(hour, value, value / busiest if busiest else 0) for hour, value in enumerate(hours)])
+            for day, hours in days
+        ]
+        context = {
+            'channel': channel,
+            'since': since,
+            'until': until - timedelta(days=1),
+            'heatmap': heatmap,
+            'busiest': busiest,
+            'at': at,
+            'occupants': occupants(channel.id, at) if at else None,
+        }
+        return render(request, 'analytics/voice_channel.html', context)
+
 class MessageStatsView(View):
     def get(self, request):
         top_messages = Message.objects.values('user__username').annotate(count=Count('id')).order_by('-count')[:10]
         context = {'messages': top_messages}
         return render(request, 'analytics/messages.html', context)
+
+@method_decorator(staff_member_required, name='dispatch')
+class PerformanceView(View):
+    def get(self, request):
+        context = {
+            'enabled': settings.QUERY_INSTRUMENTATION,
+            'window': request_stats.window,
+            'buckets': [f"≤{int(b)}ms" for b in LATENCY_BUCKETS_MS[:-1]] + [f">{int(LATENCY_BUCKETS_MS[-2])}ms"],
+            'rows': request_stats.summary(),
+        }
+        return render(request, 'analytics/performance.html', context)
+
+@method_decorator(staff_member_required, name='dispatch')
+class ExportView(View):
+    """Stream one export as CSV or NDJSON, e.g. /analytics/export/game_sessions/?format=ndjson&since=2024-01-01&game=Valheim"""
+    def get(self, request, name):
+        export = EXPORTS.get(name)
+        if export is None:
+            raise Http404
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(f"Unknown format: {export_format}")
+        try:
+            filters = parse_export_filters(*(request.GET.get(key) for key in ('since', 'until', 'user', 'game')))
+            queryset = export.queryset(**filters)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+
+        response = StreamingHttpResponse(export.stream(queryset, export_format), content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="{name}.{export_format}"'
+        return response
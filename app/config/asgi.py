@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Under ASGI the home page runs its widget queries concurrently (see home.views.AsyncHomeView)
+os.environ.setdefault('HOME_ASYNC', 'True')
 
 application = get_asgi_application()
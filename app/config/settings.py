@@ -15,6 +15,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'home',
     'analytics',
     'tracker',
@@ -30,6 +31,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Opt-in per-request query/latency instrumentation (see /analytics/performance/)
+QUERY_INSTRUMENTATION = os.getenv('QUERY_INSTRUMENTATION', 'False') == 'True'
+QUERY_INSTRUMENTATION_WINDOW = int(os.getenv('QUERY_INSTRUMENTATION_WINDOW', '500'))
+if QUERY_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, 'analytics.instrumentation.QueryInstrumentationMiddleware')
+
+# Serve the home page from AsyncHomeView (set by config/asgi.py; only useful under an ASGI server)
+HOME_ASYNC = os.getenv('HOME_ASYNC', 'False') == 'True'
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -0,0 +1,125 @@
+from django.db import connection
+from tracker.models import ActivitySession, AMPServer, Game, GameStatistic, UserStatistic, DiscordUser
+from tracker.pending import COUNTED_CUTOFF_SQL, UNCOUNTED_SECONDS_SQL
+
+
+# Home page widget queries. Each function is independent and uses its own cursor, so
+# widgets can be rendered on separate threads/connections at the same time. Live totals add
+# only session time and messages the cumulative statistics don't include yet.
+
+def servers():
+    return list(AMPServer.objects.filter(
+        module='GenericModule',
+        running=True,
+        cover_image__isnull=False
+    ).order_by('display_order'))
+
+
+def total_users():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM tracker_activitysession WHERE ended_at IS NULL AND kind = %s", [ActivitySession.GAME])
+        active_players = cursor.fetchone()[0] or 0
+    return UserStatistic.objects.count() + active_players
+
+
+def total_gaming_hours():
+    """Cumulative + both ended AND active sessions"""
+    cumulative_gaming = sum(s.total_gaming_seconds for s in UserStatistic.objects.all()) // 3600
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT COALESCE(SUM({UNCOUNTED_SECONDS_SQL}), 0)
+            FROM tracker_activitysession
+            WHERE kind = %s
+        """, [ActivitySession.GAME])
+        realtime_gaming = cursor.fetchone()[0] // 3600
+    return cumulative_gaming + realtime_gaming
+
+
+def total_voice_hours():
+    """Cumulative + both ended AND active sessions"""
+    cumulative_voice = sum(s.total_voice_seconds for s in UserStatistic.objects.all()) // 3600
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT COALESCE(SUM({UNCOUNTED_SECONDS_SQL}), 0)
+            FROM tracker_voicesession
+        """)
+        realtime_voice = cursor.fetchone()[0] // 3600
+    return cumulative_voice + realtime_voice
+
+
+def total_messages():
+    """Cumulative + real-time"""
+    cumulative_messages = sum(s.total_messages for s in UserStatistic.objects.all())
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM tracker_message WHERE created_at > {COUNTED_CUTOFF_SQL}")
+        realtime_messages = cursor.fetchone()[0] or 0
+    return cumulative_messages + realtime_messages
+
+
+def top_users(totals, limit=5):
+    """[(username, value)] for the largest totals, fetching only those users' names"""
+    top = sorted(totals.items(), key=lambda x: x[1], reverse=True)[:limit]
+    users = DiscordUser.objects.in_bulk([user_id for user_id, _ in top])
+    return [(users[user_id].username, value) for user_id, value in top if user_id in users]
+
+
+def top_gamers():
+    """Include active sessions with live duration calculation"""
+    user_gaming = dict(UserStatistic.objects.values_list('user_id', 'total_gaming_seconds'))
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT user_id,
+                   SUM({UNCOUNTED_SECONDS_SQL})::bigint
+            FROM tracker_activitysession
+            WHERE kind = %s
+            GROUP BY user_id
+        """, [ActivitySession.GAME])
+        for user_id, seconds in cursor.fetchall():
+            user_gaming[user_id] = user_gaming.get(user_id, 0) + seconds
+
+    return [{'user': {'username': name}, 'hours': int(seconds // 3600)} for name, seconds in top_users(user_gaming)]
+
+
+def top_games():
+    """Include active + ended"""
+    game_seconds = dict(GameStatistic.objects.values_list('game_id', 'total_seconds'))
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT game_id,
+                   SUM({UNCOUNTED_SECONDS_SQL})::bigint
+            FROM tracker_activitysession
+            WHERE kind = %s
+            GROUP BY game_id
+        """, [ActivitySession.GAME])
+        for game_id, seconds in cursor.fetchall():
+            game_seconds[game_id] = game_seconds.get(game_id, 0) + seconds
+
+    top = sorted(game_seconds.items(), key=lambda x: x[1], reverse=True)[:5]
+    games_by_id = Game.objects.in_bulk([game_id for game_id, _ in top])
+    return [(games_by_id[game_id].name, int(seconds // 3600)) for game_id, seconds in top]
+
+
+def top_voice():
+    """Include active + ended"""
+    user_voice = dict(UserStatistic.objects.values_list('user_id', 'total_voice_seconds'))
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT user_id,
+                   SUM({UNCOUNTED_SECONDS_SQL})::bigint
+            FROM tracker_voicesession
+            GROUP BY user_id
+        """)
+        for user_id, seconds in cursor.fetchall():
+            user_voice[user_id] = user_voice.get(user_id, 0) + seconds
+
+    return [{'user': {'username': name}, 'hours': int(seconds // 3600)} for name, seconds in top_users(user_voice)]
+
+
+def top_chatters():
+    user_messages = dict(UserStatistic.objects.values_list('user_id', 'total_messages'))
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT user_id, COUNT(*) FROM tracker_message WHERE created_at > {COUNTED_CUTOFF_SQL} GROUP BY user_id")
+        for user_id, count in cursor.fetchall():
+            user_messages[user_id] = user_messages.get(user_id, 0) + count
+
+    return [{'user': {'username': name}, 'messages': int(count)} for name, count in top_users(user_messages)]
@@ -1,8 +1,12 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import path, re_path
 from . import views
 
 app_name = 'home'
 
 urlpatterns = [
-    path('', views.HomeView.as_view(), name='index'),
+    path('', (views.AsyncHomeView if settings.HOME_ASYNC else views.HomeView).as_view(), name='index'),
+    path('u/<int:discord_id>/', views.UserProfileView.as_view(), name='profile'),
+    path('widgets/<slug:name>/', views.WidgetView.as_view(), name='widget'),
+    re_path(r'^covers/(?P<filename>[\w-]+\.(?:webp|jpg))$', views.CoverView.as_view(), name='cover'),
 ]
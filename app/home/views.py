@@ -1,154 +1,144 @@
-from django.shortcuts import render
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import render, get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
 from django.views import View
-from django.db import connection
-from django.utils import timezone
-from tracker.models import AMPServer, GameStatistic, UserStatistic, DiscordUser
+from django.db import close_old_connections, connection
+from django.views.static import serve
+from tracker.covers import COVERS_DIR
+from tracker.models import DiscordUser, UserGameStatistic, UserHourlyActivity
+from . import queries
+from .widgets import HOME_WIDGETS
+
+logger = logging.getLogger(__name__)
+
 
 class HomeView(View):
+    """Shell page - servers plus whichever widgets are already cached; the rest are fetched lazily"""
     def get(self, request):
-        servers = AMPServer.objects.filter(
-            module='GenericModule',
-            running=True,
-            cover_image__isnull=False
-        ).order_by('display_order')
-        
-        cursor = connection.cursor()
-        now = timezone.now()
-        
-        # Total unique players
-        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM tracker_gamesession WHERE ended_at IS NULL")
-        active_players = cursor.fetchone()[0] or 0
-        total_users = UserStatistic.objects.count() + active_players
-        
-        # Total gaming hours (cumulative + both ended AND active sessions)
-        cumulative_gaming = sum(s.total_gaming_seconds for s in UserStatistic.objects.all()) // 3600
-        cursor.execute("""
-            SELECT COALESCE(SUM(duration_seconds), 0) + 
-                   COALESCE(SUM(EXTRACT(EPOCH FROM (NOW() - started_at))), 0)
-            FROM tracker_gamesession 
-            WHERE ended_at IS NOT NULL OR ended_at IS NULL
-        """)
-        realtime_gaming = cursor.fetchone()[0] // 3600
-        total_gaming_hours = cumulative_gaming + realtime_gaming
-        
-        # Total voice hours (cumulative + both ended AND active)
-        cumulative_voice = sum(s.total_voice_seconds for s in UserStatistic.objects.all()) // 3600
-        cursor.execute("""
-            SELECT COALESCE(SUM(duration_seconds), 0) + 
-                   COALESCE(SUM(EXTRACT(EPOCH FROM (NOW() - started_at))), 0)
-            FROM tracker_voicesession 
-            WHERE ended_at IS NOT NULL OR ended_at IS NULL
-        """)
-        realtime_voice = cursor.fetchone()[0] // 3600
-        total_voice_hours = cumulative_voice + realtime_voice
-        
-        # Total messages (cumulative + real-time)
-        cumulative_messages = sum(s.total_messages for s in UserStatistic.objects.all())
-        cursor.execute("SELECT COUNT(*) FROM tracker_message")
-        realtime_messages = cursor.fetchone()[0] or 0
-        total_messages = cumulative_messages + realtime_messages
-        
-        # Top gamers (include active sessions with live duration calculation)
-        user_gaming = {}
-        for stat in UserStatistic.objects.select_related('user'):
-            user_gaming[stat.user.id] = stat.total_gaming_seconds
-        
-        cursor.execute("""
-            SELECT user_id, 
-                   COALESCE(SUM(duration_seconds), 0) + 
-                   COALESCE(SUM(CASE WHEN ended_at IS NULL THEN EXTRACT(EPOCH FROM (NOW() - started_at))::int ELSE 0 END), 0)
-            FROM tracker_gamesession 
-            GROUP BY user_id
-        """)
-        for user_id, seconds in cursor.fetchall():
-            user_gaming[user_id] = user_gaming.get(user_id, 0) + seconds
-        
-        top_gamers_dict = {}
-        for user_id, seconds in user_gaming.items():
-            try:
-                user = DiscordUser.objects.get(id=user_id)
-                top_gamers_dict[user.username] = seconds
-            except:
-                pass
-        
-        top_gamers = sorted(top_gamers_dict.items(), key=lambda x: x[1], reverse=True)[:5]
-        top_gamers = [{'user': {'username': name}, 'hours': int(seconds // 3600)} for name, seconds in top_gamers]
-        
-        # Most played games (include active + ended)
-        game_seconds = {}
-        for stat in GameStatistic.objects.all():
-            game_seconds[stat.game_name] = stat.total_seconds
-        
-        cursor.execute("""
-            SELECT game_name, 
-                   COALESCE(SUM(duration_seconds), 0) + 
-                   COALESCE(SUM(CASE WHEN ended_at IS NULL THEN EXTRACT(EPOCH FROM (NOW() - started_at))::int ELSE 0 END), 0)
-            FROM tracker_gamesession 
-            GROUP BY game_name
-        """)
-        for game_name, seconds in cursor.fetchall():
-            game_seconds[game_name] = game_seconds.get(game_name, 0) + seconds
-        
-        top_games = sorted(game_seconds.items(), key=lambda x: x[1], reverse=True)[:5]
-        top_games = [(name, int(seconds // 3600)) for name, seconds in top_games]
-        
-        # Top voice users (include active + ended)
-        user_voice = {}
-        for stat in UserStatistic.objects.select_related('user'):
-            user_voice[stat.user.id] = stat.total_voice_seconds
-        
-        cursor.execute("""
-            SELECT user_id, 
-                   COALESCE(SUM(duration_seconds), 0) + 
-                   COALESCE(SUM(CASE WHEN ended_at IS NULL THEN EXTRACT(EPOCH FROM (NOW() - started_at))::int ELSE 0 END), 0)
-            FROM tracker_voicesession 
-            GROUP BY user_id
-        """)
-        for user_id, seconds in cursor.fetchall():
-            user_voice[user_id] = user_voice.get(user_id, 0) + seconds
-        
-        top_voice_dict = {}
-        for user_id, seconds in user_voice.items():
-            try:
-                user = DiscordUser.objects.get(id=user_id)
-                top_voice_dict[user.username] = seconds
-            except:
-                pass
-        
-        top_voice = sorted(top_voice_dict.items(), key=lambda x: x[1], reverse=True)[:5]
-        top_voice = [{'user': {'username': name}, 'hours': int(seconds // 3600)} for name, seconds in top_voice]
-        
-        # Top chatters
-        user_messages = {}
-        for stat in UserStatistic.objects.select_related('user'):
-            user_messages[stat.user.id] = stat.total_messages
-        
-        cursor.execute("SELECT user_id, COUNT(*) FROM tracker_message GROUP BY user_id")
-        for user_id, count in cursor.fetchall():
-            user_messages[user_id] = user_messages.get(user_id, 0) + count
-        
-        top_chatters_dict = {}
-        for user_id, count in user_messages.items():
+        return render(request, 'home/index.html', self.shell_context())
+
+    @staticmethod
+    def shell_context():
+        return {
+            'servers': queries.servers(),
+            'widgets': {name: widget.cached() for name, widget in HOME_WIDGETS.items()},
+        }
+
+
+def run_in_worker(func, recorder=None):
+    """
+    Run a DB-touching callable on a worker thread, honouring CONN_MAX_AGE for that thread's connection.
+
+    recorder is the request's QueryRecorder (set by the instrumentation middleware), so queries
+    on the worker's connection are counted with the rest of the request.
+    """
+    close_old_connections()
+    try:
+        if recorder is None:
+            return func()
+        with connection.execute_wrapper(recorder):
+            return func()
+    finally:
+        close_old_connections()
+
+
+class AsyncHomeView(View):
+    """Home page for the ASGI entry point - sends the shell at once, then streams each uncached widget as it finishes"""
+    async def get(self, request):
+        recorder = getattr(request, 'query_recorder', None)
+        context = await sync_to_async(run_in_worker, thread_sensitive=False)(HomeView.shell_context, recorder)
+        context['streaming'] = True
+        head, tail = render_to_string('home/index.html', context, request).split('<!-- widget-stream -->')
+        pending = [widget for name, widget in HOME_WIDGETS.items() if context['widgets'][name] is None]
+        return StreamingHttpResponse(self.stream(head, tail, pending, recorder), content_type='text/html; charset=utf-8')
+
+    async def stream(self, head, tail, pending, recorder=None):
+        yield head
+
+        async def render_widget(widget):
+            return widget, await sync_to_async(run_in_worker, thread_sensitive=False)(widget.render, recorder)
+
+        # Widgets run concurrently and are sent in completion order; a failed one is left for the lazy fetch
+        for next_done in asyncio.as_completed([render_widget(widget) for widget in pending]):
             try:
-                user = DiscordUser.objects.get(id=user_id)
-                top_chatters_dict[user.username] = count
-            except:
-                pass
-        
-        top_chatters = sorted(top_chatters_dict.items(), key=lambda x: x[1], reverse=True)[:5]
-        top_chatters = [{'user': {'username': name}, 'messages': int(count)} for name, count in top_chatters]
-        
-        cursor.close()
+                widget, html = await next_done
+            except Exception:
+                logger.exception("Home widget failed while streaming")
+                continue
+            yield (
+                f'<template id="widget-html-{widget.name}">{html}</template>'
+                f'<script>fillWidget(document.getElementById("widget-{widget.name}"), '
+                f'document.getElementById("widget-html-{widget.name}").innerHTML);</script>'
+            )
+
+        yield '<script>loadPendingWidgets();</script>' + tail
+
+
+class WidgetView(View):
+    """One home page widget as an HTML fragment, cached server-side and by the browser for the widget's TTL"""
+    def get(self, request, name):
+        widget = HOME_WIDGETS.get(name)
+        if widget is None:
+            raise Http404
+        response = HttpResponse(widget.render())
+        patch_cache_control(response, public=True, max_age=widget.ttl)
+        return response
+
+
+class UserProfileView(View):
+    """Per-member profile - served entirely from precomputed rollups"""
+    def get(self, request, discord_id):
+        user = get_object_or_404(
+            DiscordUser.objects.select_related('statistic', 'rank', 'session_lengths'),
+            discord_id=discord_id
+        )
+        stat = getattr(user, 'statistic', None)
+        rank = getattr(user, 'rank', None)
+        lengths = getattr(user, 'session_lengths', None)
+        
+        top_games = [
+            (game.game.name, int(game.total_seconds // 3600), game.total_sessions)
+            for game in UserGameStatistic.objects.filter(user=user).select_related('game').order_by('-total_seconds')[:5]
+        ]
+        
+        # Activity by hour of day (UTC), scaled against the busiest hour
+        hours = {row.hour: row for row in UserHourlyActivity.objects.filter(user=user)}
+        activity_seconds = [
+            (hours[h].gaming_seconds + hours[h].voice_seconds) if h in hours else 0
+            for h in range(24)
+        ]
+        peak = max(activity_seconds) or 1
+        activity_by_hour = [
+            {
+                'hour': h,
+                'hours': round(activity_seconds[h] / 3600, 1),
+                'messages': hours[h].messages if h in hours else 0,
+                'height': int(activity_seconds[h] * 100 / peak),
+            }
+            for h in range(24)
+        ]
         
         context = {
-            'servers': servers,
-            'total_users': total_users,
-            'total_gaming_hours': total_gaming_hours,
-            'total_voice_hours': total_voice_hours,
-            'total_messages': total_messages,
-            'top_gamers': top_gamers,
+            'member': user,
+            'gaming_hours': stat.total_gaming_seconds // 3600 if stat else 0,
+            'voice_hours': stat.total_voice_seconds // 3600 if stat else 0,
+            'total_messages': stat.total_messages if stat else 0,
+            'rank': rank,
+            'median_session_hours': round(lengths.median_seconds / 3600, 1) if lengths and lengths.sessions else None,
             'top_games': top_games,
-            'top_voice': top_voice,
-            'top_chatters': top_chatters,
+            'activity_by_hour': activity_by_hour,
         }
-        return render(request, 'home/index.html', context)
+        return render(request, 'home/profile.html', context)
+
+
+class CoverView(View):
+    """Processed cover art - filenames are content hashes, so browsers never need to revalidate"""
+    def get(self, request, filename):
+        response = serve(request, filename, document_root=COVERS_DIR)
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
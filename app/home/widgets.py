@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import queries
+
+
+class Widget:
+    """A home page fragment: the queries behind it, its template and how long its HTML is cached"""
+    def __init__(self, name, template, context_queries, ttl):
+        self.name = name
+        self.template = template
+        self.context_queries = context_queries
+        self.ttl = ttl
+
+    @property
+    def cache_key(self):
+        return f"home:widget:{self.name}"
+
+    def cached(self):
+        """Rendered HTML if it is in the cache, else None - never queries the database"""
+        html = cache.get(self.cache_key)
+        return mark_safe(html) if html is not None else None
+
+    def render(self):
+        """Rendered HTML from the cache, or run the queries and cache the result"""
+        html = self.cached()
+        if html is None:
+            context = {key: query() for key, query in self.context_queries.items()}
+            html = render_to_string(self.template, context)
+            cache.set(self.cache_key, str(html), self.ttl)
+        return mark_safe(html)
+
+
+# In page order; servers are not a widget because the shell renders them directly
+HOME_WIDGETS = {widget.name: widget for widget in [
+    Widget('stats', 'home/widgets/stats.html', {
+        'total_users': queries.total_users,
+        'total_gaming_hours': queries.total_gaming_hours,
+        'total_voice_hours': queries.total_voice_hours,
+        'total_messages': queries.total_messages,
+    }, ttl=60),
+    Widget('top_gamers', 'home/widgets/top_gamers.html', {'top_gamers': queries.top_gamers}, ttl=300),
+    Widget('top_games', 'home/widgets/top_games.html', {'top_games': queries.top_games}, ttl=300),
+    Widget('top_voice', 'home/widgets/top_voice.html', {'top_voice': queries.top_voice}, ttl=300),
+    Widget('top_chatters', 'home/widgets/top_chatters.html', {'top_chatters': queries.top_chatters}, ttl=300),
+]}
@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+requests.packages.urllib3.disable_warnings()
+
+
+class AMPError(Exception):
+    """AMP controller unreachable or returned an unusable response"""
+
+
+class AMPClient:
+    """AMP API client that keeps one pooled HTTP session and reuses its bearer token"""
+    def __init__(self, url, username, password, timeout=10, pool_size=10):
+        self.url = url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.token = None
+        self.login_lock = threading.Lock()
+
+        # Sized so every concurrent status request can hold its own keep-alive connection
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.verify = False
+        self.session.headers.update({
+            "Accept": "application/json",
+            "User-Agent": "BeerandRevolution/1.0",
+        })
+
+    @classmethod
+    def from_env(cls, url=None):
+        return cls(
+            url or os.getenv('AMP_URL', 'https://amp.beerandrevolution.net'),
+            os.getenv('AMP_USER'),
+            os.getenv('AMP_PASS'),
+            timeout=float(os.getenv('AMP_TIMEOUT', '10')),
+            pool_size=int(os.getenv('AMP_MAX_IN_FLIGHT', '8')),
+        )
+
+    def login(self):
+        """Log in and keep the bearer token that call() sends with every request"""
+        payload = {
+            "username": self.username,
+            "password": self.password,
+            "token": "",
+            "rememberMe": False
+        }
+        try:
+            response = self.session.post(f"{self.url}/API/Core/Login", json=payload, timeout=self.timeout)
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise AMPError(f"Login request failed: {e}") from e
+
+        if not data.get('success'):
+            raise AMPError(f"Login failed: {data}")
+
+        self.token = response.headers.get('Authorization', '').replace('Bearer ', '') or data.get('sessionID')
+
+    def reauthenticate(self, stale_token):
+        """Log in again unless another thread already replaced the rejected token"""
+        with self.login_lock:
+            if self.token == stale_token:
+                self.login()
+
+    def call(self, endpoint, payload=None):
+        """POST to /API/<endpoint>, logging in first if needed and again only on a 401"""
+        token = self.token
+        if token is None:
+            self.reauthenticate(None)
+
+        url = f"{self.url}/API/{endpoint}"
+        try:
+            response = self.post(url, payload)
+            if response.status_code == 401:
+                self.reauthenticate(token or self.token)
+                response = self.post(url, payload)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise AMPError(f"{endpoint} failed: {e}") from e
+
+    def post(self, url, payload):
+        # The token travels per request; the shared session's headers are never mutated across threads
+        return self.session.post(url, json=payload or {}, headers={'Authorization': f'Bearer {self.token}'}, timeout=self.timeout)
+
+    def get_instances(self):
+        data = self.call('ADSModule/GetInstances', {"ForceIncludeSelf": False})
+        if not isinstance(data, list):
+            raise AMPError(f'Invalid response: {data}')
+        return data
+
+    def get_instance_status(self, instance_id):
+        """Detailed status (metrics incl. TPS, uptime, state) proxied through the controller"""
+        return self.call(f'ADSModule/Servers/{instance_id}/API/Core/GetStatus')
+
+    def get_instance_players(self, instance_id):
+        data = self.call(f'ADSModule/Servers/{instance_id}/API/Core/GetUserList')
+        users = data.get('result', data) if isinstance(data, dict) else data
+        if isinstance(users, dict):
+            return sorted(users.values())
+        return list(users or [])
+
+    def close(self):
+        self.session.close()
+
+
+class AMPCollector:
+    """Polls several AMP controllers, and every running instance on them, concurrently"""
+    def __init__(self, clients, max_in_flight=8, deadline=30):
+        self.clients = clients
+        self.max_in_flight = max_in_flight
+        self.deadline = deadline
+
+    @classmethod
+    def from_env(cls):
+        urls = os.getenv('AMP_URLS') or os.getenv('AMP_URL', 'https://amp.beerandrevolution.net')
+        return cls(
+            [AMPClient.from_env(url.strip()) for url in urls.split(',') if url.strip()],
+            max_in_flight=int(os.getenv('AMP_MAX_IN_FLIGHT', '8')),
+            deadline=float(os.getenv('AMP_POLL_DEADLINE', '30')),
+        )
+
+    def collect(self):
+        """
+        Return (instances, healthy_controllers, errors).
+
+        Each instance dict is the GetInstances entry plus 'Controller', 'Status' and
+        'Players'; detail that fails or misses the deadline is left as None so the
+        summary metrics from GetInstances are used instead.
+        """
+        instances = []
+        healthy = set()
+        errors = []
+        # Executor threads bound the number of requests in flight across all controllers
+        executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='amp')
+        pending = {executor.submit(client.get_instances): ('instances', client, None) for client in self.clients}
+        deadline = time.monotonic() + self.deadline
+
+        try:
+            while pending and time.monotonic() < deadline:
+                done, _ = wait(pending, timeout=deadline - time.monotonic(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, client, instance = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except AMPError as e:
+                        errors.append(f"{client.url}: {e}")
+                        continue
+
+                    if kind == 'instances':
+                        healthy.add(client.url)
+                        for target in result:
+                            for entry in target.get('AvailableInstances', []):
+                                entry.update({'Controller': client.url, 'Status': None, 'Players': None})
+                                instances.append(entry)
+                                if entry.get('Running') and entry.get('Module') != 'ADS':
+                                    instance_id = entry['InstanceID']
+                                    pending[executor.submit(client.get_instance_status, instance_id)] = ('status', client, entry)
+                                    pending[executor.submit(client.get_instance_players, instance_id)] = ('players', client, entry)
+                    elif kind == 'status':
+                        instance['Status'] = result
+                    else:
+                        instance['Players'] = result
+
+            if pending:
+                errors.append(f"{len(pending)} request(s) missed the {self.deadline}s poll deadline")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if not healthy and self.clients:
+            raise AMPError('; '.join(errors) or 'No AMP controller responded')
+        return instances, healthy, errors
+
+    def close(self):
+        for client in self.clients:
+            client.close()
@@ -0,0 +1,108 @@
+from itertools import groupby
+
+from django.db import connection
+
+from tracker.models import ActivitySession, GameConcurrency
+from tracker.pending import pending_sessions
+
+# The game time a run counts - each session's piece since the last run - is cut at UTC midnight
+# and turned into a +1 event at its start and a -1 at its end. Pieces of a session still open are
+# swept again next run from where this one stopped, and the cache keeps the higher peak per hour.
+# Events at the same instant are netted first, so back-to-back
+# sessions are never counted twice, and the running SUM in time order is the sweep - one
+# linear pass per game and day instead of a self-join.
+SWEEP_SQL = f"""
+    WITH pieces AS (
+        SELECT game_id, day,
+               GREATEST(pending.piece_start, day) AS piece_start,
+               LEAST(pending.piece_end, day + INTERVAL '1 day') AS piece_end
+        FROM ({pending_sessions('tracker_activitysession')}) AS pending,
+             generate_series(date_trunc('day', pending.piece_start), pending.piece_end, INTERVAL '1 day') AS day
+        WHERE kind = %(game)s
+    ),
+    events AS (
+        SELECT game_id, day, at, SUM(delta) AS delta
+        FROM (
+            SELECT game_id, day, piece_start AS at, 1 AS delta FROM pieces WHERE piece_end > piece_start
+            UNION ALL
+            SELECT game_id, day, piece_end, -1 FROM pieces WHERE piece_end > piece_start
+        ) AS edges
+        GROUP BY game_id, day, at
+    )
+    SELECT game_id, day, at,
+           (SUM(delta) OVER (PARTITION BY game_id, day ORDER BY at ROWS UNBOUNDED PRECEDING))::int AS online
+    FROM events
+    ORDER BY game_id, day, at
+"""
+
+
+def sweep(day_start, events):
+    """
+    Reduce one game-day's (at, online) change points - one per distinct instant, in time
+    order - to (peak, peak_at, hourly_peaks).
+
+    Each event is visited once; the hours between two events inherit the count that was
+    current throughout them.
+    """
+    peak, peak_at = 0, None
+    hourly_peaks = [0] * 24
+    online, hour = 0, 0
+    for at, count in events:
+        offset = (at - day_start).total_seconds()
+        # 24 for the midnight that overnight sessions are cut at
+        index = int(offset // 3600)
+        for crossed in range(hour + 1, min(index, 24)):
+            hourly_peaks[crossed] = max(hourly_peaks[crossed], online)
+        # The previous count also ran into this event's hour unless the event is exactly on the hour
+        if hour < index < 24 and offset % 3600:
+            hourly_peaks[index] = max(hourly_peaks[index], online)
+        online = count
+        if index < 24:
+            hour = index
+            hourly_peaks[hour] = max(hourly_peaks[hour], online)
+        if online > peak:
+            peak, peak_at = online, at
+    return peak, peak_at, hourly_peaks
+
+
+def daily_concurrency(cutoff):
+    """Yield (game_id, day, peak, peak_at, hourly_peaks) for every game-day with game time up to cutoff"""
+    with connection.cursor() as cursor:
+        cursor.execute(SWEEP_SQL, {'game': ActivitySession.GAME, 'cutoff': cutoff})
+        for (game_id, day_start), rows in groupby(cursor, key=lambda row: (row[0], row[1])):
+            peak, peak_at, hourly_peaks = sweep(day_start, ((at, online) for _, _, at, online in rows))
+            yield game_id, day_start.date(), peak, peak_at, hourly_peaks
+
+
+def fold_into_cache(results):
+    """
+    Merge swept game-days into GameConcurrency and return how many rows were written.
+
+    Sessions are cleared after every aggregation, so a day can arrive in several batches;
+    peaks only ever grow, hour by hour.
+    """
+    results = list(results)
+    if not results:
+        return 0
+    days = {day for _, day, _, _, _ in results}
+    cached = {
+        (row.game_id, row.day): row
+        for row in GameConcurrency.objects.filter(day__gte=min(days), day__lte=max(days))
+    }
+
+    rows = []
+    for game_id, day, peak, peak_at, hourly_peaks in results:
+        previous = cached.get((game_id, day))
+        if previous is not None:
+            if previous.peak_players >= peak:
+                peak, peak_at = previous.peak_players, previous.peak_at
+            hourly_peaks = [max(a, b) for a, b in zip(hourly_peaks, previous.hourly_peaks or [0] * 24)]
+        rows.append(GameConcurrency(game_id=game_id, day=day, peak_players=peak, peak_at=peak_at, hourly_peaks=hourly_peaks))
+
+    GameConcurrency.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['game', 'day'],
+        update_fields=['peak_players', 'peak_at', 'hourly_peaks'],
+    )
+    return len(rows)
@@ -0,0 +1,103 @@
+import heapq
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connection
+
+from tracker.models import ActivitySession
+from tracker.pending import pending_sessions
+
+# (group, user_id, started_at, ended_at) in sweep order - a group is a game or a voice channel.
+# Each session contributes the piece a run counts, so time shared across several runs is
+# added once per run and never twice.
+GAME_SESSIONS_SQL = f"""
+    SELECT game_id, user_id, piece_start, piece_end
+    FROM ({pending_sessions('tracker_activitysession')}) AS pending
+    WHERE kind = %(game)s AND piece_end > piece_start
+    ORDER BY game_id, piece_start
+"""
+VOICE_SESSIONS_SQL = f"""
+    SELECT channel_id, user_id, piece_start, piece_end
+    FROM ({pending_sessions('tracker_voicesession')}) AS pending
+    WHERE piece_end > piece_start
+    ORDER BY channel_id, piece_start
+"""
+
+FOLD_SQL = """
+    INSERT INTO tracker_playpartner (user_a_id, user_b_id, game_seconds, voice_seconds, last_updated)
+    SELECT user_a_id, user_b_id, game_seconds, voice_seconds, NOW()
+    FROM unnest(%s::bigint[], %s::bigint[], %s::bigint[], %s::bigint[]) AS edges(user_a_id, user_b_id, game_seconds, voice_seconds)
+    ON CONFLICT (user_a_id, user_b_id) DO UPDATE SET
+        game_seconds = tracker_playpartner.game_seconds + EXCLUDED.game_seconds,
+        voice_seconds = tracker_playpartner.voice_seconds + EXCLUDED.voice_seconds,
+        last_updated = NOW()
+"""
+
+
+def member_spans(rows):
+    """
+    One group's (user_id, started_at, ended_at) rows with each member's overlapping
+    sessions merged, re-sorted by start - so nobody is counted as being there twice.
+    """
+    spans = {}
+    for _, user_id, started_at, ended_at in rows:
+        merged = spans.setdefault(user_id, [])
+        if merged and started_at < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], ended_at)
+        else:
+            merged.append([started_at, ended_at])
+    return sorted(
+        (started_at, ended_at, user_id)
+        for user_id, merged in spans.items()
+        for started_at, ended_at in merged
+    )
+
+
+def overlap_seconds(sessions):
+    """
+    Sum how long each pair of members was in the same group at once.
+
+    Sort-and-sweep: sessions arrive ordered by start within each group, and a heap keyed
+    on end time holds the ones still running. Each new session only meets the sessions
+    it actually overlaps, so the cost is O(n log n) plus the number of overlapping pairs
+    rather than every pair in the group.
+    """
+    totals = defaultdict(float)
+    for _, rows in groupby(sessions, key=itemgetter(0)):
+        running = []
+        for started_at, ended_at, user_id in member_spans(rows):
+            while running and running[0][0] <= started_at:
+                heapq.heappop(running)
+            for other_ended_at, other_user_id in running:
+                if other_user_id == user_id:
+                    continue
+                pair = (user_id, other_user_id) if user_id < other_user_id else (other_user_id, user_id)
+                totals[pair] += (min(ended_at, other_ended_at) - started_at).total_seconds()
+            heapq.heappush(running, (ended_at, user_id))
+    return totals
+
+
+def session_overlaps(cutoff):
+    """({pair: seconds} for shared games, {pair: seconds} for shared voice channels) up to cutoff"""
+    with connection.cursor() as cursor:
+        cursor.execute(GAME_SESSIONS_SQL, {'game': ActivitySession.GAME, 'cutoff': cutoff})
+        game = overlap_seconds(cursor)
+        cursor.execute(VOICE_SESSIONS_SQL, {'cutoff': cutoff})
+        voice = overlap_seconds(cursor)
+    return game, voice
+
+
+def fold_into_edges(game, voice):
+    """Add overlap seconds onto the PlayPartner edges in one statement; returns the number of pairs touched"""
+    pairs = sorted(set(game) | set(voice))
+    if not pairs:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(FOLD_SQL, [
+            [user_a_id for user_a_id, _ in pairs],
+            [user_b_id for _, user_b_id in pairs],
+            [int(game.get(pair, 0)) for pair in pairs],
+            [int(voice.get(pair, 0)) for pair in pairs],
+        ])
+    return len(pairs)
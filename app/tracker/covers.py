@@ -0,0 +1,73 @@
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# Kept apart from STATIC_ROOT so gc_covers never has to tell covers from collectstatic output
+COVERS_DIR = Path(settings.MEDIA_ROOT) / 'covers'
+COVERS_URL = '/covers/'
+# Raw covers written by earlier versions, before processing existed
+LEGACY_COVERS_DIR = Path(settings.STATIC_ROOT) / 'images'
+
+# Card widths on the home page (130px mobile, 180px desktop) plus IGDB's full t_cover_big width for 2x screens
+COVER_WIDTHS = (130, 180, 264)
+COVER_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def write_atomic(filepath, data):
+    """Write via a temp file and rename, so a crash never leaves a partial file under the final name"""
+    fd, temp_path = tempfile.mkstemp(dir=filepath.parent, prefix=f".{filepath.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(data)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def process_cover(data, name):
+    """
+    Write every width/format variant of a downloaded cover into COVERS_DIR.
+
+    Filenames carry a hash of the encoded bytes, so a URL never changes content and can
+    be cached forever. Returns (width, height, variants) for the largest size.
+    """
+    COVERS_DIR.mkdir(parents=True, exist_ok=True)
+    slug = "".join(c for c in name if c.isalnum() or c in ('-', '_')).lower()[:40] or 'cover'
+
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+
+    variants = []
+    widths = sorted({min(width, image.width) for width in COVER_WIDTHS})
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for extension, (image_format, save_options) in COVER_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **save_options)
+            encoded = buffer.getvalue()
+            filename = f"{slug}-{width}w-{hashlib.sha256(encoded).hexdigest()[:16]}.{extension}"
+            filepath = COVERS_DIR / filename
+            if filepath.exists():
+                # Reused by a row that may not be committed yet - refresh the mtime so gc_covers' grace period covers it
+                os.utime(filepath)
+            else:
+                write_atomic(filepath, encoded)
+            variants.append({
+                'format': extension,
+                'width': width,
+                'height': height,
+                'url': f"{COVERS_URL}{filename}",
+            })
+
+    return widths[-1], variants[-1]['height'], variants
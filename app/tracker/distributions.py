@@ -0,0 +1,121 @@
+import numpy as np
+from django.db import connection
+
+from tracker.models import ActivitySession, GameSessionLengths, UserSessionLengths
+
+# Histogram bin upper bounds in seconds (last bin catches everything longer). Sessions are cleared
+# after every aggregation, so distributions are kept as counts in fixed bins that runs can add to;
+# changing the bins would need the stored histograms rebuilt.
+SESSION_LENGTH_BINS = [60, 300, 900, 1800, 3600, 5400, 7200, 10800, 14400, 21600, 28800, float('inf')]
+PERCENTILES = {'p25_seconds': 0.25, 'median_seconds': 0.5, 'p75_seconds': 0.75, 'p90_seconds': 0.9}
+
+UPPER_BOUNDS = np.array(SESSION_LENGTH_BINS)
+LOWER_BOUNDS = np.array([0] + SESSION_LENGTH_BINS[:-1])
+# Estimates never interpolate into the open-ended last bin
+INTERPOLATION_UPPER = np.append(UPPER_BOUNDS[:-1], LOWER_BOUNDS[-1])
+
+# One row of three arrays - the whole batch arrives as columns, never as per-session tuples.
+# Only sessions that finished by the run's cutoff, each once with its whole length: a session
+# still open is left for the run after it ends, however many runs have counted its time.
+DURATIONS_SQL = """
+    SELECT COALESCE(array_agg(game_id), '{}'), COALESCE(array_agg(user_id), '{}'), COALESCE(array_agg(duration_seconds), '{}')
+    FROM tracker_activitysession
+    WHERE kind = %s AND ended_at <= %s
+"""
+
+
+def fetch_durations(cutoff):
+    """(game_ids, user_ids, durations) as int64 arrays for every game session that ended by cutoff"""
+    with connection.cursor() as cursor:
+        cursor.execute(DURATIONS_SQL, [ActivitySession.GAME, cutoff])
+        game_ids, user_ids, durations = cursor.fetchone()
+    return (
+        np.array(game_ids, dtype=np.int64),
+        np.array(user_ids, dtype=np.int64),
+        np.array(durations, dtype=np.int64),
+    )
+
+
+def grouped_histograms(keys, durations):
+    """
+    Histogram durations per key without a Python loop over sessions.
+
+    Returns (unique_keys, counts, total_seconds): one searchsorted assigns every session
+    its bin, then a single bincount over key * bins + bin fills the whole (keys x bins)
+    matrix at once.
+    """
+    bins = len(SESSION_LENGTH_BINS)
+    unique_keys, key_index = np.unique(keys, return_inverse=True)
+    bin_index = np.searchsorted(UPPER_BOUNDS, durations, side='left')
+    counts = np.bincount(key_index * bins + bin_index, minlength=len(unique_keys) * bins).reshape(-1, bins)
+    total_seconds = np.bincount(key_index, weights=durations, minlength=len(unique_keys)).astype(np.int64)
+    return unique_keys, counts, total_seconds
+
+
+def estimate_percentiles(counts):
+    """
+    {field: array} of percentile estimates for every histogram row.
+
+    Each estimate interpolates linearly inside the bin where the cumulative count
+    crosses the percentile; every step works on all rows at once.
+    """
+    rows = np.arange(len(counts))
+    cumulative = np.cumsum(counts, axis=1)
+    sessions = cumulative[:, -1]
+    estimates = {}
+    for field, fraction in PERCENTILES.items():
+        target = fraction * sessions
+        crossing = np.minimum((cumulative < target[:, None]).sum(axis=1), counts.shape[1] - 1)
+        below = np.where(crossing > 0, cumulative[rows, crossing - 1], 0)
+        in_bin = counts[rows, crossing]
+        share = np.divide(target - below, in_bin, out=np.zeros(len(counts)), where=in_bin > 0)
+        lower = LOWER_BOUNDS[crossing]
+        estimates[field] = np.rint(lower + share * (INTERPOLATION_UPPER[crossing] - lower)).astype(np.int64)
+    return estimates
+
+
+def fold_lengths(model, key_field, keys, durations):
+    """Add one batch to model's stored histograms and refresh the estimates; returns rows written"""
+    if not len(keys):
+        return 0
+    unique_keys, counts, total_seconds = grouped_histograms(keys, durations)
+    bins = len(SESSION_LENGTH_BINS)
+
+    key_list = unique_keys.tolist()
+    stored = {
+        getattr(row, key_field): row
+        for row in model.objects.filter(**{f"{key_field}__in": key_list})
+    }
+    for i, key in enumerate(key_list):
+        row = stored.get(key)
+        if row is not None and len(row.histogram) == bins:
+            counts[i] += np.array(row.histogram, dtype=np.int64)
+            total_seconds[i] += row.total_seconds
+
+    sessions = counts.sum(axis=1)
+    estimates = estimate_percentiles(counts)
+    model.objects.bulk_create(
+        [
+            model(**{
+                key_field: key,
+                'sessions': int(sessions[i]),
+                'total_seconds': int(total_seconds[i]),
+                'histogram': counts[i].tolist(),
+                **{field: int(values[i]) for field, values in estimates.items()},
+            })
+            for i, key in enumerate(key_list)
+        ],
+        update_conflicts=True,
+        unique_fields=[key_field.removesuffix('_id')],
+        update_fields=['sessions', 'total_seconds', 'histogram', *PERCENTILES, 'last_updated'],
+    )
+    return len(key_list)
+
+
+def fold_session_lengths(cutoff):
+    """(games, users) whose distributions were updated from the game sessions that ended by cutoff"""
+    game_ids, user_ids, durations = fetch_durations(cutoff)
+    return (
+        fold_lengths(GameSessionLengths, 'game_id', game_ids, durations),
+        fold_lengths(UserSessionLengths, 'user_id', user_ids, durations),
+    )
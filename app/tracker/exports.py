@@ -0,0 +1,144 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from tracker.models import AMPServerMetric, GameSession, GameStatistic, Message, UserStatistic, VoiceSession
+
+# Rows fetched per round trip from the server-side cursor, and rows per streamed chunk
+EXPORT_CHUNK_SIZE = 5000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class EchoBuffer:
+    """File-like object for csv.writer that hands each formatted line back instead of storing it"""
+    def write(self, value):
+        return value
+
+
+class Export:
+    """A streamable dataset: the columns to export and which of them the filters apply to"""
+    def __init__(self, model, columns, time_field=None, user_field=None, game_field=None):
+        self.model = model
+        self.columns = columns
+        self.time_field = time_field
+        self.user_field = user_field
+        self.game_field = game_field
+
+    @property
+    def header(self):
+        return [column.replace('__', '_') for column in self.columns]
+
+    def queryset(self, since=None, until=None, user=None, game=None):
+        """Filtered rows as tuples; raises ValueError for a filter this export doesn't support"""
+        filters = {}
+        for value, field, suffix, label in [
+            (since, self.time_field, '__gte', 'date range'),
+            (until, self.time_field, '__lt', 'date range'),
+            (user, self.user_field, '', 'user'),
+            (game, self.game_field, '', 'game'),
+        ]:
+            if value is None:
+                continue
+            if field is None:
+                raise ValueError(f"{self.model.__name__} export has no {label} filter")
+            filters[field + suffix] = value
+        return self.model.objects.filter(**filters).order_by('pk').values_list(*self.columns)
+
+    def stream(self, queryset, export_format):
+        """Yield the export as text chunks; iterator() reads through a server-side cursor, so memory stays flat"""
+        if export_format == 'csv':
+            writer = csv.writer(EchoBuffer())
+            yield writer.writerow(self.header)
+            format_row = writer.writerow
+        else:
+            header = self.header
+            format_row = lambda row: json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + '\n'
+
+        lines = []
+        for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            lines.append(format_row(row))
+            if len(lines) >= EXPORT_CHUNK_SIZE:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
+
+
+EXPORTS = {
+    'game_sessions': Export(
+        GameSession,
+        ['id', 'user__discord_id', 'user__username', 'game__name', 'started_at', 'ended_at', 'duration_seconds'],
+        time_field='started_at', user_field='user__discord_id', game_field='game__name',
+    ),
+    'voice_sessions': Export(
+        VoiceSession,
+        ['id', 'user__discord_id', 'user__username', 'channel__discord_id', 'channel__name', 'started_at', 'ended_at', 'duration_seconds'],
+        time_field='started_at', user_field='user__discord_id',
+    ),
+    'messages': Export(
+        Message,
+        ['id', 'user__discord_id', 'user__username', 'channel__discord_id', 'channel__name', 'message_length', 'created_at'],
+        time_field='created_at', user_field='user__discord_id',
+    ),
+    'amp_metrics': Export(
+        AMPServerMetric,
+        ['id', 'server__instance_id', 'server__friendly_name', 'server__module_display_name',
+         'cpu_usage_percent', 'memory_usage_mb', 'active_users', 'tps', 'recorded_at'],
+        time_field='recorded_at', game_field='server__module_display_name',
+    ),
+    'game_statistics': Export(
+        GameStatistic,
+        ['game__name', 'total_seconds', 'total_sessions', 'total_seconds_this_week', 'total_seconds_this_month', 'last_updated'],
+        game_field='game__name',
+    ),
+    'user_statistics': Export(
+        UserStatistic,
+        ['user__discord_id', 'user__username', 'total_gaming_seconds', 'total_voice_seconds', 'total_messages',
+         'total_gaming_seconds_this_week', 'total_gaming_seconds_this_month',
+         'total_voice_seconds_this_week', 'total_voice_seconds_this_month',
+         'total_messages_this_week', 'total_messages_this_month', 'last_updated'],
+        user_field='user__discord_id',
+    ),
+}
+
+
+def parse_moment(value, end_of_day=False):
+    """Aware datetime from a date or datetime string; a bare date means its start, or the next day's with end_of_day"""
+    # Dates first: parse_datetime also accepts a bare date, as midnight
+    day = parse_date(value)
+    if day is not None:
+        parsed = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    else:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"Invalid date: {value}")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+def parse_export_filters(since=None, until=None, user=None, game=None):
+    """
+    Turn raw filter strings (query params or command options) into queryset() arguments.
+
+    since/until take a date or datetime; since is inclusive and a bare until date includes
+    that whole day. user is a Discord id, game an exact game name.
+    """
+    filters = {}
+    if since:
+        filters['since'] = parse_moment(since)
+    if until:
+        filters['until'] = parse_moment(until, end_of_day=True)
+    if user:
+        if not str(user).isdigit():
+            raise ValueError(f"Invalid Discord user id: {user}")
+        filters['user'] = int(user)
+    if game:
+        filters['game'] = game
+    return filters
@@ -0,0 +1,175 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TWITCH_TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+IGDB_MULTIQUERY_URL = "https://api.igdb.com/v4/multiquery"
+IGDB_IMAGE_URL = "https://images.igdb.com/igdb/image/upload/t_cover_big/{image_id}.jpg"
+
+# IGDB allows 4 requests per second and 10 sub-queries per multiquery request
+IGDB_RATE = 4
+IGDB_MULTIQUERY_SIZE = 10
+
+
+class IGDBError(Exception):
+    """Twitch/IGDB unreachable or returned an unusable response"""
+
+
+def normalize_game_name(name):
+    """Cache key for a game name: case, trademark symbols and spacing don't cause separate lookups"""
+    name = unicodedata.normalize('NFKC', name.replace('™', '').replace('®', '').replace('©', ''))
+    return re.sub(r'\s+', ' ', name).strip().casefold()
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a request may be sent"""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class IGDBClient:
+    """IGDB client sharing one rate limit, retrying session and Twitch token across threads"""
+    def __init__(self, client_id, client_secret, timeout=10, rate=IGDB_RATE, pool_size=8, token_store=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate)
+        # Optional object with load() -> (token, expires epoch) and store(token, expires epoch)
+        self.token_store = token_store
+        self.token = None
+        self.token_expires = 0
+        self.token_lock = threading.Lock()
+
+        # Retries honour Retry-After, so a 429 backs off instead of failing the batch
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET', 'POST'],
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(max_retries=retry, pool_maxsize=pool_size))
+
+    @classmethod
+    def from_env(cls, token_store=None):
+        return cls(
+            os.getenv('TWITCH_CLIENT_ID'),
+            os.getenv('TWITCH_CLIENT_SECRET'),
+            timeout=float(os.getenv('IGDB_TIMEOUT', '10')),
+            token_store=token_store,
+        )
+
+    def get_token(self):
+        """Twitch app token, reused until a minute before its expires_in runs out"""
+        with self.token_lock:
+            if self.token and time.time() < self.token_expires:
+                return self.token
+            if self.token_store is not None:
+                self.token, self.token_expires = self.token_store.load()
+                if self.token and time.time() < self.token_expires:
+                    return self.token
+            params = {
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "grant_type": "client_credentials"
+            }
+            try:
+                response = self.session.post(TWITCH_TOKEN_URL, params=params, timeout=self.timeout)
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                raise IGDBError(f"Failed to get Twitch token: {e}") from e
+            self.token = data['access_token']
+            self.token_expires = time.time() + data.get('expires_in', 3600) - 60
+            if self.token_store is not None:
+                self.token_store.store(self.token, self.token_expires)
+            return self.token
+
+    def invalidate_token(self, token):
+        with self.token_lock:
+            if self.token == token:
+                self.token_expires = 0
+
+    def multiquery(self, queries):
+        """Run up to IGDB_MULTIQUERY_SIZE named sub-queries in one request; returns {name: results}"""
+        body = "".join(f'query {endpoint} "{name}" {{ {query} }};\n' for name, endpoint, query in queries)
+        try:
+            for attempt in range(2):
+                token = self.get_token()
+                self.bucket.acquire()
+                response = self.session.post(
+                    IGDB_MULTIQUERY_URL,
+                    data=body,
+                    headers={"Client-ID": self.client_id, "Authorization": f"Bearer {token}"},
+                    timeout=self.timeout,
+                )
+                # A revoked token is refreshed once; the stored expiry can't know about revocation
+                if response.status_code != 401:
+                    break
+                self.invalidate_token(token)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise IGDBError(f"IGDB multiquery failed: {e}") from e
+        return {entry.get('name'): entry.get('result', []) for entry in data if isinstance(entry, dict)}
+
+    def lookup_games(self, game_names):
+        """
+        Search IGDB for up to IGDB_MULTIQUERY_SIZE names in one request.
+
+        Returns {name: (igdb_id, cover_image_id)} for matches and {name: None} for misses;
+        cover_image_id is None when the matched game has no cover.
+        """
+        queries = [
+            (str(i), 'games', f'search "{self.escape(name)}"; fields id, name, cover.image_id; limit 1;')
+            for i, name in enumerate(game_names)
+        ]
+        results = self.multiquery(queries)
+        games = {}
+        for i, name in enumerate(game_names):
+            matches = results.get(str(i)) or []
+            if not matches:
+                games[name] = None
+                continue
+            cover = matches[0].get('cover')
+            games[name] = (matches[0].get('id'), cover.get('image_id') if isinstance(cover, dict) else None)
+        return games
+
+    def download_cover(self, image_id):
+        """Fetch the t_cover_big image for image_id and return its bytes"""
+        self.bucket.acquire()
+        try:
+            response = self.session.get(IGDB_IMAGE_URL.format(image_id=image_id), timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise IGDBError(f"Failed to download cover {image_id}: {e}") from e
+        return response.content
+
+    @staticmethod
+    def escape(value):
+        return value.replace('\\', '\\\\').replace('"', '\\"')
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from tracker.concurrency import daily_concurrency, fold_into_cache
+
+
+class Command(BaseCommand):
+    help = 'Sweep the current game sessions into the per-day peak concurrency cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cutoff', type=parse_datetime, default=None, help='Count session time up to this moment (default: now)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔄 Sweeping game concurrency...")
+
+        with transaction.atomic():
+            results = list(daily_concurrency(options['cutoff'] or timezone.now()))
+            written = fold_into_cache(results)
+
+        busiest = max(results, key=lambda result: result[2], default=None)
+        summary = f", busiest {busiest[1]} with {busiest[2]} online" if busiest else ""
+        self.stdout.write(self.style.SUCCESS(f"✅ Cached concurrency for {written} game-days{summary}"))
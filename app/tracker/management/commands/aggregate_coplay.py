@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from tracker.coplay import fold_into_edges, session_overlaps
+
+
+class Command(BaseCommand):
+    help = 'Add the current sessions\' shared game/voice time onto the play partner edges'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cutoff', type=parse_datetime, default=None, help='Count session time up to this moment (default: now)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔄 Sweeping co-play overlaps...")
+
+        with transaction.atomic():
+            game, voice = session_overlaps(options['cutoff'] or timezone.now())
+            pairs = fold_into_edges(game, voice)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Updated {pairs} play partner pairs "
+            f"(+{sum(game.values()) // 3600:.0f}h gaming, +{sum(voice.values()) // 3600:.0f}h voice together)"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from tracker.distributions import fold_session_lengths
+
+
+class Command(BaseCommand):
+    help = 'Add the current game sessions to the per-game and per-user session length histograms'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cutoff', type=parse_datetime, default=None, help='Add the sessions that ended by this moment (default: now)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            games, users = fold_session_lengths(options['cutoff'] or timezone.now())
+        self.stdout.write(self.style.SUCCESS(f"✅ Session length distributions updated for {games} games, {users} users"))
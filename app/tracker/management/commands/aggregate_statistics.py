@@ -1,12 +1,24 @@
+import os
+
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
-from django.db import connection
+from django.db import connection, transaction
 from django.utils import timezone
 from datetime import timedelta
-from tracker.models import GameStatistic, UserStatistic, GameSession, VoiceSession, Message, DiscordUser, ActivityEvent
+from tracker.models import GameStatistic, UserStatistic, ActivitySession, VoiceSession, Message, DiscordUser, AggregationRun
+from tracker.pending import pending_sessions
+from tracker.sharding import run_shards
+
+PENDING_GAMES = pending_sessions('tracker_activitysession')
+PENDING_VOICE = pending_sessions('tracker_voicesession')
 
 class Command(BaseCommand):
     help = 'Aggregate session/message data into statistics, then clear temporary tables'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=int(os.getenv('AGGREGATE_WORKERS', '1')), help='Processes for the game/user statistics; above 1 the work is sharded by hashed id')
+        parser.add_argument('--shards', type=int, default=None, help='Shards to split the work into when parallel (default: one per worker)')
+
     def handle(self, *args, **options):
         self.stdout.write("🔄 Starting statistics aggregation...")
         
@@ -14,31 +26,144 @@ class Command(BaseCommand):
         week_ago = now - timedelta(days=7)
         month_ago = now - timedelta(days=30)
         
+        # 0. Claim everything up to now - the bot no longer reopens sessions that ended before it -
+        #    then merge sessions split by flapping presence/voice so total_sessions counts real sessions
+        run = AggregationRun.objects.create(cutoff=now)
+        call_command('compact_sessions', until=now, stdout=self.stdout)
+
+        # 1-3. Game, user and per-user game statistics. Forked shards commit on their own
+        #      connections, so inside a caller's transaction (e.g. a benchmark rollback) run serially.
+        #      The run is marked counted as the totals commit, so live totals stop adding its time.
+        workers = options['workers']
+        if workers > 1 and connection.in_atomic_block:
+            self.stdout.write("  Running inside a transaction - aggregating serially")
+            workers = 1
+        if workers > 1:
+            self.aggregate_sharded(workers, options['shards'], now, week_ago, month_ago)
+            AggregationRun.objects.filter(pk=run.pk).update(counted_at=timezone.now())
+        else:
+            with transaction.atomic():
+                self.aggregate_serial(now, week_ago, month_ago)
+                AggregationRun.objects.filter(pk=run.pk).update(counted_at=timezone.now())
+        
+        cursor = connection.cursor()
+        
+        # 4. Aggregate activity by hour of day and by weekday x hour (sessions split at hour boundaries).
+        #    The split happens once; the per-user, per-user weekly and server weekly cells are all
+        #    upserted from it in one statement.
+        cursor.execute(f"""
+            WITH buckets AS (
+                SELECT user_id, weekday, hour, SUM(gaming) AS gaming, SUM(voice) AS voice, SUM(messages) AS messages
+                FROM (
+                    SELECT user_id, (EXTRACT(ISODOW FROM bucket) - 1)::int AS weekday, EXTRACT(HOUR FROM bucket)::int AS hour,
+                           EXTRACT(EPOCH FROM LEAST(piece_end, bucket + INTERVAL '1 hour') - GREATEST(piece_start, bucket))::bigint AS gaming,
+                           0 AS voice, 0 AS messages
+                    FROM ({PENDING_GAMES}) AS games,
+                         generate_series(date_trunc('hour', piece_start), piece_end, INTERVAL '1 hour') AS bucket
+                    WHERE kind = %(game)s
+                    UNION ALL
+                    SELECT user_id, (EXTRACT(ISODOW FROM bucket) - 1)::int, EXTRACT(HOUR FROM bucket)::int,
+                           0,
+                           EXTRACT(EPOCH FROM LEAST(piece_end, bucket + INTERVAL '1 hour') - GREATEST(piece_start, bucket))::bigint,
+                           0
+                    FROM ({PENDING_VOICE}) AS voice,
+                         generate_series(date_trunc('hour', piece_start), piece_end, INTERVAL '1 hour') AS bucket
+                    UNION ALL
+                    SELECT user_id, (EXTRACT(ISODOW FROM created_at) - 1)::int, EXTRACT(HOUR FROM created_at)::int, 0, 0, 1
+                    FROM tracker_message
+                    WHERE created_at <= %(cutoff)s
+                ) AS pieces
+                GROUP BY user_id, weekday, hour
+            ),
+            user_weekly AS (
+                INSERT INTO tracker_userweeklyactivity (user_id, weekday, hour, gaming_seconds, voice_seconds, messages)
+                SELECT user_id, weekday, hour, gaming, voice, messages
+                FROM buckets
+                ON CONFLICT (user_id, weekday, hour) DO UPDATE SET
+                    gaming_seconds = tracker_userweeklyactivity.gaming_seconds + EXCLUDED.gaming_seconds,
+                    voice_seconds = tracker_userweeklyactivity.voice_seconds + EXCLUDED.voice_seconds,
+                    messages = tracker_userweeklyactivity.messages + EXCLUDED.messages
+            ),
+            server_weekly AS (
+                INSERT INTO tracker_serverweeklyactivity (weekday, hour, gaming_seconds, voice_seconds, messages)
+                SELECT weekday, hour, SUM(gaming), SUM(voice), SUM(messages)
+                FROM buckets
+                GROUP BY weekday, hour
+                ON CONFLICT (weekday, hour) DO UPDATE SET
+                    gaming_seconds = tracker_serverweeklyactivity.gaming_seconds + EXCLUDED.gaming_seconds,
+                    voice_seconds = tracker_serverweeklyactivity.voice_seconds + EXCLUDED.voice_seconds,
+                    messages = tracker_serverweeklyactivity.messages + EXCLUDED.messages
+            )
+            INSERT INTO tracker_userhourlyactivity (user_id, hour, gaming_seconds, voice_seconds, messages)
+            SELECT user_id, hour, SUM(gaming), SUM(voice), SUM(messages)
+            FROM buckets
+            GROUP BY user_id, hour
+            ON CONFLICT (user_id, hour) DO UPDATE SET
+                gaming_seconds = tracker_userhourlyactivity.gaming_seconds + EXCLUDED.gaming_seconds,
+                voice_seconds = tracker_userhourlyactivity.voice_seconds + EXCLUDED.voice_seconds,
+                messages = tracker_userhourlyactivity.messages + EXCLUDED.messages
+        """, {'game': ActivitySession.GAME, 'cutoff': now})
+        self.stdout.write(f"  Hourly activity rows: {cursor.rowcount}")
+        
+        # 5. Rebuild rank index from the updated user statistics
+        call_command('rebuild_user_ranks', stdout=self.stdout)
+        
+        # 6. Fold concurrency peaks into the per-day cache while the sessions still exist
+        call_command('aggregate_concurrency', cutoff=now, stdout=self.stdout)
+        
+        # 7. Add shared game/voice time onto the play partner edges
+        call_command('aggregate_coplay', cutoff=now, stdout=self.stdout)
+        
+        # 8. Add finished sessions' lengths to the distribution histograms
+        call_command('aggregate_session_lengths', cutoff=now, stdout=self.stdout)
+        
+        # 9. Keep voice history for occupancy queries - the sessions themselves are temporary
+        call_command('archive_voice', cutoff=now, stdout=self.stdout)
+        
+        # 10. Clear what this run counted. Anything written after the cutoff is left for the next run;
+        #     sessions still open at the cutoff carry on, counted up to it.
+        with transaction.atomic():
+            for model in (ActivitySession, VoiceSession):
+                model.objects.filter(ended_at__lte=now).delete()
+                model.objects.filter(started_at__lt=now).update(counted_until=now)
+            Message.objects.filter(created_at__lte=now).delete()
+            AggregationRun.objects.filter(cutoff__lt=now).delete()
+        
+        self.stdout.write(self.style.SUCCESS('✅ Statistics aggregated and temp tables cleared'))
+        cursor.close()
+
+    def aggregate_serial(self, cutoff, week_ago, month_ago):
+        """Steps 1-3 in this process, one game/user at a time"""
         cursor = connection.cursor()
+        params = {'game': ActivitySession.GAME, 'cutoff': cutoff, 'week_ago': week_ago, 'month_ago': month_ago}
         
-        # 1. Aggregate game statistics
-        cursor.execute("""
-            SELECT game_name, COALESCE(SUM(duration_seconds), 0), COUNT(*)
-            FROM tracker_gamesession
-            WHERE ended_at IS NOT NULL
-            GROUP BY game_name
-        """)
+        # 1. Aggregate game statistics - time up to the cutoff, sessions once they have finished
+        cursor.execute(f"""
+            SELECT s.game_id, g.name, s.total_seconds, s.count
+            FROM (
+                SELECT game_id, COALESCE(SUM(seconds), 0) AS total_seconds, COUNT(*) FILTER (WHERE finished) AS count
+                FROM ({PENDING_GAMES}) AS pending
+                WHERE kind = %(game)s
+                GROUP BY game_id
+            ) AS s
+            JOIN tracker_game g ON g.id = s.game_id
+        """, params)
         
-        for game_name, total_seconds, count in cursor.fetchall():
-            stat, created = GameStatistic.objects.get_or_create(game_name=game_name)
+        for game_id, game_name, total_seconds, count in cursor.fetchall():
+            stat, created = GameStatistic.objects.get_or_create(game_id=game_id)
             stat.total_seconds += total_seconds
             stat.total_sessions += count
             
             # Calculate this week and month
             cursor.execute(
-                "SELECT COALESCE(SUM(duration_seconds), 0) FROM tracker_gamesession WHERE game_name = %s AND ended_at IS NOT NULL AND ended_at > %s",
-                [game_name, week_ago]
+                f"SELECT COALESCE(SUM(seconds), 0) FROM ({PENDING_GAMES}) AS pending WHERE kind = %(game)s AND game_id = %(game_id)s AND piece_end > %(week_ago)s",
+                {**params, 'game_id': game_id}
             )
             stat.total_seconds_this_week = cursor.fetchone()[0]
             
             cursor.execute(
-                "SELECT COALESCE(SUM(duration_seconds), 0) FROM tracker_gamesession WHERE game_name = %s AND ended_at IS NOT NULL AND ended_at > %s",
-                [game_name, month_ago]
+                f"SELECT COALESCE(SUM(seconds), 0) FROM ({PENDING_GAMES}) AS pending WHERE kind = %(game)s AND game_id = %(game_id)s AND piece_end > %(month_ago)s",
+                {**params, 'game_id': game_id}
             )
             stat.total_seconds_this_month = cursor.fetchone()[0]
             
@@ -47,13 +172,13 @@ class Command(BaseCommand):
             self.stdout.write(f"  {action}: {game_name} (+{total_seconds // 3600}h)")
         
         # 2. Aggregate user statistics
-        cursor.execute("""
-            SELECT DISTINCT user_id FROM tracker_gamesession
+        cursor.execute(f"""
+            SELECT DISTINCT user_id FROM ({PENDING_GAMES}) AS pending WHERE kind = %(game)s
             UNION
-            SELECT DISTINCT user_id FROM tracker_voicesession
+            SELECT DISTINCT user_id FROM ({PENDING_VOICE}) AS pending
             UNION
-            SELECT DISTINCT user_id FROM tracker_message
-        """)
+            SELECT DISTINCT user_id FROM tracker_message WHERE created_at <= %(cutoff)s
+        """, params)
         
         user_ids = [row[0] for row in cursor.fetchall()]
         
@@ -62,59 +187,60 @@ class Command(BaseCommand):
                 user = DiscordUser.objects.get(id=user_id)
                 
                 # Gaming hours
+                user_params = {**params, 'user_id': user_id}
                 cursor.execute(
-                    "SELECT COALESCE(SUM(duration_seconds), 0) FROM tracker_gamesession WHERE user_id = %s AND ended_at IS NOT NULL",
-                    [user_id]
+                    f"SELECT COALESCE(SUM(seconds), 0) FROM ({PENDING_GAMES}) AS pending WHERE kind = %(game)s AND user_id = %(user_id)s",
+                    user_params
                 )
                 gaming_seconds = cursor.fetchone()[0]
                 
                 cursor.execute(
-                    "SELECT COALESCE(SUM(duration_seconds), 0) FROM tracker_gamesession WHERE user_id = %s AND ended_at IS NOT NULL AND ended_at > %s",
-                    [user_id, week_ago]
+                    f"SELECT COALESCE(SUM(seconds), 0) FROM ({PENDING_GAMES}) AS pending WHERE kind = %(game)s AND user_id = %(user_id)s AND piece_end > %(week_ago)s",
+                    user_params
                 )
                 gaming_seconds_week = cursor.fetchone()[0]
                 
                 cursor.execute(
-                    "SELECT COALESCE(SUM(duration_seconds), 0) FROM tracker_gamesession WHERE user_id = %s AND ended_at IS NOT NULL AND ended_at > %s",
-                    [user_id, month_ago]
+                    f"SELECT COALESCE(SUM(seconds), 0) FROM ({PENDING_GAMES}) AS pending WHERE kind = %(game)s AND user_id = %(user_id)s AND piece_end > %(month_ago)s",
+                    user_params
                 )
                 gaming_seconds_month = cursor.fetchone()[0]
                 
                 # Voice hours
                 cursor.execute(
-                    "SELECT COALESCE(SUM(duration_seconds), 0) FROM tracker_voicesession WHERE user_id = %s AND ended_at IS NOT NULL",
-                    [user_id]
+                    f"SELECT COALESCE(SUM(seconds), 0) FROM ({PENDING_VOICE}) AS pending WHERE user_id = %(user_id)s",
+                    user_params
                 )
                 voice_seconds = cursor.fetchone()[0]
                 
                 cursor.execute(
-                    "SELECT COALESCE(SUM(duration_seconds), 0) FROM tracker_voicesession WHERE user_id = %s AND ended_at IS NOT NULL AND ended_at > %s",
-                    [user_id, week_ago]
+                    f"SELECT COALESCE(SUM(seconds), 0) FROM ({PENDING_VOICE}) AS pending WHERE user_id = %(user_id)s AND piece_end > %(week_ago)s",
+                    user_params
                 )
                 voice_seconds_week = cursor.fetchone()[0]
                 
                 cursor.execute(
-                    "SELECT COALESCE(SUM(duration_seconds), 0) FROM tracker_voicesession WHERE user_id = %s AND ended_at IS NOT NULL AND ended_at > %s",
-                    [user_id, month_ago]
+                    f"SELECT COALESCE(SUM(seconds), 0) FROM ({PENDING_VOICE}) AS pending WHERE user_id = %(user_id)s AND piece_end > %(month_ago)s",
+                    user_params
                 )
                 voice_seconds_month = cursor.fetchone()[0]
                 
                 # Messages
                 cursor.execute(
-                    "SELECT COUNT(*) FROM tracker_message WHERE user_id = %s",
-                    [user_id]
+                    "SELECT COUNT(*) FROM tracker_message WHERE user_id = %(user_id)s AND created_at <= %(cutoff)s",
+                    user_params
                 )
                 message_count = cursor.fetchone()[0]
                 
                 cursor.execute(
-                    "SELECT COUNT(*) FROM tracker_message WHERE user_id = %s AND created_at > %s",
-                    [user_id, week_ago]
+                    "SELECT COUNT(*) FROM tracker_message WHERE user_id = %(user_id)s AND created_at > %(week_ago)s AND created_at <= %(cutoff)s",
+                    user_params
                 )
                 message_count_week = cursor.fetchone()[0]
                 
                 cursor.execute(
-                    "SELECT COUNT(*) FROM tracker_message WHERE user_id = %s AND created_at > %s",
-                    [user_id, month_ago]
+                    "SELECT COUNT(*) FROM tracker_message WHERE user_id = %(user_id)s AND created_at > %(month_ago)s AND created_at <= %(cutoff)s",
+                    user_params
                 )
                 message_count_month = cursor.fetchone()[0]
                 
@@ -135,11 +261,26 @@ class Command(BaseCommand):
             except DiscordUser.DoesNotExist:
                 pass
         
-        # 3. Clear temporary tables
-        GameSession.objects.all().delete()
-        VoiceSession.objects.all().delete()
-        Message.objects.all().delete()
-        ActivityEvent.objects.all().delete()
-        
-        self.stdout.write(self.style.SUCCESS('✅ Statistics aggregated and temp tables cleared'))
-        cursor.close()
+        # 3. Aggregate per-user game statistics
+        cursor.execute(f"""
+            INSERT INTO tracker_usergamestatistic (user_id, game_id, total_seconds, total_sessions, last_updated)
+            SELECT user_id, game_id, COALESCE(SUM(seconds), 0), COUNT(*) FILTER (WHERE finished), NOW()
+            FROM ({PENDING_GAMES}) AS pending
+            WHERE kind = %(game)s
+            GROUP BY user_id, game_id
+            ON CONFLICT (user_id, game_id) DO UPDATE SET
+                total_seconds = tracker_usergamestatistic.total_seconds + EXCLUDED.total_seconds,
+                total_sessions = tracker_usergamestatistic.total_sessions + EXCLUDED.total_sessions,
+                last_updated = NOW()
+        """, params)
+        self.stdout.write(f"  Per-user game rows: {cursor.rowcount}")
+
+    def aggregate_sharded(self, workers, shards, cutoff, week_ago, month_ago):
+        """Steps 1-3 on a process pool: one upsert per table per shard, each shard on its own connection"""
+        shards = shards or workers
+        self.stdout.write(f"  Aggregating {shards} shards on {workers} workers...")
+        totals = [0, 0, 0]
+        for shard, games, users, user_games in run_shards(workers, cutoff, week_ago, month_ago, shards):
+            self.stdout.write(f"  Shard {shard + 1}/{shards}: {games} games, {users} users, {user_games} per-user game rows")
+            totals = [total + count for total, count in zip(totals, (games, users, user_games))]
+        self.stdout.write(f"  Games: {totals[0]}, users: {totals[1]}, per-user game rows: {totals[2]}")
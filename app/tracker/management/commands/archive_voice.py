@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from tracker.occupancy import archive_voice_sessions
+
+
+class Command(BaseCommand):
+    help = 'Copy the current voice sessions into the permanent, range-indexed voice history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cutoff', type=parse_datetime, default=None, help='Count session time up to this moment (default: now)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            archived = archive_voice_sessions(options['cutoff'] or timezone.now())
+        self.stdout.write(self.style.SUCCESS(f"✅ Archived {archived} voice sessions"))
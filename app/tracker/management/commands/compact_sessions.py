@@ -0,0 +1,68 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Closed sessions of the same user on the same activity/channel whose gap is within the grace window
+# are merged into the earliest row; the rest of the island is deleted. The merged duration spans
+# the whole island, matching what the bot records when it reopens a session live, and time an
+# earlier aggregation already counted stays counted. Only sessions that ended by the cutoff are
+# merged, so a run never sees a session it is aggregating grow past its cutoff.
+COMPACT_SQL = """
+    WITH ordered AS (
+        SELECT id, user_id, {key}, started_at, ended_at, counted_until,
+               CASE WHEN started_at - MAX(ended_at) OVER (
+                        PARTITION BY user_id, {key} ORDER BY started_at, id
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                    ) <= make_interval(secs => %(grace)s)
+                    THEN 0 ELSE 1 END AS starts_island
+        FROM {table}
+        WHERE ended_at <= %(until)s
+    ),
+    islands AS (
+        SELECT *, SUM(starts_island) OVER (PARTITION BY user_id, {key} ORDER BY started_at, id) AS island
+        FROM ordered
+    ),
+    merged AS (
+        SELECT MIN(id) AS keep_id, MIN(started_at) AS started_at, MAX(ended_at) AS ended_at,
+               MAX(counted_until) AS counted_until, ARRAY_AGG(id) AS ids
+        FROM islands
+        GROUP BY user_id, {key}, island
+        HAVING COUNT(*) > 1
+    ),
+    extended AS (
+        UPDATE {table} s
+        SET started_at = m.started_at,
+            ended_at = m.ended_at,
+            counted_until = m.counted_until,
+            duration_seconds = EXTRACT(EPOCH FROM (m.ended_at - m.started_at))::int
+        FROM merged m
+        WHERE s.id = m.keep_id
+    )
+    DELETE FROM {table} s
+    USING merged m
+    WHERE s.id = ANY(m.ids) AND s.id <> m.keep_id
+"""
+
+
+class Command(BaseCommand):
+    help = 'Merge closed activity/voice sessions that were split by brief disconnects'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=int(os.getenv('SESSION_GRACE_SECONDS', '120')), help='Largest gap (seconds) bridged between two sessions')
+        parser.add_argument('--until', type=parse_datetime, default=None, help='Only merge sessions that ended by this moment (default: now)')
+        parser.add_argument('--dry-run', action='store_true', help='Report how many rows would be merged without changing anything')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cursor = connection.cursor()
+            for label, table, key in [
+                ('Activity', 'tracker_activitysession', 'kind, game_id'),
+                ('Voice', 'tracker_voicesession', 'channel_id'),
+            ]:
+                cursor.execute(COMPACT_SQL.format(table=table, key=key), {'grace': options['grace'], 'until': options['until'] or timezone.now()})
+                self.stdout.write(f"  {label} sessions merged away: {cursor.rowcount}")
+            if options['dry_run']:
+                transaction.set_rollback(True)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.exports import EXPORTS, EXPORT_FORMATS, parse_export_filters
+
+
+class Command(BaseCommand):
+    help = 'Stream sessions, messages, metrics or statistics to CSV/NDJSON without loading them into memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--since', help='Date or datetime, inclusive')
+        parser.add_argument('--until', help='Date or datetime; a bare date includes that whole day')
+        parser.add_argument('--user', help='Discord user id')
+        parser.add_argument('--game', help='Exact game name')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        export = EXPORTS[options['export']]
+        try:
+            filters = parse_export_filters(options['since'], options['until'], options['user'], options['game'])
+            queryset = export.queryset(**filters)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if not options['output']:
+            for chunk in export.stream(queryset, options['format']):
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for chunk in export.stream(queryset, options['format']):
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"✅ Exported {options['export']} to {options['output']}"))
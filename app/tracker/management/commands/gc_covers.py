@@ -0,0 +1,58 @@
+import os
+import time
+
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+
+from tracker.covers import COVERS_DIR, LEGACY_COVERS_DIR
+from tracker.models import AMPServer
+
+
+class Command(BaseCommand):
+    help = 'Delete cover image files that no AMPServer references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=float, default=24, help='Hours a file must be unreferenced-old before it is deleted')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted without deleting it')
+
+    def handle(self, *args, **options):
+        # 1. Every filename the database still points at, in one query
+        referenced = set()
+        for cover_image, variants in AMPServer.objects.values_list('cover_image', 'cover_variants'):
+            if cover_image:
+                referenced.add(cover_image.rsplit('/', 1)[-1])
+            referenced.update(variant['url'].rsplit('/', 1)[-1] for variant in variants)
+
+        # 2. One scan per directory; files newer than the grace period may belong to an uncommitted run
+        cutoff = time.time() - options['grace'] * 3600
+        orphans = []
+        for directory in (COVERS_DIR, LEGACY_COVERS_DIR):
+            if not directory.is_dir():
+                continue
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.is_file() or entry.name in referenced:
+                        continue
+                    stat = entry.stat()
+                    if stat.st_mtime > cutoff:
+                        continue
+                    # The legacy directory is shared with collectstatic output
+                    if directory == LEGACY_COVERS_DIR and finders.find(f'images/{entry.name}'):
+                        continue
+                    orphans.append((entry.path, stat.st_size))
+
+        # 3. Delete the set difference
+        reclaimed = 0
+        for path, size in orphans:
+            if not options['dry_run']:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    continue
+            reclaimed += size
+
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f"🧹 {verb} {len(orphans)} orphaned cover file(s), {reclaimed / 1024:.1f} KB reclaimed "
+            f"({len(referenced)} referenced)"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user rank/percentile index from UserStatistic'
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔄 Rebuilding user rank index...")
+
+        # Swap the whole index in one transaction so profile pages never see a partial rebuild
+        with transaction.atomic():
+            cursor = connection.cursor()
+            cursor.execute("DELETE FROM tracker_userrank")
+            cursor.execute("""
+                INSERT INTO tracker_userrank (
+                    user_id,
+                    gaming_rank, gaming_percentile,
+                    voice_rank, voice_percentile,
+                    messages_rank, messages_percentile,
+                    computed_at
+                )
+                SELECT user_id,
+                       RANK() OVER (ORDER BY total_gaming_seconds DESC),
+                       100 * PERCENT_RANK() OVER (ORDER BY total_gaming_seconds),
+                       RANK() OVER (ORDER BY total_voice_seconds DESC),
+                       100 * PERCENT_RANK() OVER (ORDER BY total_voice_seconds),
+                       RANK() OVER (ORDER BY total_messages DESC),
+                       100 * PERCENT_RANK() OVER (ORDER BY total_messages),
+                       NOW()
+                FROM tracker_userstatistic
+            """)
+            ranked = cursor.rowcount
+            cursor.close()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Ranked {ranked} users'))
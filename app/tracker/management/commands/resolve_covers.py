@@ -0,0 +1,137 @@
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from PIL import UnidentifiedImageError
+
+from tracker.covers import process_cover
+from tracker.igdb import IGDB_MULTIQUERY_SIZE, IGDBClient, IGDBError, normalize_game_name
+from tracker.models import AMPServer, Game, IGDBGame, IGDBToken
+
+# How long a lookup result is trusted before IGDB is asked again
+CACHE_TTL = {
+    IGDBGame.FOUND: timedelta(days=30),
+    IGDBGame.NOT_FOUND: timedelta(days=7),
+    IGDBGame.ERROR: timedelta(hours=1),
+}
+
+
+class Command(BaseCommand):
+    help = 'Resolve and download IGDB cover art for AMP game servers that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep checking for new servers instead of exiting')
+        parser.add_argument('--interval', type=float, default=float(os.getenv('COVER_POLL_INTERVAL', '60')), help='Seconds between checks')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent cover downloads')
+        parser.add_argument('--gc-interval', type=float, default=6, help='Hours between gc_covers runs in --loop mode')
+
+    def handle(self, *args, **options):
+        client = IGDBClient.from_env(token_store=IGDBToken)
+        try:
+            if not options['loop']:
+                self.resolve(client, options['workers'])
+                return
+
+            self.stdout.write(f"🔁 Resolving covers every {options['interval']}s")
+            last_gc = None
+            while True:
+                try:
+                    self.resolve(client, options['workers'])
+                    if last_gc is None or time.monotonic() - last_gc > options['gc_interval'] * 3600:
+                        call_command('gc_covers', stdout=self.stdout)
+                        last_gc = time.monotonic()
+                except (IGDBError, DatabaseError, OSError) as e:
+                    self.stdout.write(self.style.WARNING(f"Cover resolution failed: {e}"))
+                finally:
+                    close_old_connections()
+                time.sleep(options['interval'] * random.uniform(0.9, 1.1))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            client.close()
+
+    def lookup(self, client, names):
+        """Return {normalized name: IGDBGame}, asking IGDB only about names with no fresh cache entry"""
+        names_by_key = {}
+        for name in names:
+            names_by_key.setdefault(normalize_game_name(name), name)
+
+        entries = {entry.normalized_name: entry for entry in IGDBGame.objects.filter(normalized_name__in=names_by_key)}
+        stale = [key for key in names_by_key if key not in entries or not entries[key].is_fresh()]
+
+        refreshed = []
+        for start in range(0, len(stale), IGDB_MULTIQUERY_SIZE):
+            batch = stale[start:start + IGDB_MULTIQUERY_SIZE]
+            try:
+                matches = client.lookup_games([names_by_key[key] for key in batch])
+            except IGDBError as e:
+                self.stdout.write(self.style.WARNING(str(e)))
+                matches = None
+
+            now = timezone.now()
+            for key in batch:
+                entry = entries.get(key) or IGDBGame(normalized_name=key, name=names_by_key[key])
+                if matches is None:
+                    # Keep whatever an earlier lookup found; only a brand-new name is recorded as an error
+                    entry.status = entry.status or IGDBGame.ERROR
+                    entry.expires_at = now + CACHE_TTL[IGDBGame.ERROR]
+                else:
+                    match = matches[names_by_key[key]]
+                    entry.igdb_id, entry.cover_image_id = match or (None, None)
+                    entry.status = IGDBGame.FOUND if match else IGDBGame.NOT_FOUND
+                    entry.fetched_at = now
+                    entry.expires_at = now + CACHE_TTL[entry.status]
+                entry.fetched_at = entry.fetched_at or now
+                entries[key] = entry
+                refreshed.append(entry)
+
+        IGDBGame.objects.bulk_create(
+            refreshed,
+            update_conflicts=True,
+            unique_fields=['normalized_name'],
+            update_fields=['name', 'igdb_id', 'cover_image_id', 'status', 'fetched_at', 'expires_at'],
+        )
+        return entries
+
+    def resolve(self, client, workers):
+        """Look up covers for coverless game servers and tracked games, then download server covers concurrently"""
+        # Covers downloaded before processing existed have no variants and are redone too
+        servers = list(AMPServer.objects.filter(Q(cover_image=None) | Q(cover_variants=[])).exclude(module='ADS'))
+        names = {server.pk: server.module_display_name or server.friendly_name for server in servers}
+        game_names = Game.objects.filter(statistic__isnull=False).values_list('name', flat=True)
+
+        entries = self.lookup(client, [*names.values(), *game_names])
+        if not servers:
+            return
+
+        def download(server):
+            entry = entries[normalize_game_name(names[server.pk])]
+            if entry.status == IGDBGame.ERROR:
+                return None
+            image_id = entry.cover_image_id
+            if image_id:
+                try:
+                    width, height, variants = process_cover(client.download_cover(image_id), names[server.pk])
+                except (IGDBError, UnidentifiedImageError) as e:
+                    # Left pending so the next run retries it
+                    self.stdout.write(self.style.WARNING(str(e)))
+                    return None
+                # The largest JPEG doubles as the plain src for clients without srcset support
+                server.cover_image = variants[-1]['url']
+                server.cover_width, server.cover_height, server.cover_variants = width, height, variants
+            server.cover_fetched = True
+            return server
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='covers') as executor:
+            resolved = [server for server in executor.map(download, servers) if server]
+
+        AMPServer.objects.bulk_update(resolved, ['cover_image', 'cover_fetched', 'cover_width', 'cover_height', 'cover_variants'])
+        found = sum(1 for server in resolved if server.cover_image)
+        self.stdout.write(self.style.SUCCESS(f'Covers: {found} found, {len(resolved) - found} without a match, {len(servers) - len(resolved)} retrying'))
@@ -0,0 +1,247 @@
+import io
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import RequestFactory
+
+from analytics import views as analytics_views
+from analytics.instrumentation import QueryRecorder
+from home import views as home_views
+from home.widgets import HOME_WIDGETS
+from tracker.exports import EXPORTS
+from tracker.models import Channel, DiscordUser
+
+
+class RollbackBenchmark(Exception):
+    """Raised inside a benchmark transaction to discard its writes"""
+
+
+class StubAMPAPI:
+    """Answers AMP calls in-process so fetch_amp_servers can be timed offline"""
+    def __init__(self, instances=25):
+        self.instances = instances
+
+    def instance(self, i):
+        return {
+            'InstanceID': f'bench-instance-{i}',
+            'InstanceName': f'BenchInstance{i}',
+            'FriendlyName': f'Bench Server {i}',
+            'Module': 'GenericModule',
+            'ModuleDisplayName': f'Bench Game {i}',
+            'IP': '127.0.0.1',
+            'Port': 27000 + i,
+            'Running': True,
+            'AppState': 20,
+            'Metrics': {
+                'CPU Usage': {'RawValue': 12},
+                'Memory Usage': {'RawValue': 2048},
+                'Active Users': {'RawValue': i % 8},
+            },
+        }
+
+    def status(self, i):
+        return {
+            'State': 20,
+            'Uptime': f'0.0{i % 10}:15:00',
+            'Metrics': {
+                'CPU Usage': {'RawValue': 12},
+                'Memory Usage': {'RawValue': 2048},
+                'Active Users': {'RawValue': i % 8},
+                'TPS': {'RawValue': 20},
+            },
+        }
+
+    def response(self, url, payload, status=200, headers=None):
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response._content = json.dumps(payload).encode()
+        response.headers['Content-Type'] = 'application/json'
+        response.headers.update(headers or {})
+        return response
+
+    def __call__(self, method, url, *args, **kwargs):
+        if url.endswith('/API/Core/Login'):
+            return self.response(url, {'success': True}, headers={'Authorization': 'Bearer bench-token'})
+        if url.endswith('/API/ADSModule/GetInstances'):
+            return self.response(url, [{'AvailableInstances': [self.instance(i) for i in range(self.instances)]}])
+        if '/API/ADSModule/Servers/bench-instance-' in url:
+            i = int(url.split('/API/ADSModule/Servers/bench-instance-')[1].split('/')[0])
+            if url.endswith('/API/Core/GetStatus'):
+                return self.response(url, self.status(i))
+            return self.response(url, {'result': {f'player-{i}-{n}': f'Player{n}' for n in range(i % 8)}})
+        return self.response(url, {}, status=404)
+
+
+class Command(BaseCommand):
+    help = 'Time the web views and management commands against the current database and compare with baselines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (median is reported)')
+        parser.add_argument('--case', action='append', dest='cases', help='Only run the named case (repeatable)')
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'))
+        parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown before flagging a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument('--amp-instances', type=int, default=25, help='Instances returned by the stubbed AMP API')
+
+    def handle(self, *args, **options):
+        self.factory = RequestFactory()
+        self.recorder = None
+        self.staff = User(username='benchmark', is_staff=True, is_active=True)
+        self.amp_stub = StubAMPAPI(instances=options['amp_instances'])
+
+        cases = self.cases()
+        if options['cases']:
+            unknown = set(options['cases']) - set(cases)
+            if unknown:
+                raise CommandError(f"Unknown benchmark case(s): {', '.join(sorted(unknown))}")
+            cases = {name: cases[name] for name in options['cases']}
+
+        results = {}
+        for name, case in cases.items():
+            self.stdout.write(f"⏱️  {name}...")
+            results[name] = self.measure(case, options['repeat'])
+
+        baseline_path = Path(options['baseline'])
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        regressions = self.report(results, baseline, options['tolerance'])
+
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {baseline_path}"))
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"Performance regressions: {', '.join(regressions)}")
+
+    def cases(self):
+        profile_id = DiscordUser.objects.order_by('id').values_list('discord_id', flat=True).first()
+        # Spans only exist once aggregation has archived the voice sessions; either one gives the view something to draw
+        voice_channel_id = Channel.objects.filter(
+            Q(voicespan__isnull=False) | Q(voicesession__isnull=False)
+        ).order_by('id').values_list('id', flat=True).first()
+        cases = {
+            # A cold page load both ways: the shell plus every lazily fetched widget, and the streamed page
+            'home': lambda: (cache.clear(), self.get(home_views.HomeView, '/'), self.get_widgets()),
+            # Widget queries run on worker-thread connections; the request's recorder follows them there
+            'home.async': lambda: (cache.clear(), self.get(home_views.AsyncHomeView, '/')),
+            'analytics.dashboard': lambda: self.get(analytics_views.AnalyticsDashboardView, '/analytics/'),
+            'analytics.games': lambda: self.get(analytics_views.GameStatsView, '/analytics/games/'),
+            'analytics.partners': lambda: self.get(analytics_views.PlayPartnersView, '/analytics/partners/'),
+            'analytics.heatmap': lambda: self.get(analytics_views.ActivityHeatmapView, '/analytics/heatmap/'),
+            'analytics.voice': lambda: self.get(analytics_views.VoiceStatsView, '/analytics/voice/'),
+            'analytics.messages': lambda: self.get(analytics_views.MessageStatsView, '/analytics/messages/'),
+            'analytics.performance': lambda: self.get(analytics_views.PerformanceView, '/analytics/performance/'),
+            'aggregate_statistics': lambda: self.in_rollback(call_command, 'aggregate_statistics', workers=1, stdout=io.StringIO()),
+            'fetch_amp_servers': lambda: self.in_rollback(self.fetch_amp_servers),
+        }
+        for name, widget in HOME_WIDGETS.items():
+            cases[f'widget.{name}'] = lambda name=name, widget=widget: (
+                cache.delete(widget.cache_key),
+                self.get(home_views.WidgetView, f'/widgets/{name}/', name=name),
+            )
+        # Each export streamed in full, as a download would
+        for name in EXPORTS:
+            cases[f'export.{name}'] = lambda name=name: self.get(analytics_views.ExportView, f'/analytics/export/{name}/', name=name)
+        if profile_id is not None:
+            cases['profile'] = lambda: self.get(home_views.UserProfileView, f'/u/{profile_id}/', discord_id=profile_id)
+        if voice_channel_id is not None:
+            cases['analytics.voice_channel'] = lambda: self.get(
+                analytics_views.VoiceChannelView, f'/analytics/voice/channels/{voice_channel_id}/', channel_id=voice_channel_id,
+            )
+        return cases
+
+    def get_widgets(self):
+        for name in HOME_WIDGETS:
+            self.get(home_views.WidgetView, f'/widgets/{name}/', name=name)
+
+    def get(self, view_class, path, **kwargs):
+        request = self.factory.get(path)
+        request.user = self.staff
+        request.query_recorder = self.recorder
+        view = view_class.as_view()
+        response = async_to_sync(view)(request, **kwargs) if view_class.view_is_async else view(request, **kwargs)
+        if response.status_code != 200:
+            raise CommandError(f"{path} returned {response.status_code}")
+        if response.streaming:
+            async_to_sync(self.consume)(response)
+        return response
+
+    async def consume(self, response):
+        async for _ in response:
+            pass
+
+    def in_rollback(self, func, *args, **kwargs):
+        """Run a writing benchmark and discard everything it wrote"""
+        try:
+            with transaction.atomic():
+                func(*args, **kwargs)
+                raise RollbackBenchmark
+        except RollbackBenchmark:
+            pass
+
+    def fetch_amp_servers(self):
+        with mock.patch('requests.sessions.Session.request', new=self.amp_stub):
+            call_command('fetch_amp_servers', stdout=io.StringIO())
+
+    def measure(self, case, repeat):
+        case()  # Warm up caches, connections and template loading
+
+        # One recorder for this thread's connection and, through the requests, any worker threads
+        timings = []
+        self.recorder = QueryRecorder()
+        with connection.execute_wrapper(self.recorder):
+            for _ in range(repeat):
+                started = time.perf_counter()
+                case()
+                timings.append(time.perf_counter() - started)
+        query_count = self.recorder.count // repeat
+        self.recorder = None
+
+        # Peak memory is measured on a separate run so tracing overhead doesn't skew timings
+        tracemalloc.start()
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'wall_ms': round(statistics.median(timings) * 1000, 2),
+            'queries': query_count,
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def report(self, results, baseline, tolerance):
+        regressions = []
+        self.stdout.write("")
+        self.stdout.write(f"{'case':<24}{'wall ms':>12}{'queries':>10}{'peak KB':>12}   vs baseline")
+        for name, result in results.items():
+            previous = baseline.get(name)
+            note = ''
+            if previous:
+                slower = result['wall_ms'] > previous['wall_ms'] * (1 + tolerance)
+                more_queries = result['queries'] > previous['queries']
+                more_memory = result['peak_kb'] > previous['peak_kb'] * (1 + tolerance)
+                note = (
+                    f"{result['wall_ms'] - previous['wall_ms']:+.1f}ms, "
+                    f"{result['queries'] - previous['queries']:+d}q, "
+                    f"{result['peak_kb'] - previous['peak_kb']:+.0f}KB"
+                )
+                if slower or more_queries or more_memory:
+                    regressions.append(name)
+                    note = self.style.ERROR(f"{note}  REGRESSION")
+            self.stdout.write(f"{name:<24}{result['wall_ms']:>12.1f}{result['queries']:>10}{result['peak_kb']:>12.1f}   {note}")
+        return regressions
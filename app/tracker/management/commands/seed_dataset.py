@@ -0,0 +1,265 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from tracker.models import ActivitySession
+
+# Seeded users get discord ids above this so they never collide with real members
+SEED_DISCORD_ID_BASE = 900000000000000000
+
+
+class Command(BaseCommand):
+    help = 'Seed the database with a synthetic, reproducible activity history for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument('--games', type=int, default=500)
+        parser.add_argument('--channels', type=int, default=25)
+        parser.add_argument('--game-sessions', type=int, default=5000000)
+        parser.add_argument('--voice-sessions', type=int, default=1000000)
+        parser.add_argument('--messages', type=int, default=20000000)
+        parser.add_argument('--open-sessions', type=int, default=500, help='Game and voice sessions left open (ended_at IS NULL)')
+        parser.add_argument('--servers', type=int, default=10)
+        parser.add_argument('--days', type=int, default=365, help='Length of the generated history')
+        parser.add_argument('--metric-interval', type=int, default=5, help='Minutes between AMP metric samples')
+        parser.add_argument('--chunk-size', type=int, default=500000, help='Rows generated per INSERT statement')
+        parser.add_argument('--seed', type=float, default=0.42, help='Postgres setseed() value, between -1 and 1')
+        parser.add_argument('--skip-statistics', action='store_true', help='Do not seed cumulative UserStatistic/GameStatistic rows')
+        parser.add_argument('--flush', action='store_true', help='Truncate all tracker tables first')
+        parser.add_argument('--force', action='store_true', help='Allow seeding when DEBUG is off')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('seed_dataset requires PostgreSQL')
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to seed a non-DEBUG database without --force')
+
+        self.chunk_size = options['chunk_size']
+        self.days = options['days']
+        cursor = connection.cursor()
+
+        if options['flush']:
+            self.stdout.write("🧹 Truncating tracker tables...")
+            cursor.execute("""
+                TRUNCATE tracker_discorduser, tracker_gamestatistic, tracker_ampserver, tracker_game, tracker_channel
+                RESTART IDENTITY CASCADE
+            """)
+
+        cursor.execute("SELECT setseed(%s)", [options['seed']])
+
+        self.seed_users(cursor, options['users'])
+        self.seed_dimensions(cursor, options['games'], options['channels'])
+        self.seed_game_sessions(cursor, options['game_sessions'], options['games'], options['open_sessions'])
+        self.seed_voice_sessions(cursor, options['voice_sessions'], options['channels'], options['open_sessions'])
+        self.seed_messages(cursor, options['messages'], options['channels'])
+        self.seed_amp_metrics(cursor, options['servers'], options['metric_interval'])
+        if not options['skip_statistics']:
+            self.seed_statistics(cursor)
+
+        cursor.execute("DROP TABLE IF EXISTS seed_users, seed_games, seed_channels")
+        cursor.execute("ANALYZE")
+        cursor.close()
+        self.stdout.write(self.style.SUCCESS('✅ Synthetic dataset seeded'))
+
+    def chunks(self, total):
+        """Yield row counts so each INSERT generates at most chunk_size rows"""
+        remaining = total
+        while remaining > 0:
+            size = min(self.chunk_size, remaining)
+            yield size
+            remaining -= size
+
+    def seed_users(self, cursor, count):
+        self.stdout.write(f"  Users: {count}")
+        with transaction.atomic():
+            cursor.execute("""
+                INSERT INTO tracker_discorduser (discord_id, username, created_at, updated_at)
+                SELECT %s + g, 'seed_user_' || g, NOW(), NOW()
+                FROM generate_series(1, %s) AS g
+                ON CONFLICT (discord_id) DO NOTHING
+            """, [SEED_DISCORD_ID_BASE, count])
+
+        # Dense index -> user id lookup so generated rows can pick a random existing user
+        cursor.execute("DROP TABLE IF EXISTS seed_users")
+        cursor.execute("""
+            CREATE UNLOGGED TABLE seed_users AS
+            SELECT ROW_NUMBER() OVER (ORDER BY id)::int AS idx, id
+            FROM tracker_discorduser
+            WHERE discord_id > %s AND discord_id <= %s
+        """, [SEED_DISCORD_ID_BASE, SEED_DISCORD_ID_BASE + count])
+        cursor.execute("CREATE UNIQUE INDEX ON seed_users (idx)")
+        cursor.execute("ANALYZE seed_users")
+
+    def seed_dimensions(self, cursor, games, channels):
+        self.stdout.write(f"  Games: {games}, channels: {channels}")
+        with transaction.atomic():
+            cursor.execute("""
+                INSERT INTO tracker_game (name, created_at)
+                SELECT 'Seed Game ' || g, NOW()
+                FROM generate_series(1, %s) AS g
+                ON CONFLICT (name) DO NOTHING
+            """, [games])
+            cursor.execute("""
+                INSERT INTO tracker_channel (discord_id, name, created_at)
+                SELECT %s + g, 'seed-channel-' || g, NOW()
+                FROM generate_series(1, %s) AS g
+                ON CONFLICT (discord_id) DO NOTHING
+            """, [SEED_DISCORD_ID_BASE, channels])
+
+        # Same dense index -> id lookups as seed_users
+        cursor.execute("DROP TABLE IF EXISTS seed_games, seed_channels")
+        cursor.execute("""
+            CREATE UNLOGGED TABLE seed_games AS
+            SELECT substring(name FROM 11)::int AS idx, id
+            FROM tracker_game
+            WHERE name ~ '^Seed Game [0-9]+$' AND substring(name FROM 11)::int <= %s
+        """, [games])
+        cursor.execute("""
+            CREATE UNLOGGED TABLE seed_channels AS
+            SELECT (discord_id - %s)::int AS idx, id
+            FROM tracker_channel
+            WHERE discord_id > %s AND discord_id <= %s
+        """, [SEED_DISCORD_ID_BASE, SEED_DISCORD_ID_BASE, SEED_DISCORD_ID_BASE + channels])
+        cursor.execute("CREATE UNIQUE INDEX ON seed_games (idx)")
+        cursor.execute("CREATE UNIQUE INDEX ON seed_channels (idx)")
+        cursor.execute("ANALYZE seed_games")
+        cursor.execute("ANALYZE seed_channels")
+
+    def seed_game_sessions(self, cursor, count, games, open_count):
+        self.stdout.write(f"  Game sessions: {count}")
+        users = self.seeded_user_count(cursor)
+        for size in self.chunks(count):
+            with transaction.atomic():
+                # power(random(), 3) skews play time towards a handful of popular games
+                cursor.execute("""
+                    INSERT INTO tracker_activitysession (user_id, game_id, kind, started_at, ended_at, duration_seconds)
+                    SELECT u.id, g.id, %s, s.started_at, s.started_at + s.duration * INTERVAL '1 second', s.duration
+                    FROM (
+                        SELECT 1 + floor(random() * %s)::int AS user_idx,
+                               1 + floor(power(random(), 3) * %s)::int AS game_idx,
+                               NOW() - random() * (%s * INTERVAL '1 day') AS started_at,
+                               (60 + floor(random() * random() * 14400))::int AS duration
+                        FROM generate_series(1, %s)
+                    ) AS s
+                    JOIN seed_users u ON u.idx = s.user_idx
+                    JOIN seed_games g ON g.idx = s.game_idx
+                """, [ActivitySession.GAME, users, games, self.days, size])
+
+        with transaction.atomic():
+            cursor.execute("""
+                INSERT INTO tracker_activitysession (user_id, game_id, kind, started_at, ended_at, duration_seconds)
+                SELECT u.id, g.id, %s, s.started_at, NULL, 0
+                FROM (
+                    SELECT 1 + floor(random() * %s)::int AS user_idx,
+                           1 + floor(power(random(), 3) * %s)::int AS game_idx,
+                           NOW() - random() * INTERVAL '3 hours' AS started_at
+                    FROM generate_series(1, %s)
+                ) AS s
+                JOIN seed_users u ON u.idx = s.user_idx
+                JOIN seed_games g ON g.idx = s.game_idx
+            """, [ActivitySession.GAME, users, games, open_count])
+
+    def seed_voice_sessions(self, cursor, count, channels, open_count):
+        self.stdout.write(f"  Voice sessions: {count}")
+        users = self.seeded_user_count(cursor)
+        for size in self.chunks(count):
+            with transaction.atomic():
+                cursor.execute("""
+                    INSERT INTO tracker_voicesession (user_id, channel_id, started_at, ended_at, duration_seconds)
+                    SELECT u.id, c.id, s.started_at, s.started_at + s.duration * INTERVAL '1 second', s.duration
+                    FROM (
+                        SELECT 1 + floor(random() * %s)::int AS user_idx,
+                               1 + floor(power(random(), 2) * %s)::int AS channel_idx,
+                               NOW() - random() * (%s * INTERVAL '1 day') AS started_at,
+                               (30 + floor(random() * random() * 10800))::int AS duration
+                        FROM generate_series(1, %s)
+                    ) AS s
+                    JOIN seed_users u ON u.idx = s.user_idx
+                    JOIN seed_channels c ON c.idx = s.channel_idx
+                """, [users, channels, self.days, size])
+
+        with transaction.atomic():
+            cursor.execute("""
+                INSERT INTO tracker_voicesession (user_id, channel_id, started_at, ended_at, duration_seconds)
+                SELECT u.id, c.id, s.started_at, NULL, 0
+                FROM (
+                    SELECT 1 + floor(random() * %s)::int AS user_idx,
+                           1 + floor(power(random(), 2) * %s)::int AS channel_idx,
+                           NOW() - random() * INTERVAL '2 hours' AS started_at
+                    FROM generate_series(1, %s)
+                ) AS s
+                JOIN seed_users u ON u.idx = s.user_idx
+                JOIN seed_channels c ON c.idx = s.channel_idx
+            """, [users, channels, open_count])
+
+    def seed_messages(self, cursor, count, channels):
+        self.stdout.write(f"  Messages: {count}")
+        users = self.seeded_user_count(cursor)
+        for size in self.chunks(count):
+            with transaction.atomic():
+                cursor.execute("""
+                    INSERT INTO tracker_message (user_id, channel_id, message_length, created_at)
+                    SELECT u.id, c.id, s.message_length, s.created_at
+                    FROM (
+                        SELECT 1 + floor(power(random(), 2) * %s)::int AS user_idx,
+                               1 + floor(power(random(), 2) * %s)::int AS channel_idx,
+                               (1 + floor(random() * random() * 2000))::int AS message_length,
+                               NOW() - random() * (%s * INTERVAL '1 day') AS created_at
+                        FROM generate_series(1, %s)
+                    ) AS s
+                    JOIN seed_users u ON u.idx = s.user_idx
+                    JOIN seed_channels c ON c.idx = s.channel_idx
+                """, [users, channels, self.days, size])
+
+    def seed_amp_metrics(self, cursor, servers, interval_minutes):
+        self.stdout.write(f"  AMP servers: {servers} ({self.days} days of metrics every {interval_minutes}min)")
+        with transaction.atomic():
+            cursor.execute("""
+                INSERT INTO tracker_ampserver (
+                    instance_id, instance_name, friendly_name, module, module_display_name,
+                    ip, port, running, app_state, cpu_usage_percent, memory_usage_mb, active_users,
+                    uptime, players, controller,
+                    cover_image, cover_fetched, cover_variants, display_order, updated_at, created_at
+                )
+                SELECT 'seed-instance-' || g, 'SeedInstance' || g, 'Seed Server ' || g, 'GenericModule', 'Seed Game ' || g,
+                       '127.0.0.1', 27000 + g, TRUE, 20, 0, 0, 0,
+                       '', '[]', '',
+                       NULL, TRUE, '[]', g, NOW(), NOW()
+                FROM generate_series(1, %s) AS g
+                ON CONFLICT (instance_id) DO NOTHING
+            """, [servers])
+            cursor.execute("""
+                INSERT INTO tracker_ampservermetric (server_id, cpu_usage_percent, memory_usage_mb, active_users, recorded_at)
+                SELECT s.id, random() * 100, 512 + random() * 8192, floor(random() * 16)::int, t
+                FROM tracker_ampserver s
+                CROSS JOIN generate_series(NOW() - %s * INTERVAL '1 day', NOW(), %s * INTERVAL '1 minute') AS t
+                WHERE s.instance_id LIKE 'seed-instance-%%'
+            """, [self.days, interval_minutes])
+
+    def seed_statistics(self, cursor):
+        self.stdout.write("  Cumulative statistics")
+        with transaction.atomic():
+            cursor.execute("""
+                INSERT INTO tracker_userstatistic (
+                    user_id, total_gaming_seconds, total_voice_seconds, total_messages,
+                    total_gaming_seconds_this_week, total_gaming_seconds_this_month,
+                    total_voice_seconds_this_week, total_voice_seconds_this_month,
+                    total_messages_this_week, total_messages_this_month, last_updated
+                )
+                SELECT id, floor(random() * 3600000), floor(random() * 1800000), floor(random() * 20000),
+                       0, 0, 0, 0, 0, 0, NOW()
+                FROM seed_users
+                ON CONFLICT (user_id) DO NOTHING
+            """)
+            cursor.execute("""
+                INSERT INTO tracker_gamestatistic (
+                    game_id, total_seconds, total_sessions, total_seconds_this_week, total_seconds_this_month, last_updated
+                )
+                SELECT id, floor(random() * 360000000), floor(random() * 100000), 0, 0, NOW()
+                FROM seed_games
+                ON CONFLICT (game_id) DO NOTHING
+            """)
+
+    def seeded_user_count(self, cursor):
+        cursor.execute("SELECT COUNT(*) FROM seed_users")
+        return cursor.fetchone()[0]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-19 14:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0010_gamestatistic_total_seconds_this_month_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRank',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rank', serialize=False, to='tracker.discorduser')),
+                ('gaming_rank', models.IntegerField(default=0)),
+                ('gaming_percentile', models.FloatField(default=0)),
+                ('voice_rank', models.IntegerField(default=0)),
+                ('voice_percentile', models.FloatField(default=0)),
+                ('messages_rank', models.IntegerField(default=0)),
+                ('messages_percentile', models.FloatField(default=0)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserHourlyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.SmallIntegerField()),
+                ('gaming_seconds', models.BigIntegerField(default=0)),
+                ('voice_seconds', models.BigIntegerField(default=0)),
+                ('messages', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_activity', to='tracker.discorduser')),
+            ],
+            options={
+                'ordering': ['hour'],
+                'unique_together': {('user', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserGameStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_name', models.CharField(max_length=255)),
+                ('total_seconds', models.BigIntegerField(default=0)),
+                ('total_sessions', models.IntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='game_statistics', to='tracker.discorduser')),
+            ],
+            options={
+                'ordering': ['-total_seconds'],
+                'unique_together': {('user', 'game_name')},
+            },
+        ),
+    ]
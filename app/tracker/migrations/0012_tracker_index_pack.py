@@ -0,0 +1,65 @@
+# Generated by Django 4.2 on 2026-10-19 14:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0011_user_rollups_and_ranks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gamesession',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='tracker.discorduser'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='tracker.discorduser'),
+        ),
+        migrations.AlterField(
+            model_name='voicesession',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='tracker.discorduser'),
+        ),
+        migrations.AddIndex(
+            model_name='activityevent',
+            index=models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['user'], name='tracker_ae_open_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ampservermetric',
+            index=models.Index(fields=['recorded_at'], name='tracker_ampm_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(fields=['user', 'ended_at'], name='tracker_gs_user_ended_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(fields=['game_name', 'ended_at'], name='tracker_gs_game_ended_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['user'], name='tracker_gs_open_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['user', 'created_at'], name='tracker_msg_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['created_at'], name='tracker_msg_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voicesession',
+            index=models.Index(fields=['user', 'ended_at'], name='tracker_vs_user_ended_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voicesession',
+            index=models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['user', 'channel_name'], name='tracker_vs_open_user_idx'),
+        ),
+    ]
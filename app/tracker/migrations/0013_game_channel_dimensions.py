@@ -0,0 +1,88 @@
+# Generated by Django 4.2 on 2026-10-19 14:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BACKFILL_SQL = [
+    """
+    INSERT INTO tracker_game (name, created_at)
+    SELECT name, CURRENT_TIMESTAMP FROM (
+        SELECT game_name AS name FROM tracker_gamesession
+        UNION SELECT activity_name FROM tracker_activityevent
+        UNION SELECT game_name FROM tracker_gamestatistic
+        UNION SELECT game_name FROM tracker_usergamestatistic
+    ) AS names
+    """,
+    """
+    INSERT INTO tracker_channel (discord_id, name, created_at)
+    SELECT NULL, name, CURRENT_TIMESTAMP FROM (
+        SELECT channel_name AS name FROM tracker_voicesession
+        UNION SELECT channel_name FROM tracker_message
+    ) AS names
+    """,
+    "UPDATE tracker_gamesession SET game_id = g.id FROM tracker_game g WHERE g.name = tracker_gamesession.game_name",
+    "UPDATE tracker_activityevent SET game_id = g.id FROM tracker_game g WHERE g.name = tracker_activityevent.activity_name",
+    "UPDATE tracker_gamestatistic SET game_id = g.id FROM tracker_game g WHERE g.name = tracker_gamestatistic.game_name",
+    "UPDATE tracker_usergamestatistic SET game_id = g.id FROM tracker_game g WHERE g.name = tracker_usergamestatistic.game_name",
+    "UPDATE tracker_voicesession SET channel_id = c.id FROM tracker_channel c WHERE c.name = tracker_voicesession.channel_name",
+    "UPDATE tracker_message SET channel_id = c.id FROM tracker_channel c WHERE c.name = tracker_message.channel_name",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0012_tracker_index_pack'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Channel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('discord_id', models.BigIntegerField(blank=True, null=True, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Game',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='activityevent',
+            name='game',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='tracker.game'),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='game',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='tracker.game'),
+        ),
+        migrations.AddField(
+            model_name='gamestatistic',
+            name='game',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='statistic', to='tracker.game'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='channel',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='tracker.channel'),
+        ),
+        migrations.AddField(
+            model_name='usergamestatistic',
+            name='game',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='tracker.game'),
+        ),
+        migrations.AddField(
+            model_name='voicesession',
+            name='channel',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='tracker.channel'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
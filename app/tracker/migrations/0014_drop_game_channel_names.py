@@ -0,0 +1,134 @@
+# Generated by Django 4.2 on 2026-10-19 14:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# When migrating backwards the name columns come back nullable, get repopulated, then become NOT NULL again
+RESTORE_NAMES_SQL = [
+    "UPDATE tracker_gamesession SET game_name = g.name FROM tracker_game g WHERE g.id = tracker_gamesession.game_id",
+    "UPDATE tracker_activityevent SET activity_name = g.name FROM tracker_game g WHERE g.id = tracker_activityevent.game_id",
+    "UPDATE tracker_gamestatistic SET game_name = g.name FROM tracker_game g WHERE g.id = tracker_gamestatistic.game_id",
+    "UPDATE tracker_usergamestatistic SET game_name = g.name FROM tracker_game g WHERE g.id = tracker_usergamestatistic.game_id",
+    "UPDATE tracker_voicesession SET channel_name = c.name FROM tracker_channel c WHERE c.id = tracker_voicesession.channel_id",
+    "UPDATE tracker_message SET channel_name = c.name FROM tracker_channel c WHERE c.id = tracker_message.channel_id",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0013_game_channel_dimensions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activityevent',
+            name='activity_name',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gamesession',
+            name='game_name',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gamestatistic',
+            name='game_name',
+            field=models.CharField(max_length=255, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='usergamestatistic',
+            name='game_name',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='channel_name',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='voicesession',
+            name='channel_name',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.RunSQL(migrations.RunSQL.noop, reverse_sql=RESTORE_NAMES_SQL),
+        migrations.RemoveIndex(
+            model_name='gamesession',
+            name='tracker_gs_game_ended_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='voicesession',
+            name='tracker_vs_open_user_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='usergamestatistic',
+            unique_together=set(),
+        ),
+        migrations.RemoveField(
+            model_name='activityevent',
+            name='activity_name',
+        ),
+        migrations.RemoveField(
+            model_name='gamesession',
+            name='game_name',
+        ),
+        migrations.RemoveField(
+            model_name='gamestatistic',
+            name='game_name',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='channel_name',
+        ),
+        migrations.RemoveField(
+            model_name='voicesession',
+            name='channel_name',
+        ),
+        migrations.AlterField(
+            model_name='activityevent',
+            name='game',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='tracker.game'),
+        ),
+        migrations.AlterField(
+            model_name='gamesession',
+            name='game',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='tracker.game'),
+        ),
+        migrations.AlterField(
+            model_name='gamestatistic',
+            name='game',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='statistic', to='tracker.game'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='channel',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='tracker.channel'),
+        ),
+        migrations.AlterField(
+            model_name='usergamestatistic',
+            name='game',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='tracker.game'),
+        ),
+        migrations.AlterField(
+            model_name='voicesession',
+            name='channel',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='tracker.channel'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='usergamestatistic',
+            unique_together={('user', 'game')},
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(fields=['game', 'ended_at'], name='tracker_gs_game_ended_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voicesession',
+            index=models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['user', 'channel'], name='tracker_vs_open_user_idx'),
+        ),
+        migrations.RemoveField(
+            model_name='usergamestatistic',
+            name='game_name',
+        ),
+    ]
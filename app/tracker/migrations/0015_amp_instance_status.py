@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-19 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0014_drop_game_channel_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ampserver',
+            name='controller',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='ampserver',
+            name='players',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='ampserver',
+            name='tps',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ampserver',
+            name='uptime',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='ampservermetric',
+            name='tps',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
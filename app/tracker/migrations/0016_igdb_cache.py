@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-19 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0015_amp_instance_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IGDBGame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_name', models.CharField(max_length=255, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('igdb_id', models.IntegerField(blank=True, null=True)),
+                ('cover_image_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('status', models.CharField(choices=[('found', 'Found'), ('not_found', 'No match'), ('error', 'Lookup failed')], max_length=16)),
+                ('fetched_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IGDBToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('access_token', models.CharField(max_length=255)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-19 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0016_igdb_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ampserver',
+            name='cover_height',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ampserver',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='ampserver',
+            name='cover_width',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2 on 2026-10-19 14:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Game events duplicated their game session, so only the session is kept; the other kinds had no
+# stored duration (it is worked out from their start and end) and only ever stored '{}' as details
+BACKFILL_SQL = [
+    """
+    INSERT INTO tracker_activitysession (user_id, game_id, kind, details, started_at, ended_at, duration_seconds)
+    SELECT user_id, game_id, 1, NULL, started_at, ended_at, duration_seconds
+    FROM tracker_gamesession
+    """,
+    """
+    INSERT INTO tracker_activitysession (user_id, game_id, kind, details, started_at, ended_at, duration_seconds)
+    SELECT user_id, game_id,
+           CASE activity_type WHEN 'listening' THEN 2 WHEN 'watching' THEN 3 ELSE 0 END,
+           NULL, started_at, ended_at, COALESCE(EXTRACT(EPOCH FROM ended_at - started_at)::int, 0)
+    FROM tracker_activityevent
+    WHERE activity_type <> 'game'
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0017_cover_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivitySession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'Playing'), (2, 'Listening'), (3, 'Watching')], default=1)),
+                ('details', models.JSONField(blank=True, null=True)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('duration_seconds', models.IntegerField(default=0)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='tracker.game')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='tracker.discorduser')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='activitysession',
+            index=models.Index(condition=models.Q(('kind', 1)), fields=['user', 'ended_at'], name='tracker_as_user_ended_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitysession',
+            index=models.Index(condition=models.Q(('kind', 1)), fields=['game', 'ended_at'], name='tracker_as_game_ended_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitysession',
+            index=models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['user'], name='tracker_as_open_user_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.DeleteModel(
+            name='ActivityEvent',
+        ),
+        migrations.DeleteModel(
+            name='GameSession',
+        ),
+        migrations.CreateModel(
+            name='GameSession',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('tracker.activitysession',),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-19 14:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0018_activity_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameConcurrency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('peak_players', models.IntegerField(default=0)),
+                ('peak_at', models.DateTimeField(blank=True, null=True)),
+                ('hourly_peaks', models.JSONField(default=list)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='concurrency', to='tracker.game')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'unique_together': {('game', 'day')},
+            },
+        ),
+    ]
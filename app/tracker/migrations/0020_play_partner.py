@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-19 14:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0019_game_concurrency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayPartner',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_seconds', models.BigIntegerField(default=0)),
+                ('voice_seconds', models.BigIntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracker.discorduser')),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracker.discorduser')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='playpartner',
+            constraint=models.CheckConstraint(check=models.Q(('user_a__lt', models.F('user_b'))), name='tracker_pp_ordered_pair'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='playpartner',
+            unique_together={('user_a', 'user_b')},
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-19 14:25
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0020_play_partner'),
+    ]
+
+    operations = [
+        # GiST support for the plain channel_id column in the composite index
+        BtreeGistExtension(),
+        migrations.CreateModel(
+            name='VoiceSpan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('during', django.contrib.postgres.fields.ranges.DateTimeRangeField()),
+                ('channel', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='tracker.channel')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tracker.discorduser')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='voicespan',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['channel', 'during'], name='tracker_vspan_channel_gist'),
+        ),
+    ]
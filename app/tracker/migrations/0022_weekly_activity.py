@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-19 14:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0021_voice_span'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServerWeeklyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.SmallIntegerField()),
+                ('hour', models.SmallIntegerField()),
+                ('gaming_seconds', models.BigIntegerField(default=0)),
+                ('voice_seconds', models.BigIntegerField(default=0)),
+                ('messages', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['weekday', 'hour'],
+                'abstract': False,
+                'unique_together': {('weekday', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserWeeklyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.SmallIntegerField()),
+                ('hour', models.SmallIntegerField()),
+                ('gaming_seconds', models.BigIntegerField(default=0)),
+                ('voice_seconds', models.BigIntegerField(default=0)),
+                ('messages', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_activity', to='tracker.discorduser')),
+            ],
+            options={
+                'ordering': ['weekday', 'hour'],
+                'abstract': False,
+                'unique_together': {('user', 'weekday', 'hour')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-19 14:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0022_weekly_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSessionLengths',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sessions', models.IntegerField(default=0)),
+                ('total_seconds', models.BigIntegerField(default=0)),
+                ('histogram', models.JSONField(default=list)),
+                ('p25_seconds', models.IntegerField(default=0)),
+                ('median_seconds', models.IntegerField(default=0)),
+                ('p75_seconds', models.IntegerField(default=0)),
+                ('p90_seconds', models.IntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='session_lengths', to='tracker.discorduser')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='GameSessionLengths',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sessions', models.IntegerField(default=0)),
+                ('total_seconds', models.BigIntegerField(default=0)),
+                ('histogram', models.JSONField(default=list)),
+                ('p25_seconds', models.IntegerField(default=0)),
+                ('median_seconds', models.IntegerField(default=0)),
+                ('p75_seconds', models.IntegerField(default=0)),
+                ('p90_seconds', models.IntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('game', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='session_lengths', to='tracker.game')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0023_session_lengths'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateTimeField()),
+                ('counted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-cutoff'],
+            },
+        ),
+        migrations.AddField(
+            model_name='activitysession',
+            name='counted_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='voicesession',
+            name='counted_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
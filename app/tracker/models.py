@@ -1,6 +1,8 @@
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GistIndex
 from django.db import models
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 class DiscordUser(models.Model):
     discord_id = models.BigIntegerField(unique=True)
@@ -12,9 +14,28 @@ class DiscordUser(models.Model):
         return self.username
 
 
+class Game(models.Model):
+    """Game/activity name dimension - renaming a row renames it everywhere"""
+    name = models.CharField(max_length=255, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Channel(models.Model):
+    """Channel dimension - keyed by Discord channel id so renames update one row"""
+    discord_id = models.BigIntegerField(unique=True, null=True, blank=True)
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
 class GameStatistic(models.Model):
     """Cumulative game statistics - aggregated from GameSession"""
-    game_name = models.CharField(max_length=255, unique=True)
+    game = models.OneToOneField(Game, on_delete=models.PROTECT, related_name='statistic')
     total_seconds = models.BigIntegerField(default=0)
     total_sessions = models.IntegerField(default=0)
     total_seconds_this_week = models.BigIntegerField(default=0)
@@ -22,7 +43,7 @@ class GameStatistic(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.game_name}: {self.total_seconds // 3600}h"
+        return f"{self.game.name}: {self.total_seconds // 3600}h"
 
 
 class UserStatistic(models.Model):
@@ -43,64 +64,286 @@ class UserStatistic(models.Model):
         return f"{self.user.username}: {self.total_gaming_seconds // 3600}h gaming"
 
 
-class GameSession(models.Model):
-    """Temporary game session tracking - will be cleared periodically"""
-    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE)
-    game_name = models.CharField(max_length=255)
+class UserGameStatistic(models.Model):
+    """Cumulative per-user game statistics - aggregated from GameSession"""
+    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE, related_name='game_statistics')
+    game = models.ForeignKey(Game, on_delete=models.PROTECT)
+    total_seconds = models.BigIntegerField(default=0)
+    total_sessions = models.IntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'game')
+        ordering = ['-total_seconds']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.game.name}: {self.total_seconds // 3600}h"
+
+
+class UserHourlyActivity(models.Model):
+    """Cumulative per-user activity by hour of day (UTC) - aggregated from sessions and messages"""
+    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE, related_name='hourly_activity')
+    hour = models.SmallIntegerField()
+    gaming_seconds = models.BigIntegerField(default=0)
+    voice_seconds = models.BigIntegerField(default=0)
+    messages = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'hour')
+        ordering = ['hour']
+
+    def __str__(self):
+        return f"{self.user.username} @ {self.hour:02d}:00"
+
+
+class WeeklyActivity(models.Model):
+    """Activity by UTC weekday (0 = Monday) and hour - one cell of a 7x24 heatmap"""
+    weekday = models.SmallIntegerField()
+    hour = models.SmallIntegerField()
+    gaming_seconds = models.BigIntegerField(default=0)
+    voice_seconds = models.BigIntegerField(default=0)
+    messages = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ['weekday', 'hour']
+
+
+class UserWeeklyActivity(WeeklyActivity):
+    """Cumulative per-user activity by weekday and hour (UTC) - aggregated from sessions and messages"""
+    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE, related_name='weekly_activity')
+
+    class Meta(WeeklyActivity.Meta):
+        unique_together = ('user', 'weekday', 'hour')
+
+    def __str__(self):
+        return f"{self.user.username} @ {self.weekday}/{self.hour:02d}:00"
+
+
+class ServerWeeklyActivity(WeeklyActivity):
+    """Cumulative server-wide activity by weekday and hour (UTC) - aggregated alongside UserWeeklyActivity"""
+
+    class Meta(WeeklyActivity.Meta):
+        unique_together = ('weekday', 'hour')
+
+    def __str__(self):
+        return f"Server @ {self.weekday}/{self.hour:02d}:00"
+
+
+class SessionLengths(models.Model):
+    """Game session length distribution - a fixed-bin histogram that each aggregation adds to, plus estimates read from it"""
+    sessions = models.IntegerField(default=0)
+    total_seconds = models.BigIntegerField(default=0)
+    # Counts per tracker.distributions.SESSION_LENGTH_BINS bin
+    histogram = models.JSONField(default=list)
+    p25_seconds = models.IntegerField(default=0)
+    median_seconds = models.IntegerField(default=0)
+    p75_seconds = models.IntegerField(default=0)
+    p90_seconds = models.IntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class GameSessionLengths(SessionLengths):
+    """Session length distribution for one game - aggregated from GameSession"""
+    game = models.OneToOneField(Game, on_delete=models.PROTECT, related_name='session_lengths')
+
+    def __str__(self):
+        return f"{self.game.name}: median {self.median_seconds // 60}m"
+
+
+class UserSessionLengths(SessionLengths):
+    """Game session length distribution for one member - aggregated from GameSession"""
+    user = models.OneToOneField(DiscordUser, on_delete=models.CASCADE, related_name='session_lengths')
+
+    def __str__(self):
+        return f"{self.user.username}: median {self.median_seconds // 60}m"
+
+
+class GameConcurrency(models.Model):
+    """Most players online at once per game and UTC day - folded in by aggregate_concurrency"""
+    game = models.ForeignKey(Game, on_delete=models.PROTECT, related_name='concurrency')
+    day = models.DateField()
+    peak_players = models.IntegerField(default=0)
+    peak_at = models.DateTimeField(null=True, blank=True)
+    # 24 ints: the peak within each UTC hour of the day
+    hourly_peaks = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ('game', 'day')
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.game.name} {self.day}: {self.peak_players} online"
+
+
+class PlayPartner(models.Model):
+    """Time two members spent in the same game or voice channel at once - one row per pair, folded in by aggregate_coplay"""
+    user_a = models.ForeignKey(DiscordUser, on_delete=models.CASCADE, related_name='+')
+    user_b = models.ForeignKey(DiscordUser, on_delete=models.CASCADE, related_name='+')
+    game_seconds = models.BigIntegerField(default=0)
+    voice_seconds = models.BigIntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user_a', 'user_b')
+        constraints = [
+            # Each pair is stored once, lower user id first
+            models.CheckConstraint(check=models.Q(user_a__lt=models.F('user_b')), name='tracker_pp_ordered_pair'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_a.username} + {self.user_b.username}"
+
+
+class UserRank(models.Model):
+    """Rank and percentile among all members - rebuilt by rebuild_user_ranks"""
+    user = models.OneToOneField(DiscordUser, on_delete=models.CASCADE, primary_key=True, related_name='rank')
+    gaming_rank = models.IntegerField(default=0)
+    gaming_percentile = models.FloatField(default=0)
+    voice_rank = models.IntegerField(default=0)
+    voice_percentile = models.FloatField(default=0)
+    messages_rank = models.IntegerField(default=0)
+    messages_percentile = models.FloatField(default=0)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user.username}: #{self.gaming_rank} gaming"
+
+
+class ActivitySession(models.Model):
+    """Temporary presence activity tracking - one row per game/listening/watching span, cleared periodically"""
+    OTHER = 0
+    GAME = 1
+    LISTENING = 2
+    WATCHING = 3
+    KIND_CHOICES = [
+        (OTHER, 'Other'),
+        (GAME, 'Playing'),
+        (LISTENING, 'Listening'),
+        (WATCHING, 'Watching'),
+    ]
+
+    # Indexed through the composites below
+    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE, db_index=False)
+    # The activity name dimension - a game for GAME rows, the song/show/app otherwise
+    game = models.ForeignKey(Game, on_delete=models.PROTECT)
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES, default=GAME)
+    # Only stored when Discord sends something worth keeping
+    details = models.JSONField(null=True, blank=True)
     started_at = models.DateTimeField()
     ended_at = models.DateTimeField(null=True, blank=True)
     duration_seconds = models.IntegerField(default=0)
+    # Set on sessions still open when aggregate_statistics ran: time up to here is in the statistics
+    counted_until = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-started_at']
+        # kind=1 is GAME - the class attributes aren't in scope here
+        indexes = [
+            models.Index(fields=['user', 'ended_at'], condition=models.Q(kind=1), name='tracker_as_user_ended_idx'),
+            models.Index(fields=['game', 'ended_at'], condition=models.Q(kind=1), name='tracker_as_game_ended_idx'),
+            # Open sessions: closed by the bot on every presence update, counted on the home page
+            models.Index(fields=['user'], condition=models.Q(ended_at__isnull=True), name='tracker_as_open_user_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.game_name}"
+        return f"{self.user.username} - {self.get_kind_display()} {self.game.name}"
+
+
+class GameSessionManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(kind=ActivitySession.GAME)
+
+
+class GameSession(ActivitySession):
+    """Game sessions - the GAME rows of ActivitySession"""
+    objects = GameSessionManager()
+
+    class Meta:
+        proxy = True
+
+    def __str__(self):
+        return f"{self.user.username} - {self.game.name}"
 
 
 class VoiceSession(models.Model):
     """Temporary voice session tracking - will be cleared periodically"""
-    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE)
-    channel_name = models.CharField(max_length=255)
+    # Indexed through the (user, ended_at) composite below
+    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE, db_index=False)
+    channel = models.ForeignKey(Channel, on_delete=models.PROTECT)
     started_at = models.DateTimeField()
     ended_at = models.DateTimeField(null=True, blank=True)
     duration_seconds = models.IntegerField(default=0)
+    # Set on sessions still open when aggregate_statistics ran: time up to here is in the statistics
+    counted_until = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['user', 'ended_at'], name='tracker_vs_user_ended_idx'),
+            models.Index(fields=['user', 'channel'], condition=models.Q(ended_at__isnull=True), name='tracker_vs_open_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.channel.name}"
+
+
+class VoiceSpan(models.Model):
+    """Permanent voice history - VoiceSession rows archived by archive_voice before the temp table is cleared"""
+    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE)
+    # Indexed through the GiST composite below
+    channel = models.ForeignKey(Channel, on_delete=models.PROTECT, db_index=False)
+    during = DateTimeRangeField()
+
+    class Meta:
+        indexes = [
+            # Who was in a channel at a moment (@>) or during a window (&&), without scanning the year
+            GistIndex(fields=['channel', 'during'], name='tracker_vspan_channel_gist'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.channel_name}"
+        return f"{self.user.username} in {self.channel.name}: {self.during.lower:%Y-%m-%d %H:%M}"
 
 
 class Message(models.Model):
     """Temporary message tracking - will be cleared periodically"""
-    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE)
-    channel_name = models.CharField(max_length=255)
+    # Indexed through the (user, created_at) composite below
+    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE, db_index=False)
+    channel = models.ForeignKey(Channel, on_delete=models.PROTECT)
     message_length = models.IntegerField()
     created_at = models.DateTimeField()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='tracker_msg_user_created_idx'),
+            models.Index(fields=['created_at'], name='tracker_msg_created_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} in {self.channel_name}"
+        return f"{self.user.username} in {self.channel.name}"
 
 
-class ActivityEvent(models.Model):
-    """Temporary activity event tracking - will be cleared periodically"""
-    user = models.ForeignKey(DiscordUser, on_delete=models.CASCADE)
-    activity_type = models.CharField(max_length=50)
-    activity_name = models.CharField(max_length=255)
-    activity_details = models.JSONField(default=dict)
-    started_at = models.DateTimeField()
-    ended_at = models.DateTimeField(null=True, blank=True)
+class AggregationRun(models.Model):
+    """One aggregate_statistics run - session time and messages up to its cutoff are its to count"""
+    cutoff = models.DateTimeField()
+    # Set once the cumulative statistics include everything up to the cutoff
+    counted_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
-        ordering = ['-started_at']
+        ordering = ['-cutoff']
 
     def __str__(self):
-        return f"{self.user.username} - {self.activity_type}"
+        return f"Aggregation up to {self.cutoff:%Y-%m-%d %H:%M}"
+
+    @classmethod
+    def counted_cutoff(cls):
+        """Cutoff of the latest run whose totals are in the statistics - time before it is already counted"""
+        run = cls.objects.filter(counted_at__isnull=False).first()
+        return run.cutoff if run else datetime.min.replace(tzinfo=dt_timezone.utc)
 
 
 class AMPServer(models.Model):
@@ -117,9 +360,16 @@ class AMPServer(models.Model):
     cpu_usage_percent = models.FloatField(default=0)
     memory_usage_mb = models.FloatField(default=0)
     active_users = models.IntegerField(default=0)
+    tps = models.FloatField(null=True, blank=True)
+    uptime = models.CharField(max_length=64, blank=True, default='')
+    players = models.JSONField(default=list, blank=True)
+    controller = models.CharField(max_length=255, blank=True, default='')
     
     cover_image = models.CharField(max_length=255, null=True, blank=True)
     cover_fetched = models.BooleanField(default=False)
+    cover_width = models.IntegerField(null=True, blank=True)
+    cover_height = models.IntegerField(null=True, blank=True)
+    cover_variants = models.JSONField(default=list, blank=True)
     
     display_order = models.IntegerField(default=0)
     
@@ -132,16 +382,79 @@ class AMPServer(models.Model):
     def is_game(self):
         return self.module != 'ADS'
 
+    def cover_srcset(self, image_format):
+        return ", ".join(f"{v['url']} {v['width']}w" for v in self.cover_variants if v['format'] == image_format)
+
+    @property
+    def cover_srcset_webp(self):
+        return self.cover_srcset('webp')
+
+    @property
+    def cover_srcset_jpg(self):
+        return self.cover_srcset('jpg')
+
 
 class AMPServerMetric(models.Model):
     server = models.ForeignKey(AMPServer, on_delete=models.CASCADE, related_name='metrics')
     cpu_usage_percent = models.FloatField()
     memory_usage_mb = models.FloatField()
     active_users = models.IntegerField()
+    tps = models.FloatField(null=True, blank=True)
     recorded_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['recorded_at'], name='tracker_ampm_recorded_idx'),
+        ]
 
     def __str__(self):
         return f"{self.server.module_display_name or self.server.friendly_name} @ {self.recorded_at}"
+
+
+class IGDBGame(models.Model):
+    """Cached IGDB lookup for a normalized game name - misses are cached too, with a shorter TTL"""
+    FOUND = 'found'
+    NOT_FOUND = 'not_found'
+    ERROR = 'error'
+    STATUS_CHOICES = [
+        (FOUND, 'Found'),
+        (NOT_FOUND, 'No match'),
+        (ERROR, 'Lookup failed'),
+    ]
+
+    normalized_name = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=255)
+    igdb_id = models.IntegerField(null=True, blank=True)
+    cover_image_id = models.CharField(max_length=64, null=True, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES)
+    fetched_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.status}"
+
+    def is_fresh(self):
+        return self.expires_at > timezone.now()
+
+
+class IGDBToken(models.Model):
+    """Twitch app token shared by every process that talks to IGDB"""
+    access_token = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+
+    @classmethod
+    def load(cls):
+        """Return (token, expiry epoch seconds) of the stored token, or (None, 0)"""
+        token = cls.objects.order_by('-expires_at').first()
+        if token is None:
+            return None, 0
+        return token.access_token, token.expires_at.timestamp()
+
+    @classmethod
+    def store(cls, access_token, expires_at):
+        cls.objects.all().delete()
+        cls.objects.create(
+            access_token=access_token,
+            expires_at=datetime.fromtimestamp(expires_at, tz=dt_timezone.utc),
+        )
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.db import connection
+
+from tracker.models import DiscordUser
+
+# Finished voice sessions outlive the aggregation clear as tstzrange spans, one per session.
+# Open ones stay in the session table and are archived by the run after they end.
+ARCHIVE_SQL = """
+    INSERT INTO tracker_voicespan (user_id, channel_id, during)
+    SELECT user_id, channel_id, tstzrange(started_at, ended_at, '[)')
+    FROM tracker_voicesession
+    WHERE ended_at <= %(cutoff)s AND ended_at > started_at
+"""
+
+# Archived spans come from the GiST index; sessions not archived yet come from the small temp table
+SPANS_SQL = """
+    SELECT user_id, during FROM tracker_voicespan
+    WHERE channel_id = %(channel_id)s AND during && tstzrange(%(since)s, %(until)s, '[)')
+    UNION ALL
+    SELECT user_id, tstzrange(started_at, COALESCE(ended_at, NOW()), '[)') FROM tracker_voicesession
+    WHERE channel_id = %(channel_id)s AND started_at < %(until)s AND COALESCE(ended_at, NOW()) > GREATEST(started_at, %(since)s)
+"""
+
+OCCUPANTS_SQL = f"""
+    SELECT DISTINCT user_id FROM ({SPANS_SQL}) AS spans
+    WHERE during @> %(at)s::timestamptz
+"""
+
+# Member-seconds per hour of the window: each span is split at hour boundaries and clipped to the window
+HOURLY_SQL = f"""
+    SELECT bucket,
+           SUM(EXTRACT(EPOCH FROM
+               LEAST(upper(during), bucket + INTERVAL '1 hour', %(until)s) - GREATEST(lower(during), bucket, %(since)s)
+           ))
+    FROM ({SPANS_SQL}) AS spans,
+         generate_series(
+             date_trunc('hour', GREATEST(lower(during), %(since)s)),
+             LEAST(upper(during), %(until)s) - INTERVAL '1 microsecond',
+             INTERVAL '1 hour'
+         ) AS bucket
+    GROUP BY bucket
+"""
+
+
+def occupants(channel_id, at):
+    """Members who were in the channel at that moment, by username"""
+    with connection.cursor() as cursor:
+        # The window only narrows the index scan to spans touching the moment
+        cursor.execute(OCCUPANTS_SQL, {
+            'channel_id': channel_id,
+            'since': at,
+            'until': at + timedelta(microseconds=1),
+            'at': at,
+        })
+        user_ids = [row[0] for row in cursor.fetchall()]
+    return sorted(DiscordUser.objects.filter(id__in=user_ids), key=lambda user: user.username.lower())
+
+
+def hourly_occupancy(channel_id, since, until):
+    """
+    Average members present in each hour from since (inclusive) to until (exclusive).
+
+    Returns [(day, [24 floats])] in day order; since and until should fall on hour boundaries.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(HOURLY_SQL, {'channel_id': channel_id, 'since': since, 'until': until})
+        member_seconds = {bucket: seconds for bucket, seconds in cursor.fetchall()}
+
+    days = []
+    day_start = since
+    while day_start < until:
+        days.append((day_start.date(), [
+            round(float(member_seconds.get(day_start + timedelta(hours=hour), 0)) / 3600, 2)
+            for hour in range(24)
+        ]))
+        day_start += timedelta(days=1)
+    return days
+
+
+def archive_voice_sessions(cutoff):
+    """Copy every voice session that ended by cutoff into the permanent span table; returns the number archived"""
+    with connection.cursor() as cursor:
+        cursor.execute(ARCHIVE_SQL, {'cutoff': cutoff})
+        return cursor.rowcount
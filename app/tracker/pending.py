@@ -0,0 +1,26 @@
+# A session stays one row however many aggregation runs it spans. Each run counts its time from
+# where the last run stopped (counted_until, else the start) to the session's end or the run's
+# cutoff, whichever comes first. Sessions that ended by the cutoff are finished: counted as a
+# session once and then deleted. The rest carry on with counted_until moved up to the cutoff.
+PENDING_SQL = """
+    SELECT *,
+           COALESCE(counted_until, started_at) AS piece_start,
+           LEAST(COALESCE(ended_at, %(cutoff)s), %(cutoff)s) AS piece_end,
+           GREATEST(EXTRACT(EPOCH FROM LEAST(COALESCE(ended_at, %(cutoff)s), %(cutoff)s) - COALESCE(counted_until, started_at)), 0)::int AS seconds,
+           COALESCE(ended_at <= %(cutoff)s, FALSE) AS finished
+    FROM {table}
+    WHERE started_at < %(cutoff)s
+"""
+
+# Cutoff of the latest run whose totals are already in the statistics tables
+COUNTED_CUTOFF_SQL = "(SELECT COALESCE(MAX(cutoff), '-infinity') FROM tracker_aggregationrun WHERE counted_at IS NOT NULL)"
+
+# Live totals add a session's seconds after the counted cutoff to the cumulative statistics
+UNCOUNTED_SECONDS_SQL = f"""
+    GREATEST(EXTRACT(EPOCH FROM COALESCE(ended_at, NOW()) - GREATEST(started_at, {COUNTED_CUTOFF_SQL})), 0)
+"""
+
+
+def pending_sessions(table):
+    """What a run at %(cutoff)s counts from one session table, with piece_start/piece_end/seconds/finished per row"""
+    return PENDING_SQL.format(table=table)
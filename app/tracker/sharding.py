@@ -0,0 +1,120 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import connection, connections, transaction
+
+from tracker.models import ActivitySession
+from tracker.pending import pending_sessions
+
+# Rows belong to a shard by a hash of their key, so sequential ids still spread evenly.
+# hashint8 is Postgres' own integer hash; the mask keeps it non-negative for the modulo.
+SHARD_FILTER = "(hashint8({column}::bigint) & 2147483647) %% %(shards)s = %(shard)s"
+
+# Each statement upserts one whole shard: cumulative totals grow, week/month windows are replaced
+GAME_SHARD_SQL = f"""
+    INSERT INTO tracker_gamestatistic (game_id, total_seconds, total_sessions, total_seconds_this_week, total_seconds_this_month, last_updated)
+    SELECT game_id,
+           COALESCE(SUM(seconds), 0),
+           COUNT(*) FILTER (WHERE finished),
+           COALESCE(SUM(seconds) FILTER (WHERE piece_end > %(week_ago)s), 0),
+           COALESCE(SUM(seconds) FILTER (WHERE piece_end > %(month_ago)s), 0),
+           NOW()
+    FROM ({pending_sessions('tracker_activitysession')}) AS pending
+    WHERE kind = %(game)s AND {SHARD_FILTER.format(column='game_id')}
+    GROUP BY game_id
+    ON CONFLICT (game_id) DO UPDATE SET
+        total_seconds = tracker_gamestatistic.total_seconds + EXCLUDED.total_seconds,
+        total_sessions = tracker_gamestatistic.total_sessions + EXCLUDED.total_sessions,
+        total_seconds_this_week = EXCLUDED.total_seconds_this_week,
+        total_seconds_this_month = EXCLUDED.total_seconds_this_month,
+        last_updated = NOW()
+"""
+
+# Every member with counted time or messages gets a row, like the serial loop
+USER_SHARD_SQL = f"""
+    INSERT INTO tracker_userstatistic (
+        user_id, total_gaming_seconds, total_voice_seconds, total_messages,
+        total_gaming_seconds_this_week, total_gaming_seconds_this_month,
+        total_voice_seconds_this_week, total_voice_seconds_this_month,
+        total_messages_this_week, total_messages_this_month, last_updated
+    )
+    SELECT user_id,
+           COALESCE(SUM(gaming), 0), COALESCE(SUM(voice), 0), SUM(messages),
+           COALESCE(SUM(gaming) FILTER (WHERE at > %(week_ago)s), 0),
+           COALESCE(SUM(gaming) FILTER (WHERE at > %(month_ago)s), 0),
+           COALESCE(SUM(voice) FILTER (WHERE at > %(week_ago)s), 0),
+           COALESCE(SUM(voice) FILTER (WHERE at > %(month_ago)s), 0),
+           COALESCE(SUM(messages) FILTER (WHERE at > %(week_ago)s), 0),
+           COALESCE(SUM(messages) FILTER (WHERE at > %(month_ago)s), 0),
+           NOW()
+    FROM (
+        SELECT user_id, seconds AS gaming, 0 AS voice, 0 AS messages, piece_end AS at
+        FROM ({pending_sessions('tracker_activitysession')}) AS games
+        WHERE kind = %(game)s
+        UNION ALL
+        SELECT user_id, 0, seconds, 0, piece_end
+        FROM ({pending_sessions('tracker_voicesession')}) AS voice
+        UNION ALL
+        SELECT user_id, 0, 0, 1, created_at
+        FROM tracker_message
+        WHERE created_at <= %(cutoff)s
+    ) AS activity
+    WHERE {SHARD_FILTER.format(column='user_id')}
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_gaming_seconds = tracker_userstatistic.total_gaming_seconds + EXCLUDED.total_gaming_seconds,
+        total_voice_seconds = tracker_userstatistic.total_voice_seconds + EXCLUDED.total_voice_seconds,
+        total_messages = tracker_userstatistic.total_messages + EXCLUDED.total_messages,
+        total_gaming_seconds_this_week = EXCLUDED.total_gaming_seconds_this_week,
+        total_gaming_seconds_this_month = EXCLUDED.total_gaming_seconds_this_month,
+        total_voice_seconds_this_week = EXCLUDED.total_voice_seconds_this_week,
+        total_voice_seconds_this_month = EXCLUDED.total_voice_seconds_this_month,
+        total_messages_this_week = EXCLUDED.total_messages_this_week,
+        total_messages_this_month = EXCLUDED.total_messages_this_month,
+        last_updated = NOW()
+"""
+
+USER_GAME_SHARD_SQL = f"""
+    INSERT INTO tracker_usergamestatistic (user_id, game_id, total_seconds, total_sessions, last_updated)
+    SELECT user_id, game_id, COALESCE(SUM(seconds), 0), COUNT(*) FILTER (WHERE finished), NOW()
+    FROM ({pending_sessions('tracker_activitysession')}) AS pending
+    WHERE kind = %(game)s AND {SHARD_FILTER.format(column='user_id')}
+    GROUP BY user_id, game_id
+    ON CONFLICT (user_id, game_id) DO UPDATE SET
+        total_seconds = tracker_usergamestatistic.total_seconds + EXCLUDED.total_seconds,
+        total_sessions = tracker_usergamestatistic.total_sessions + EXCLUDED.total_sessions,
+        last_updated = NOW()
+"""
+
+
+def aggregate_shard(shard, shards, cutoff, week_ago, month_ago):
+    """
+    Fold one shard of the session tables into the statistics; returns (shard, games, users, user_games).
+
+    Runs in a pool worker on that worker's own connection. Shards never share a key, so the
+    three upserts don't contend with other workers, and the shard commits all or nothing.
+    """
+    params = {'shard': shard, 'shards': shards, 'cutoff': cutoff, 'week_ago': week_ago, 'month_ago': month_ago, 'game': ActivitySession.GAME}
+    counts = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in (GAME_SHARD_SQL, USER_SHARD_SQL, USER_GAME_SHARD_SQL):
+            cursor.execute(sql, params)
+            counts.append(cursor.rowcount)
+    return (shard, *counts)
+
+
+def run_shards(workers, cutoff, week_ago, month_ago, shards=None):
+    """
+    Yield aggregate_shard() results as shards finish, one process per worker.
+
+    Workers are forked, so the parent's connections are closed first - a forked child
+    must never reuse the parent's socket, and each opens its own on first query.
+    """
+    if connection.in_atomic_block:
+        raise RuntimeError("Sharded aggregation commits on separate connections and can't run inside a transaction")
+    shards = shards or workers
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+        futures = [pool.submit(aggregate_shard, shard, shards, cutoff, week_ago, month_ago) for shard in range(shards)]
+        for future in as_completed(futures):
+            yield future.result()
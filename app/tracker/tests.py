@@ -1,3 +1,557 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from tracker.concurrency import daily_concurrency, fold_into_cache, sweep
+from tracker.coplay import overlap_seconds
+from tracker.distributions import SESSION_LENGTH_BINS, estimate_percentiles, fold_lengths, grouped_histograms
+from tracker.management.commands.aggregate_statistics import Command as AggregateStatistics
+from tracker.models import (
+    ActivitySession, Channel, DiscordUser, Game, GameConcurrency, GameSessionLengths, GameStatistic, Message,
+    UserGameStatistic, UserStatistic, VoiceSession,
+)
+from tracker.pending import pending_sessions
+
+
+def plan_nodes(plan):
+    """Flatten an EXPLAIN (FORMAT JSON) plan tree into a list of nodes"""
+    nodes = [plan]
+    for child in plan.get('Plans', []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plan checks require PostgreSQL')
+class HotQueryPlanTests(TestCase):
+    """Fail if a hot tracker query can no longer be answered from an index"""
+
+    # (table, sql) - params are filled in by hot_query_params()
+    HOT_QUERIES = {
+        'bot: close open activity sessions': (
+            'tracker_activitysession',
+            "SELECT id FROM tracker_activitysession WHERE user_id = %(user_id)s AND ended_at IS NULL",
+        ),
+        'bot: close voice session': (
+            'tracker_voicesession',
+            "SELECT id FROM tracker_voicesession WHERE user_id = %(user_id)s AND channel_id = %(channel_id)s AND ended_at IS NULL",
+        ),
+        'home: active players': (
+            'tracker_activitysession',
+            "SELECT COUNT(DISTINCT user_id) FROM tracker_activitysession WHERE ended_at IS NULL AND kind = %(game)s",
+        ),
+        'aggregate: user gaming this week': (
+            'tracker_activitysession',
+            f"SELECT COALESCE(SUM(seconds), 0) FROM ({pending_sessions('tracker_activitysession')}) AS pending WHERE kind = %(game)s AND user_id = %(user_id)s AND piece_end > %(since)s",
+        ),
+        'aggregate: game this week': (
+            'tracker_activitysession',
+            f"SELECT COALESCE(SUM(seconds), 0) FROM ({pending_sessions('tracker_activitysession')}) AS pending WHERE kind = %(game)s AND game_id = %(game_id)s AND piece_end > %(since)s",
+        ),
+        'aggregate: user voice this week': (
+            'tracker_voicesession',
+            f"SELECT COALESCE(SUM(seconds), 0) FROM ({pending_sessions('tracker_voicesession')}) AS pending WHERE user_id = %(user_id)s AND piece_end > %(since)s",
+        ),
+        'aggregate: user messages this week': (
+            'tracker_message',
+            "SELECT COUNT(*) FROM tracker_message WHERE user_id = %(user_id)s AND created_at > %(since)s AND created_at <= %(cutoff)s",
+        ),
+        'voice history: occupants at a moment': (
+            'tracker_voicespan',
+            "SELECT user_id FROM tracker_voicespan WHERE channel_id = %(channel_id)s AND during @> %(since)s::timestamptz",
+        ),
+        'voice history: channel window': (
+            'tracker_voicespan',
+            "SELECT user_id, during FROM tracker_voicespan WHERE channel_id = %(channel_id)s AND during && tstzrange(%(since)s, NOW())",
+        ),
+        'metrics: recent samples': (
+            'tracker_ampservermetric',
+            "SELECT * FROM tracker_ampservermetric WHERE recorded_at > %(since)s ORDER BY recorded_at DESC",
+        ),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_dataset',
+            users=500, games=50, channels=10,
+            game_sessions=20000, voice_sessions=10000, messages=20000, open_sessions=100,
+            servers=3, days=30, metric_interval=30, force=True,
+            stdout=StringIO(),
+        )
+
+    def hot_query_params(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT user_id, channel_id FROM tracker_voicesession ORDER BY id LIMIT 1")
+            user_id, channel_id = cursor.fetchone()
+            cursor.execute("SELECT game_id FROM tracker_activitysession ORDER BY id LIMIT 1")
+            game_id = cursor.fetchone()[0]
+        return {
+            'user_id': user_id,
+            'channel_id': channel_id,
+            'game_id': game_id,
+            'game': ActivitySession.GAME,
+            'since': timezone.now() - timedelta(days=7),
+            'cutoff': timezone.now(),
+        }
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            # With seq scans priced out, the planner still falls back to one if no index applies
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cursor.fetchone()[0]
+        return plan_nodes(plan[0]['Plan'])
+
+    def test_hot_queries_use_indexes(self):
+        params = self.hot_query_params()
+        for name, (table, sql) in self.HOT_QUERIES.items():
+            with self.subTest(query=name):
+                seq_scans = [
+                    node for node in self.explain(sql, params)
+                    if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') == table
+                ]
+                self.assertEqual(seq_scans, [], f"{name} regressed to a sequential scan on {table}")
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Session compaction uses PostgreSQL-only SQL')
+class CompactSessionsTests(TestCase):
+    """compact_sessions merges islands of sessions whose gaps are within --grace"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = DiscordUser.objects.create(discord_id=1, username='ann')
+        cls.other_user = DiscordUser.objects.create(discord_id=2, username='bob')
+        cls.game = Game.objects.create(name='Factorio')
+        cls.other_game = Game.objects.create(name='Rust')
+        cls.channel = Channel.objects.create(discord_id=10, name='General')
+        cls.base = timezone.now() - timedelta(days=1)
+
+    def play(self, start, end, user=None, game=None):
+        """A game session from start to end seconds after base (end None leaves it open)"""
+        return ActivitySession.objects.create(
+            user=user or self.user, game=game or self.game, kind=ActivitySession.GAME,
+            started_at=self.base + timedelta(seconds=start),
+            ended_at=None if end is None else self.base + timedelta(seconds=end),
+            duration_seconds=0 if end is None else end - start,
+        )
+
+    def compact(self, grace=120):
+        call_command('compact_sessions', grace=grace, stdout=StringIO())
+
+    def spans(self, model=ActivitySession):
+        return [
+            (int((row.started_at - self.base).total_seconds()),
+             None if row.ended_at is None else int((row.ended_at - self.base).total_seconds()),
+             row.duration_seconds)
+            for row in model.objects.order_by('started_at')
+        ]
+
+    def test_island_merges_into_earliest_row(self):
+        first = self.play(0, 100)
+        self.play(150, 300)
+        self.play(400, 500)
+        self.compact()
+        self.assertEqual(self.spans(), [(0, 500, 500)])
+        self.assertEqual(ActivitySession.objects.get().pk, first.pk)
+
+    def test_gap_at_grace_boundary(self):
+        self.play(0, 100)
+        self.play(219, 300)     # 119s gap: merged
+        self.play(420, 500)     # 120s gap: merged (grace is inclusive)
+        self.play(621, 700)     # 121s gap: new island
+        self.compact()
+        self.assertEqual(self.spans(), [(0, 500, 500), (621, 700, 79)])
+
+    def test_overlapping_rows_bridge_from_latest_end(self):
+        # The third row is far from the second's end but within grace of the first's
+        self.play(0, 1000)
+        self.play(100, 200)
+        self.play(1050, 1100)
+        self.compact()
+        self.assertEqual(self.spans(), [(0, 1100, 1100)])
+
+    def test_other_keys_and_open_rows_are_left_alone(self):
+        self.play(0, 100)
+        self.play(110, 200, game=self.other_game)
+        self.play(110, 200, user=self.other_user)
+        self.play(150, None)
+        self.compact()
+        self.assertEqual(ActivitySession.objects.count(), 4)
+
+    def test_voice_sessions_merge_per_channel(self):
+        for start, end in [(0, 100), (130, 200), (500, 600)]:
+            VoiceSession.objects.create(
+                user=self.user, channel=self.channel,
+                started_at=self.base + timedelta(seconds=start), ended_at=self.base + timedelta(seconds=end),
+                duration_seconds=end - start,
+            )
+        self.compact()
+        self.assertEqual(self.spans(VoiceSession), [(0, 200, 200), (500, 600, 100)])
+
+    def test_island_keeps_time_already_counted(self):
+        self.play(0, 100)
+        counted = self.play(150, 300)
+        counted.counted_until = self.base + timedelta(seconds=200)
+        counted.save()
+        self.compact()
+        self.assertEqual(ActivitySession.objects.get().counted_until, counted.counted_until)
+
+    def test_dry_run_changes_nothing(self):
+        self.play(0, 100)
+        self.play(150, 300)
+        call_command('compact_sessions', dry_run=True, stdout=StringIO())
+        self.assertEqual(ActivitySession.objects.count(), 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Aggregation uses PostgreSQL-only SQL')
+class AggregateOpenSessionTests(TestCase):
+    """A session spanning several runs stays one row: its time is counted as it goes, the session once it ends"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = DiscordUser.objects.create(discord_id=1, username='ann')
+        cls.game = Game.objects.create(name='Factorio')
+        cls.channel = Channel.objects.create(discord_id=10, name='General')
+
+    def aggregate(self):
+        call_command('aggregate_statistics', stdout=StringIO())
+
+    def test_open_session_is_counted_once_across_runs(self):
+        started_at = timezone.now() - timedelta(hours=2)
+        ActivitySession.objects.create(user=self.user, game=self.game, kind=ActivitySession.GAME, started_at=started_at)
+        VoiceSession.objects.create(user=self.user, channel=self.channel, started_at=started_at)
+
+        self.aggregate()
+
+        stat = UserStatistic.objects.get(user=self.user)
+        self.assertAlmostEqual(stat.total_gaming_seconds, 7200, delta=60)
+        self.assertAlmostEqual(stat.total_voice_seconds, 7200, delta=60)
+        self.assertEqual(GameStatistic.objects.get(game=self.game).total_sessions, 0)
+        for model in (ActivitySession, VoiceSession):
+            session = model.objects.get()
+            self.assertEqual((session.started_at, session.ended_at), (started_at, None))
+            self.assertIsNotNone(session.counted_until)
+
+        # Ends after the first run: the second adds only the time since, and the session itself
+        ended_at = timezone.now()
+        duration = int((ended_at - started_at).total_seconds())
+        for model in (ActivitySession, VoiceSession):
+            model.objects.update(ended_at=ended_at, duration_seconds=duration)
+        self.aggregate()
+        self.aggregate()
+
+        stat.refresh_from_db()
+        self.assertAlmostEqual(stat.total_gaming_seconds, duration, delta=1)
+        self.assertAlmostEqual(stat.total_voice_seconds, duration, delta=1)
+        self.assertEqual(GameStatistic.objects.get(game=self.game).total_sessions, 1)
+        self.assertEqual(UserGameStatistic.objects.get(user=self.user, game=self.game).total_sessions, 1)
+        self.assertFalse(ActivitySession.objects.exists())
+        self.assertFalse(VoiceSession.objects.exists())
+
+    def test_rows_written_after_the_cutoff_wait_for_the_next_run(self):
+        # Stand-ins for rows the bot writes while the run is going
+        after_cutoff = timezone.now() + timedelta(minutes=5)
+        ActivitySession.objects.create(
+            user=self.user, game=self.game, kind=ActivitySession.GAME,
+            started_at=after_cutoff - timedelta(hours=1), ended_at=after_cutoff, duration_seconds=3600,
+        )
+        Message.objects.create(user=self.user, channel=self.channel, message_length=5, created_at=after_cutoff)
+        Message.objects.create(user=self.user, channel=self.channel, message_length=5, created_at=timezone.now())
+
+        self.aggregate()
+
+        stat = UserStatistic.objects.get(user=self.user)
+        self.assertEqual(stat.total_messages, 1)
+        self.assertAlmostEqual(stat.total_gaming_seconds, 3300, delta=60)
+        self.assertEqual(GameStatistic.objects.get(game=self.game).total_sessions, 0)
+        self.assertIsNotNone(ActivitySession.objects.get().counted_until)
+        self.assertEqual(Message.objects.get().created_at, after_cutoff)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Sharded aggregation uses PostgreSQL-only SQL')
+class ShardedAggregationTests(TransactionTestCase):
+    """The process-pool path must write exactly the statistics the serial loop does"""
+
+    # Forked workers only see committed rows, hence TransactionTestCase
+    def setUp(self):
+        call_command(
+            'seed_dataset',
+            users=60, games=12, channels=4,
+            game_sessions=3000, voice_sessions=1000, messages=3000, open_sessions=20,
+            servers=1, days=60, metric_interval=1440, force=True,
+            stdout=StringIO(),
+        )
+        self.now = timezone.now()
+        self.week_ago = self.now - timedelta(days=7)
+        self.month_ago = self.now - timedelta(days=30)
+
+    def statistics(self):
+        return (
+            sorted(GameStatistic.objects.values_list(
+                'game_id', 'total_seconds', 'total_sessions', 'total_seconds_this_week', 'total_seconds_this_month')),
+            sorted(UserStatistic.objects.values_list(
+                'user_id', 'total_gaming_seconds', 'total_voice_seconds', 'total_messages',
+                'total_gaming_seconds_this_week', 'total_gaming_seconds_this_month',
+                'total_voice_seconds_this_week', 'total_voice_seconds_this_month',
+                'total_messages_this_week', 'total_messages_this_month')),
+            sorted(UserGameStatistic.objects.values_list('user_id', 'game_id', 'total_seconds', 'total_sessions')),
+        )
+
+    def test_sharded_matches_serial(self):
+        # Serial first, rolled back so both paths start from the same seeded statistics
+        with transaction.atomic():
+            AggregateStatistics(stdout=StringIO()).aggregate_serial(self.now, self.week_ago, self.month_ago)
+            serial = self.statistics()
+            transaction.set_rollback(True)
+
+        AggregateStatistics(stdout=StringIO()).aggregate_sharded(3, 5, self.now, self.week_ago, self.month_ago)
+        sharded = self.statistics()
+
+        self.assertTrue(all(serial), "seeded data should produce rows in every statistics table")
+        for serial_rows, sharded_rows in zip(serial, sharded):
+            self.assertEqual(serial_rows, sharded_rows)
+
+    def test_falls_back_to_serial_inside_a_transaction(self):
+        out = StringIO()
+        with transaction.atomic():
+            call_command('aggregate_statistics', workers=4, stdout=out)
+            transaction.set_rollback(True)
+        self.assertIn("aggregating serially", out.getvalue())
+
+
+DAY = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+
+
+def at(hours, minutes=0):
+    return DAY + timedelta(hours=hours, minutes=minutes)
+
+
+class SweepTests(SimpleTestCase):
+    """sweep() turns one game-day's change points into its peak and per-hour peaks"""
+
+    def hours(self, **peaks):
+        hourly = [0] * 24
+        for hour, peak in peaks.items():
+            hourly[int(hour[1:])] = peak
+        return hourly
+
+    def test_events_exactly_on_the_hour(self):
+        peak, peak_at, hourly = sweep(DAY, [(at(1), 1), (at(3), 0)])
+        self.assertEqual((peak, peak_at), (1, at(1)))
+        # Nobody was online during hour 3, even though the session ended at its first instant
+        self.assertEqual(hourly, self.hours(h1=1, h2=1))
+
+    def test_event_inside_an_hour_counts_both_sides(self):
+        peak, peak_at, hourly = sweep(DAY, [(at(1, 30), 2), (at(4, 15), 1), (at(6), 0)])
+        self.assertEqual((peak, peak_at), (2, at(1, 30)))
+        self.assertEqual(hourly, self.hours(h1=2, h2=2, h3=2, h4=2, h5=1))
+
+    def test_midnight_cut_at_index_24(self):
+        peak, peak_at, hourly = sweep(DAY, [(at(22, 30), 1), (at(23, 15), 2), (at(24), 0)])
+        self.assertEqual((peak, peak_at), (2, at(23, 15)))
+        self.assertEqual(hourly, self.hours(h22=1, h23=2))
+
+    def test_netted_simultaneous_events(self):
+        # Back-to-back sessions arrive as one change point whose count didn't move
+        peak, peak_at, hourly = sweep(DAY, [(at(10), 1), (at(11), 1), (at(12), 0)])
+        self.assertEqual((peak, peak_at), (1, at(10)))
+        self.assertEqual(hourly, self.hours(h10=1, h11=1))
+
+    def test_no_events(self):
+        self.assertEqual(sweep(DAY, []), (0, None, [0] * 24))
+
+
+class FoldConcurrencyTests(TestCase):
+    """fold_into_cache only ever raises a cached day's peaks"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.game = Game.objects.create(name='Factorio')
+        cls.other_game = Game.objects.create(name='Rust')
+
+    def test_merges_with_cached_day(self):
+        cached_hours = [0] * 24
+        cached_hours[9], cached_hours[20] = 3, 1
+        GameConcurrency.objects.create(game=self.game, day=DAY.date(), peak_players=3, peak_at=at(9), hourly_peaks=cached_hours)
+        batch_hours = [0] * 24
+        batch_hours[9], batch_hours[20] = 2, 2
+
+        written = fold_into_cache([
+            (self.game.id, DAY.date(), 2, at(20), batch_hours),
+            (self.other_game.id, DAY.date(), 4, at(12), [4] * 24),
+        ])
+
+        self.assertEqual(written, 2)
+        row = GameConcurrency.objects.get(game=self.game)
+        self.assertEqual((row.peak_players, row.peak_at), (3, at(9)))
+        self.assertEqual(row.hourly_peaks[9], 3)
+        self.assertEqual(row.hourly_peaks[20], 2)
+        self.assertEqual(GameConcurrency.objects.get(game=self.other_game).peak_players, 4)
+
+    def test_higher_peak_replaces_cached_one(self):
+        GameConcurrency.objects.create(game=self.game, day=DAY.date(), peak_players=1, peak_at=at(9), hourly_peaks=[1] * 24)
+        fold_into_cache([(self.game.id, DAY.date(), 5, at(21), [0] * 24)])
+        row = GameConcurrency.objects.get(game=self.game)
+        self.assertEqual((row.peak_players, row.peak_at), (5, at(21)))
+        self.assertEqual(row.hourly_peaks, [1] * 24)
+
+    def test_empty_batch(self):
+        self.assertEqual(fold_into_cache([]), 0)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'The concurrency sweep uses PostgreSQL-only SQL')
+class DailyConcurrencyTests(TestCase):
+    """SWEEP_SQL nets simultaneous events and cuts overnight sessions at midnight"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.game = Game.objects.create(name='Factorio')
+        cls.users = [DiscordUser.objects.create(discord_id=i, username=f'user{i}') for i in range(3)]
+
+    def play(self, user, start, end):
+        ActivitySession.objects.create(
+            user=user, game=self.game, kind=ActivitySession.GAME,
+            started_at=start, ended_at=end, duration_seconds=int((end - start).total_seconds()),
+        )
+
+    def test_back_to_back_and_overnight(self):
+        self.play(self.users[0], at(10), at(11))
+        self.play(self.users[1], at(11), at(12))
+        self.play(self.users[2], at(23), at(25))
+
+        days = {day: (peak, peak_at, hourly) for _, day, peak, peak_at, hourly in daily_concurrency(timezone.now())}
+
+        peak, peak_at, hourly = days[DAY.date()]
+        self.assertEqual((peak, peak_at), (1, at(10)))
+        self.assertEqual([hour for hour, online in enumerate(hourly) if online], [10, 11, 23])
+        next_peak, next_peak_at, next_hourly = days[(DAY + timedelta(days=1)).date()]
+        self.assertEqual((next_peak, next_peak_at), (1, at(24)))
+        self.assertEqual([hour for hour, online in enumerate(next_hourly) if online], [0])
+
+
+class OverlapSecondsTests(SimpleTestCase):
+    """overlap_seconds() sums the wall-clock time each pair shared a group"""
+
+    def overlaps(self, *sessions):
+        # (group, user, start, end) in minutes, fed in the order the SQL sorts them
+        rows = sorted(
+            ((group, user, at(0, start), at(0, end)) for group, user, start, end in sessions),
+            key=lambda row: (row[0], row[2]),
+        )
+        return {pair: seconds / 60 for pair, seconds in overlap_seconds(rows).items()}
+
+    def test_back_to_back_sessions_never_overlap(self):
+        self.assertEqual(self.overlaps(('g', 1, 0, 60), ('g', 2, 60, 120), ('g', 3, 120, 180)), {})
+
+    def test_long_session_overlaps_several_later_ones(self):
+        self.assertEqual(
+            self.overlaps(('g', 1, 0, 1000), ('g', 2, 100, 200), ('g', 3, 300, 1200), ('g', 2, 900, 950)),
+            {(1, 2): 150, (1, 3): 700, (2, 3): 50},
+        )
+
+    def test_same_user_twice_in_a_group(self):
+        # User 1's overlapping sessions are one stretch of presence, not two
+        self.assertEqual(
+            self.overlaps(('g', 1, 0, 100), ('g', 1, 50, 150), ('g', 2, 60, 120)),
+            {(1, 2): 60},
+        )
+        # ...and their separate visits each count
+        self.assertEqual(
+            self.overlaps(('g', 1, 0, 30), ('g', 2, 0, 100), ('g', 1, 60, 80)),
+            {(1, 2): 50},
+        )
+
+    def test_groups_are_independent(self):
+        self.assertEqual(self.overlaps(('a', 1, 0, 100), ('b', 2, 0, 100), ('b', 3, 50, 150)), {(2, 3): 50})
+
+
+def histogram(**counts):
+    """A SESSION_LENGTH_BINS-wide row with counts at the given bin indexes, e.g. histogram(b1=4)"""
+    row = np.zeros(len(SESSION_LENGTH_BINS), dtype=np.int64)
+    for name, count in counts.items():
+        row[int(name[1:])] = count
+    return row
+
+
+class SessionLengthHistogramTests(SimpleTestCase):
+    """grouped_histograms() bins per key; estimate_percentiles() reads estimates back out of the bins"""
+
+    def test_bins_per_key(self):
+        keys, counts, total_seconds = grouped_histograms(
+            np.array([5, 3, 5, 5, 5]), np.array([60, 61, 300, 0, 30000]),
+        )
+        self.assertEqual(keys.tolist(), [3, 5])
+        # A value exactly on a bin's upper bound belongs to that bin (side='left')
+        self.assertEqual(counts[0].tolist(), histogram(b1=1).tolist())
+        self.assertEqual(counts[1].tolist(), histogram(b0=2, b1=1, b11=1).tolist())
+        self.assertEqual(total_seconds.tolist(), [61, 30360])
+
+    def test_empty_batch(self):
+        keys, counts, total_seconds = grouped_histograms(np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+        self.assertEqual((len(keys), counts.shape, len(total_seconds)), (0, (0, len(SESSION_LENGTH_BINS)), 0))
+        self.assertTrue(all(len(values) == 0 for values in estimate_percentiles(counts).values()))
+
+    def test_interpolates_inside_the_crossing_bin(self):
+        estimates = estimate_percentiles(np.array([histogram(b1=4)]))
+        self.assertEqual(
+            {field: values.tolist() for field, values in estimates.items()},
+            {'p25_seconds': [120], 'median_seconds': [180], 'p75_seconds': [240], 'p90_seconds': [276]},
+        )
+
+    def test_empty_row_and_open_ended_last_bin(self):
+        estimates = estimate_percentiles(np.array([histogram(), histogram(b11=3)]))
+        for values in estimates.values():
+            # No sessions gives zeros; the last bin never interpolates past its lower bound
+            self.assertEqual(values.tolist(), [0, SESSION_LENGTH_BINS[-2]])
+
+
+class FoldSessionLengthTests(TestCase):
+    """fold_lengths() adds a batch onto the stored histograms before estimating"""
+
+    def test_folds_onto_stored_histogram(self):
+        game = Game.objects.create(name='Factorio')
+        new_game = Game.objects.create(name='Rust')
+        GameSessionLengths.objects.create(game=game, sessions=4, total_seconds=720, histogram=histogram(b1=4).tolist())
+
+        written = fold_lengths(GameSessionLengths, 'game_id', np.array([game.id, game.id, new_game.id]), np.array([60, 3600, 1000]))
+
+        self.assertEqual(written, 2)
+        stored = GameSessionLengths.objects.get(game=game)
+        self.assertEqual((stored.sessions, stored.total_seconds), (6, 4380))
+        self.assertEqual(stored.histogram, histogram(b0=1, b1=4, b4=1).tolist())
+        self.assertEqual((stored.median_seconds, stored.p90_seconds), (180, 2520))
+        self.assertEqual(GameSessionLengths.objects.get(game=new_game).histogram, histogram(b3=1).tolist())
+
+    def test_empty_batch_writes_nothing(self):
+        self.assertEqual(fold_lengths(GameSessionLengths, 'game_id', np.array([]), np.array([])), 0)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Aggregation uses PostgreSQL-only SQL')
+class AggregateSessionLengthTests(TestCase):
+    """A session enters the histograms once, at its full length, after it has ended"""
+
+    def test_session_spanning_runs_is_binned_once_when_it_ends(self):
+        user = DiscordUser.objects.create(discord_id=1, username='ann')
+        game = Game.objects.create(name='Factorio')
+        started_at = timezone.now() - timedelta(hours=2, minutes=30)
+        session = ActivitySession.objects.create(user=user, game=game, kind=ActivitySession.GAME, started_at=started_at)
+
+        call_command('aggregate_statistics', stdout=StringIO())
+        self.assertFalse(GameSessionLengths.objects.exists())
+
+        session.ended_at = timezone.now()
+        session.duration_seconds = int((session.ended_at - started_at).total_seconds())
+        session.save()
+        call_command('aggregate_statistics', stdout=StringIO())
+
+        lengths = GameSessionLengths.objects.get(game=game)
+        self.assertEqual((lengths.sessions, lengths.total_seconds), (1, session.duration_seconds))
+        # The whole 2.5h, not the two pieces the runs counted
+        self.assertEqual(lengths.histogram, histogram(b7=1).tolist())
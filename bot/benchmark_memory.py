@@ -0,0 +1,110 @@
+"""
+Memory benchmark for lean gateway mode against a synthetic guild.
+
+Loads the same GUILD_CREATE payload twice - the default way (Intents.all(), every member cached
+as a discord.Member with its presence) and the lean way (no member cache, one MemberShadow per
+member) - and reports what each keeps alive. Every member is in the payload, so the lean side is
+measured at its worst case; a real large guild only sends online and voice members.
+
+    python benchmark_memory.py --members 100000 --playing 0.3
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+import discord
+from discord.ext import commands
+
+import bot as tracker_bot
+
+GAMES = [f"Bench Game {i}" for i in range(200)]
+
+
+def synthetic_guild(members, playing, in_voice, seed=1):
+    """A GUILD_CREATE payload with members, their presences and voice states"""
+    rng = random.Random(seed)
+    guild_id = 1_000_000_000_000
+    voice_channels = [guild_id + 1 + i for i in range(10)]
+    payload = {
+        'id': str(guild_id),
+        'name': 'Benchmark Guild',
+        'member_count': members,
+        'roles': [{'id': str(guild_id), 'name': '@everyone', 'permissions': '0', 'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+        'channels': [{'id': str(channel_id), 'type': 2, 'name': f'Voice {i}', 'position': i, 'bitrate': 64000, 'user_limit': 0, 'permission_overwrites': []} for i, channel_id in enumerate(voice_channels)],
+        'members': [],
+        'presences': [],
+        'voice_states': [],
+    }
+    for i in range(members):
+        user_id = str(2_000_000_000_000 + i)
+        user = {'id': user_id, 'username': f'member{i}', 'discriminator': '0', 'global_name': f'Member {i}', 'avatar': None}
+        payload['members'].append({'user': user, 'nick': None, 'roles': [], 'joined_at': '2024-01-01T00:00:00+00:00', 'deaf': False, 'mute': False, 'flags': 0})
+        roll = rng.random()
+        if roll < playing:
+            activities = [{'type': 0, 'name': rng.choice(GAMES), 'created_at': 1700000000000}]
+            payload['presences'].append({'user': {'id': user_id}, 'status': 'online', 'activities': activities, 'client_status': {'desktop': 'online'}})
+        elif roll < playing * 2:
+            payload['presences'].append({'user': {'id': user_id}, 'status': 'idle', 'activities': [], 'client_status': {'mobile': 'idle'}})
+        if rng.random() < in_voice:
+            payload['voice_states'].append({'user_id': user_id, 'channel_id': str(rng.choice(voice_channels)), 'session_id': 'x', 'deaf': False, 'mute': False, 'self_deaf': False, 'self_mute': False, 'self_video': False, 'suppress': False, 'request_to_speak_timestamp': None})
+    return payload
+
+
+def load_default(payload):
+    state = commands.Bot(command_prefix='!', intents=discord.Intents.all())._connection
+    return discord.Guild(data=payload, state=state)
+
+
+def load_lean(payload):
+    state = commands.Bot(
+        command_prefix='!',
+        intents=tracker_bot.lean_intents(),
+        member_cache_flags=discord.MemberCacheFlags.none(),
+        chunk_guilds_at_startup=False,
+        max_messages=None,
+    )._connection
+    guild = discord.Guild(data=payload, state=state)
+    tracker_bot.seed_member_shadows(payload)
+    # What ingestion leaves behind once every presence has been seen
+    for presence in payload['presences']:
+        activities = [discord.activity.create_activity(raw, state) for raw in presence['activities']]
+        tracker_bot.member_shadows[int(presence['user']['id'])].activities = tracker_bot.activity_keys(activities)
+    return guild
+
+
+def measure(load, payload):
+    """(bytes still allocated after loading, seconds) - the payload itself is allocated beforehand"""
+    tracker_bot.member_shadows.clear()
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    kept = load(payload)
+    seconds = time.perf_counter() - started
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--members', type=int, default=100_000)
+    parser.add_argument('--playing', type=float, default=0.3, help='Share of members with a game running')
+    parser.add_argument('--in-voice', type=float, default=0.01, help='Share of members in a voice channel')
+    options = parser.parse_args()
+
+    payload = synthetic_guild(options.members, options.playing, options.in_voice)
+    print(f"Synthetic guild: {options.members:,} members, {len(payload['presences']):,} presences, {len(payload['voice_states']):,} in voice\n")
+
+    results = {name: measure(load, payload) for name, load in [('default', load_default), ('lean', load_lean)]}
+    print(f"{'mode':<10}{'retained MB':>14}{'bytes/member':>15}{'load s':>10}")
+    for name, (retained, seconds) in results.items():
+        print(f"{name:<10}{retained / 1024 / 1024:>14.1f}{retained / options.members:>15.0f}{seconds:>10.2f}")
+    print(f"\nLean mode keeps {results['default'][0] / max(results['lean'][0], 1):.1f}x less")
+
+
+if __name__ == '__main__':
+    main()
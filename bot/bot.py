@@ -1,25 +1,176 @@
 import os
 import sys
 import io
+import json
+import heapq
+import asyncio
 import threading
 import psycopg2
-from datetime import datetime
+from datetime import datetime, timezone
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True)
 
 from dotenv import load_dotenv
 import discord
-from discord.ext import commands
+from discord import app_commands
+from discord.activity import create_activity
+from discord.ext import commands, tasks
 
 load_dotenv()
 token = os.getenv('DISCORD_BOT_TOKEN')
 db_url = os.getenv('DATABASE_URL')
+# An activity or voice session resumed within this many seconds of ending continues the same row
+session_grace_seconds = int(os.getenv('SESSION_GRACE_SECONDS', '120'))
+# How often the slash command stats cache is reloaded from the database
+stats_refresh_seconds = int(os.getenv('STATS_REFRESH_SECONDS', '300'))
 
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix='!', intents=intents)
+# Lean gateway mode keeps no discord.py member cache, only a compact shadow of what ingestion uses
+lean_mode = os.getenv('BOT_LEAN_MODE', 'False') == 'True'
+# How long cache misses wait to be looked up together, and how many ids go in one lookup
+member_lookup_delay = float(os.getenv('MEMBER_LOOKUP_DELAY', '0.5'))
+MEMBER_LOOKUP_BATCH = 100
+
+def lean_intents():
+    """Only the events ingestion listens to - no typing, reactions, DMs, emoji, invites or moderation"""
+    intents = discord.Intents.none()
+    intents.guilds = True           # channels and their names
+    intents.members = True          # member renames, and query_members for cache misses
+    intents.presences = True        # games and other activities
+    intents.voice_states = True
+    intents.guild_messages = True
+    intents.message_content = True  # message length
+    return intents
+
+if lean_mode:
+    bot = commands.Bot(
+        command_prefix='!',
+        intents=lean_intents(),
+        member_cache_flags=discord.MemberCacheFlags.none(),
+        chunk_guilds_at_startup=False,
+        max_messages=None,
+    )
+else:
+    intents = discord.Intents.all()
+    bot = commands.Bot(command_prefix='!', intents=intents)
+
+# Interning caches: game name -> tracker_game.id, Discord channel id -> tracker_channel.id
+game_ids = {}
+channel_ids = {}
+
+def load_interning_caches():
+    """Preload every known game and channel id so lookups never need a round trip"""
+    try:
+        conn = psycopg2.connect(db_url)
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, id FROM tracker_game")
+        game_ids.update(cursor.fetchall())
+        cursor.execute("SELECT discord_id, id FROM tracker_channel WHERE discord_id IS NOT NULL")
+        channel_ids.update(cursor.fetchall())
+        cursor.close()
+        conn.close()
+        print(f"Interned {len(game_ids)} games, {len(channel_ids)} channels", flush=True)
+    except Exception as e:
+        print(f"DB ERROR (interning): {e}", flush=True)
+
+def get_game_id(conn, cursor, game_name):
+    """Resolve a game name to its id, only touching the DB the first time a name is seen"""
+    game_id = game_ids.get(game_name)
+    if game_id is None:
+        cursor.execute(
+            "INSERT INTO tracker_game (name, created_at) VALUES (%s, NOW()) ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name RETURNING id",
+            (game_name,)
+        )
+        game_id = cursor.fetchone()[0]
+        # Commit before caching so a later rollback can't leave a dangling id in the cache
+        conn.commit()
+        game_ids[game_name] = game_id
+    return game_id
+
+def get_channel_id(conn, cursor, discord_channel_id, channel_name):
+    """Resolve a Discord channel to its id, only touching the DB the first time a channel is seen"""
+    channel_id = channel_ids.get(discord_channel_id)
+    if channel_id is None:
+        # Adopt a backfilled row (known only by name) before creating a new one
+        cursor.execute("""
+            UPDATE tracker_channel SET discord_id = %s
+            WHERE id = (SELECT id FROM tracker_channel WHERE discord_id IS NULL AND name = %s ORDER BY id LIMIT 1)
+              AND NOT EXISTS (SELECT 1 FROM tracker_channel WHERE discord_id = %s)
+            RETURNING id
+        """, (discord_channel_id, channel_name, discord_channel_id))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                "INSERT INTO tracker_channel (discord_id, name, created_at) VALUES (%s, %s, NOW()) ON CONFLICT (discord_id) DO UPDATE SET name = EXCLUDED.name RETURNING id",
+                (discord_channel_id, channel_name)
+            )
+            row = cursor.fetchone()
+        conn.commit()
+        channel_id = row[0]
+        channel_ids[discord_channel_id] = channel_id
+    return channel_id
+
+def rename_channel(discord_channel_id, channel_name):
+    """Channel renames update the single dimension row"""
+    try:
+        conn = psycopg2.connect(db_url)
+        cursor = conn.cursor()
+        cursor.execute("UPDATE tracker_channel SET name = %s WHERE discord_id = %s", (channel_name, discord_channel_id))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        print(f"Channel renamed: {channel_name}", flush=True)
+    except Exception as e:
+        print(f"DB ERROR (channel): {e}", flush=True)
+
+def reopen_session(cursor, table, user_id, **match):
+    """
+    Reopen the user's most recent matching session if it ended within the grace window.
+
+    Sessions that ended before the latest aggregation cutoff are that run's to count as
+    finished and delete, so those are never reopened - a new session starts instead.
+    """
+    conditions = ''.join(f" AND {column} = %s" for column in match)
+    cursor.execute(f"""
+        UPDATE {table} SET ended_at = NULL, duration_seconds = 0
+        WHERE id = (
+            SELECT id FROM {table}
+            WHERE user_id = %s{conditions} AND ended_at IS NOT NULL
+              AND ended_at > NOW() - make_interval(secs => %s)
+              AND ended_at > (SELECT COALESCE(MAX(cutoff), '-infinity') FROM tracker_aggregationrun)
+            ORDER BY ended_at DESC
+            LIMIT 1
+        )
+        RETURNING id
+    """, (user_id, *match.values(), session_grace_seconds))
+    return cursor.fetchone() is not None
+
+# tracker.models.ActivitySession kinds
+ACTIVITY_OTHER, ACTIVITY_GAME, ACTIVITY_LISTENING, ACTIVITY_WATCHING = 0, 1, 2, 3
+ACTIVITY_LABELS = {ACTIVITY_OTHER: 'unknown', ACTIVITY_LISTENING: 'listening', ACTIVITY_WATCHING: 'watching'}
+
+def activity_kind(activity):
+    if isinstance(activity, discord.Game):
+        return ACTIVITY_GAME
+    if hasattr(activity, 'type'):
+        if activity.type == discord.ActivityType.playing:
+            return ACTIVITY_GAME
+        if activity.type == discord.ActivityType.listening:
+            return ACTIVITY_LISTENING
+        if activity.type == discord.ActivityType.watching:
+            return ACTIVITY_WATCHING
+    return ACTIVITY_OTHER
+
+def activity_details(activity):
+    """Rich presence text worth keeping as JSON, or None so plain activities store nothing"""
+    details = {}
+    for key in ('details', 'state', 'title', 'artist'):
+        value = getattr(activity, key, None)
+        if isinstance(value, str) and value:
+            details[key] = value
+    return json.dumps(details) if details else None
 
 def insert_activity(discord_id, username, activities):
-    """Insert activity events AND create/close game sessions"""
+    """Open/close activity sessions - games and other activities share one table"""
     try:
         conn = psycopg2.connect(db_url)
         cursor = conn.cursor()
@@ -35,51 +186,44 @@ def insert_activity(discord_id, username, activities):
         cursor.execute("SELECT id FROM tracker_discorduser WHERE discord_id = %s", (discord_id,))
         user_id = cursor.fetchone()[0]
         
-        # Close old activities AND game sessions
-        cursor.execute(
-            "UPDATE tracker_activityevent SET ended_at = NOW() WHERE user_id = %s AND ended_at IS NULL",
-            (user_id,)
-        )
-        
-        # END GameSessions that match closed ActivityEvents
+        # Resolve what the user is doing now, so anything still running is left open
+        current = []
+        for activity in activities or []:
+            act_name = getattr(activity, 'name', 'Unknown')
+            current.append((activity_kind(activity), act_name, get_game_id(conn, cursor, act_name), activity_details(activity)))
+        current_keys = [f"{kind}:{game_id}" for kind, _, game_id, _ in current]
+
+        # Close the sessions that are no longer present and list the ones still open, in one round trip
         cursor.execute("""
-            UPDATE tracker_gamesession 
-            SET ended_at = NOW(), duration_seconds = EXTRACT(EPOCH FROM (NOW() - started_at))::int
-            WHERE user_id = %s AND ended_at IS NULL
-        """, (user_id,))
-        conn.commit()
+            WITH closed AS (
+                UPDATE tracker_activitysession
+                SET ended_at = NOW(), duration_seconds = EXTRACT(EPOCH FROM (NOW() - started_at))::int
+                WHERE user_id = %s AND ended_at IS NULL AND NOT (kind || ':' || game_id = ANY(%s))
+                RETURNING id
+            )
+            SELECT kind || ':' || game_id FROM tracker_activitysession
+            WHERE user_id = %s AND ended_at IS NULL AND id NOT IN (SELECT id FROM closed)
+        """, (user_id, current_keys, user_id))
+        open_keys = {row[0] for row in cursor.fetchall()}
         
-        # Insert new activities
-        if activities:
-            for activity in activities:
-                act_type = 'unknown'
-                act_name = getattr(activity, 'name', 'Unknown')
-                
-                if isinstance(activity, discord.Game):
-                    act_type = 'game'
-                elif hasattr(activity, 'type'):
-                    if activity.type == discord.ActivityType.playing:
-                        act_type = 'game'
-                    elif activity.type == discord.ActivityType.listening:
-                        act_type = 'listening'
-                    elif activity.type == discord.ActivityType.watching:
-                        act_type = 'watching'
-                
-                # Insert activity event
+        # Continue or create a session for each new activity
+        for kind, act_name, game_id, details in current:
+            key = f"{kind}:{game_id}"
+            if key in open_keys:
+                continue
+            open_keys.add(key)
+            if reopen_session(cursor, 'tracker_activitysession', user_id, kind=kind, game_id=game_id):
+                verb = 'resumed'
+            else:
                 cursor.execute(
-                    "INSERT INTO tracker_activityevent (user_id, activity_type, activity_name, activity_details, started_at) VALUES (%s, %s, %s, %s, NOW())",
-                    (user_id, act_type, act_name, '{}')
+                    "INSERT INTO tracker_activitysession (user_id, game_id, kind, details, started_at, duration_seconds) VALUES (%s, %s, %s, %s, NOW(), 0)",
+                    (user_id, game_id, kind, details)
                 )
-                
-                # If it's a game, also create GameSession
-                if act_type == 'game':
-                    cursor.execute(
-                        "INSERT INTO tracker_gamesession (user_id, game_name, started_at, duration_seconds) VALUES (%s, %s, NOW(), 0)",
-                        (user_id, act_name)
-                    )
-                    print(f"{username} started playing {act_name}", flush=True)
-                else:
-                    print(f"{username}: {act_type} - {act_name}", flush=True)
+                verb = 'started'
+            if kind == ACTIVITY_GAME:
+                print(f"{username} {verb} playing {act_name}", flush=True)
+            else:
+                print(f"{username}: {ACTIVITY_LABELS[kind]} - {act_name}", flush=True)
         
         conn.commit()
         cursor.close()
@@ -88,7 +232,7 @@ def insert_activity(discord_id, username, activities):
     except Exception as e:
         print(f"DB ERROR (activity): {e}", flush=True)
 
-def insert_voice_event(discord_id, username, channel_name, is_join):
+def insert_voice_event(discord_id, username, discord_channel_id, channel_name, is_join):
     """Insert voice session events"""
     try:
         conn = psycopg2.connect(db_url)
@@ -104,21 +248,25 @@ def insert_voice_event(discord_id, username, channel_name, is_join):
         # Get user id
         cursor.execute("SELECT id FROM tracker_discorduser WHERE discord_id = %s", (discord_id,))
         user_id = cursor.fetchone()[0]
+        channel_id = get_channel_id(conn, cursor, discord_channel_id, channel_name)
         
         if is_join:
-            # Create new voice session
-            cursor.execute(
-                "INSERT INTO tracker_voicesession (user_id, channel_name, started_at, duration_seconds) VALUES (%s, %s, NOW(), 0)",
-                (user_id, channel_name)
-            )
-            print(f" {username} joined {channel_name}", flush=True)
+            # Continue a session dropped by a brief reconnect, else create a new one
+            if reopen_session(cursor, 'tracker_voicesession', user_id, channel_id=channel_id):
+                print(f" {username} rejoined {channel_name}", flush=True)
+            else:
+                cursor.execute(
+                    "INSERT INTO tracker_voicesession (user_id, channel_id, started_at, duration_seconds) VALUES (%s, %s, NOW(), 0)",
+                    (user_id, channel_id)
+                )
+                print(f" {username} joined {channel_name}", flush=True)
         else:
             # End current voice session
             cursor.execute("""
                 UPDATE tracker_voicesession 
                 SET ended_at = NOW(), duration_seconds = EXTRACT(EPOCH FROM (NOW() - started_at))::int
-                WHERE user_id = %s AND channel_name = %s AND ended_at IS NULL
-            """, (user_id, channel_name))
+                WHERE user_id = %s AND channel_id = %s AND ended_at IS NULL
+            """, (user_id, channel_id))
             print(f"{username} left {channel_name}", flush=True)
         
         conn.commit()
@@ -128,7 +276,7 @@ def insert_voice_event(discord_id, username, channel_name, is_join):
     except Exception as e:
         print(f"DB ERROR (voice): {e}", flush=True)
 
-def insert_message(discord_id, username, channel_name, message_length):
+def insert_message(discord_id, username, discord_channel_id, channel_name, message_length):
     """Insert message event"""
     try:
         conn = psycopg2.connect(db_url)
@@ -144,11 +292,12 @@ def insert_message(discord_id, username, channel_name, message_length):
         # Get user id
         cursor.execute("SELECT id FROM tracker_discorduser WHERE discord_id = %s", (discord_id,))
         user_id = cursor.fetchone()[0]
+        channel_id = get_channel_id(conn, cursor, discord_channel_id, channel_name)
         
         # Insert message
         cursor.execute(
-            "INSERT INTO tracker_message (user_id, channel_name, message_length, created_at) VALUES (%s, %s, %s, NOW())",
-            (user_id, channel_name, message_length)
+            "INSERT INTO tracker_message (user_id, channel_id, message_length, created_at) VALUES (%s, %s, %s, NOW())",
+            (user_id, channel_id, message_length)
         )
         
         conn.commit()
@@ -158,45 +307,405 @@ def insert_message(discord_id, username, channel_name, message_length):
     except Exception as e:
         print(f"DB ERROR (message): {e}", flush=True)
 
+# Slash command stats cache. Totals hold closed time only and are reloaded in bulk every
+# stats_refresh_seconds; in between, the bot's own events patch them, and running games/voice
+# are added at answer time - so answering a command never touches the database. Only the
+# event loop reads or writes these; the bulk load builds its snapshot on a worker thread.
+STATS_TOP_LIMIT = 10
+# Cutoff of the latest aggregation whose totals are in tracker_userstatistic: session time and
+# messages up to it are already counted there, even while the rows wait to be deleted
+COUNTED_CUTOFF_SQL = "(SELECT COALESCE(MAX(cutoff), '-infinity') FROM tracker_aggregationrun WHERE counted_at IS NOT NULL)"
+user_totals = {}  # Discord user id -> {'username', 'gaming', 'voice', 'messages', 'top_game'}
+game_totals = {}  # game name -> seconds
+now_playing = {}  # Discord user id -> {game name: started_at}
+in_voice = {}     # Discord user id -> (channel name, joined_at)
+stats_loaded_at = None
+
+def load_stats_snapshot():
+    """
+    Every member's and game's totals (cumulative + not yet aggregated) and the open sessions, or None on error.
+
+    Everything is read from one REPEATABLE READ snapshot, so an aggregation committing halfway
+    through can't make a session count in both the statistics and the session tables.
+    """
+    try:
+        conn = psycopg2.connect(db_url)
+        conn.set_session(isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+        cursor = conn.cursor()
+        
+        cursor.execute(f"""
+            WITH counted AS (SELECT {COUNTED_CUTOFF_SQL} AS cutoff)
+            SELECT u.discord_id, u.username,
+                   (COALESCE(s.total_gaming_seconds, 0) + COALESCE(g.seconds, 0))::bigint,
+                   (COALESCE(s.total_voice_seconds, 0) + COALESCE(v.seconds, 0))::bigint,
+                   (COALESCE(s.total_messages, 0) + COALESCE(m.count, 0))::bigint
+            FROM tracker_discorduser u
+            LEFT JOIN tracker_userstatistic s ON s.user_id = u.id
+            LEFT JOIN (
+                SELECT user_id, SUM(EXTRACT(EPOCH FROM ended_at - GREATEST(started_at, counted.cutoff))) AS seconds
+                FROM tracker_activitysession, counted
+                WHERE kind = %s AND ended_at > counted.cutoff GROUP BY user_id
+            ) g ON g.user_id = u.id
+            LEFT JOIN (
+                SELECT user_id, SUM(EXTRACT(EPOCH FROM ended_at - GREATEST(started_at, counted.cutoff))) AS seconds
+                FROM tracker_voicesession, counted
+                WHERE ended_at > counted.cutoff GROUP BY user_id
+            ) v ON v.user_id = u.id
+            LEFT JOIN (
+                SELECT user_id, COUNT(*) AS count FROM tracker_message, counted
+                WHERE created_at > counted.cutoff GROUP BY user_id
+            ) m ON m.user_id = u.id
+        """, (ACTIVITY_GAME,))
+        users = {
+            discord_id: {'username': username, 'gaming': gaming, 'voice': voice, 'messages': messages, 'top_game': None}
+            for discord_id, username, gaming, voice, messages in cursor.fetchall()
+        }
+        
+        # Each member's most played game so far
+        cursor.execute("""
+            SELECT DISTINCT ON (ug.user_id) u.discord_id, g.name
+            FROM tracker_usergamestatistic ug
+            JOIN tracker_discorduser u ON u.id = ug.user_id
+            JOIN tracker_game g ON g.id = ug.game_id
+            ORDER BY ug.user_id, ug.total_seconds DESC
+        """)
+        for discord_id, game_name in cursor.fetchall():
+            if discord_id in users:
+                users[discord_id]['top_game'] = game_name
+        
+        cursor.execute(f"""
+            WITH counted AS (SELECT {COUNTED_CUTOFF_SQL} AS cutoff)
+            SELECT g.name, (COALESCE(gs.total_seconds, 0) + COALESCE(a.seconds, 0))::bigint
+            FROM tracker_game g
+            LEFT JOIN tracker_gamestatistic gs ON gs.game_id = g.id
+            LEFT JOIN (
+                SELECT game_id, SUM(EXTRACT(EPOCH FROM ended_at - GREATEST(started_at, counted.cutoff))) AS seconds
+                FROM tracker_activitysession, counted
+                WHERE kind = %s AND ended_at > counted.cutoff GROUP BY game_id
+            ) a ON a.game_id = g.id
+            WHERE gs.game_id IS NOT NULL OR a.game_id IS NOT NULL
+        """, (ACTIVITY_GAME,))
+        games = dict(cursor.fetchall())
+        
+        # Running time is added from the counted cutoff on - earlier time is in the totals already
+        cursor.execute(f"""
+            SELECT u.discord_id, g.name, GREATEST(s.started_at, {COUNTED_CUTOFF_SQL})
+            FROM tracker_activitysession s
+            JOIN tracker_discorduser u ON u.id = s.user_id
+            JOIN tracker_game g ON g.id = s.game_id
+            WHERE s.kind = %s AND s.ended_at IS NULL
+        """, (ACTIVITY_GAME,))
+        playing = {}
+        for discord_id, game_name, started_at in cursor.fetchall():
+            playing.setdefault(discord_id, {})[game_name] = started_at
+        
+        cursor.execute(f"""
+            SELECT u.discord_id, c.name, GREATEST(v.started_at, {COUNTED_CUTOFF_SQL})
+            FROM tracker_voicesession v
+            JOIN tracker_discorduser u ON u.id = v.user_id
+            JOIN tracker_channel c ON c.id = v.channel_id
+            WHERE v.ended_at IS NULL
+        """)
+        voice = {discord_id: (channel_name, started_at) for discord_id, channel_name, started_at in cursor.fetchall()}
+        
+        cursor.close()
+        conn.close()
+        return users, games, playing, voice
+    except Exception as e:
+        print(f"DB ERROR (stats cache): {e}", flush=True)
+        return None
+
+def apply_stats_snapshot(snapshot):
+    """Swap the cache contents for a fresh snapshot - runs on the event loop, so no command sees half of it"""
+    global stats_loaded_at
+    users, games, playing, voice = snapshot
+    for cache, fresh in ((user_totals, users), (game_totals, games), (now_playing, playing), (in_voice, voice)):
+        cache.clear()
+        cache.update(fresh)
+    stats_loaded_at = datetime.now(timezone.utc)
+
+def elapsed_seconds(since, now):
+    return max((now - since).total_seconds(), 0)
+
+def cached_user(discord_id, username):
+    """The member's cached totals, created empty for members the last reload didn't know"""
+    totals = user_totals.get(discord_id)
+    if totals is None:
+        totals = user_totals[discord_id] = {'username': username, 'gaming': 0, 'voice': 0, 'messages': 0, 'top_game': None}
+    else:
+        totals['username'] = username
+    return totals
+
+def track_presence(discord_id, username, activities):
+    """Start and stop games in the cache; presence repeats (one per shared guild) change nothing"""
+    now = datetime.now(timezone.utc)
+    current = {getattr(activity, 'name', 'Unknown') for activity in activities or [] if activity_kind(activity) == ACTIVITY_GAME}
+    games = now_playing.pop(discord_id, {})
+    if not current and not games:
+        return
+    totals = cached_user(discord_id, username)
+    for game_name in set(games) - current:
+        seconds = elapsed_seconds(games.pop(game_name), now)
+        totals['gaming'] += seconds
+        game_totals[game_name] = game_totals.get(game_name, 0) + seconds
+    for game_name in current - set(games):
+        games[game_name] = now
+    if games:
+        now_playing[discord_id] = games
+
+def track_voice(discord_id, username, channel_name):
+    """Move the member to channel_name (None when they left voice), banking the time in the old channel"""
+    now = datetime.now(timezone.utc)
+    totals = cached_user(discord_id, username)
+    previous = in_voice.pop(discord_id, None)
+    if previous is not None:
+        totals['voice'] += elapsed_seconds(previous[1], now)
+    if channel_name is not None:
+        in_voice[discord_id] = (channel_name, now)
+
+def track_message(discord_id, username):
+    cached_user(discord_id, username)['messages'] += 1
+
+def format_hours(seconds):
+    return f"{seconds / 3600:.1f}h"
+
+def stats_me_text(discord_id):
+    now = datetime.now(timezone.utc)
+    totals = user_totals.get(discord_id)
+    if totals is None:
+        return "No stats for you yet - play something, hop in voice or say hi!"
+    games = now_playing.get(discord_id, {})
+    gaming = totals['gaming'] + sum(elapsed_seconds(started_at, now) for started_at in games.values())
+    voice = totals['voice']
+    if discord_id in in_voice:
+        voice += elapsed_seconds(in_voice[discord_id][1], now)
+    lines = [
+        f"**{totals['username']}**",
+        f"🎮 Gaming: {format_hours(gaming)}",
+        f"🎙️ Voice: {format_hours(voice)}",
+        f"💬 Messages: {totals['messages']:,}",
+    ]
+    if totals['top_game']:
+        lines.append(f"⭐ Most played: {totals['top_game']}")
+    if games:
+        lines.append(f"▶️ Playing now: {', '.join(sorted(games))}")
+    return '\n'.join(lines)
+
+def top_games_text(limit=STATS_TOP_LIMIT):
+    now = datetime.now(timezone.utc)
+    live = dict(game_totals)
+    for games in now_playing.values():
+        for game_name, started_at in games.items():
+            live[game_name] = live.get(game_name, 0) + elapsed_seconds(started_at, now)
+    top = heapq.nlargest(limit, live.items(), key=lambda item: item[1])
+    if not top:
+        return "No games played yet"
+    return '\n'.join(["**Top games**"] + [f"{rank}. {game_name} - {format_hours(seconds)}" for rank, (game_name, seconds) in enumerate(top, 1)])
+
+def top_voice_text(limit=STATS_TOP_LIMIT):
+    now = datetime.now(timezone.utc)
+    top = heapq.nlargest(limit, (
+        (totals['username'], totals['voice'] + (elapsed_seconds(in_voice[discord_id][1], now) if discord_id in in_voice else 0))
+        for discord_id, totals in user_totals.items()
+    ), key=lambda item: item[1])
+    if not top or top[0][1] <= 0:
+        return "Nobody has been in voice yet"
+    return '\n'.join(["**Top voice**"] + [f"{rank}. {username} - {format_hours(seconds)}" for rank, (username, seconds) in enumerate(top, 1) if seconds > 0])
+
+def now_playing_text(limit=STATS_TOP_LIMIT):
+    now = datetime.now(timezone.utc)
+    players = {}
+    for discord_id, games in now_playing.items():
+        username = user_totals[discord_id]['username'] if discord_id in user_totals else str(discord_id)
+        for game_name, started_at in games.items():
+            players.setdefault(game_name, []).append((username, elapsed_seconds(started_at, now)))
+    if not players:
+        return "Nobody is playing anything right now"
+    lines = ["**Now playing**"]
+    for game_name, members in sorted(players.items(), key=lambda item: (-len(item[1]), item[0].lower()))[:limit]:
+        members.sort(key=lambda member: -member[1])
+        names = ', '.join(f"{username} ({format_hours(seconds)})" for username, seconds in members[:limit])
+        if len(members) > limit:
+            names += f" +{len(members) - limit} more"
+        lines.append(f"🎮 **{game_name}** - {names}")
+    return '\n'.join(lines)
+
+class MemberShadow:
+    """The part of a guild member ingestion needs - a few dozen bytes instead of a Member, User and activities"""
+    __slots__ = ('name', 'activities')
+
+    def __init__(self, name, activities=None):
+        self.name = name
+        # Sorted (kind, name) pairs from the last ingested presence; None until one has been ingested
+        self.activities = activities
+
+member_shadows = {}   # Discord user id -> MemberShadow
+member_lookups = {}   # guild id -> {Discord user id: future display name} waiting for the next batch
+
+def user_display_name(user):
+    """str(discord.User) from a raw user payload"""
+    discriminator = user.get('discriminator', '0')
+    return user['username'] if discriminator in ('0', None) else f"{user['username']}#{discriminator}"
+
+def remember_member(user):
+    """Create or rename the shadow for a raw user payload; returns it"""
+    discord_id = int(user['id'])
+    name = user_display_name(user)
+    shadow = member_shadows.get(discord_id)
+    if shadow is None:
+        shadow = member_shadows[discord_id] = MemberShadow(name)
+    else:
+        shadow.name = name
+    return shadow
+
+def lookup_member_name(guild_id, discord_id):
+    """Future display name for an unknown member; misses close together share one query_members request"""
+    loop = asyncio.get_running_loop()
+    waiting = member_lookups.get(guild_id)
+    if waiting is None:
+        waiting = member_lookups[guild_id] = {}
+        loop.call_later(member_lookup_delay, lambda: asyncio.create_task(flush_member_lookups(guild_id)))
+    if discord_id not in waiting:
+        waiting[discord_id] = loop.create_future()
+    return waiting[discord_id]
+
+async def flush_member_lookups(guild_id):
+    """Resolve every waiting miss for the guild, up to MEMBER_LOOKUP_BATCH ids per gateway request"""
+    waiting = member_lookups.pop(guild_id, {})
+    guild = bot.get_guild(guild_id)
+    discord_ids = list(waiting)
+    for start in range(0, len(discord_ids), MEMBER_LOOKUP_BATCH):
+        batch = discord_ids[start:start + MEMBER_LOOKUP_BATCH]
+        names = {}
+        if guild is not None:
+            try:
+                members = await guild.query_members(user_ids=batch, limit=len(batch), cache=False)
+                names = {member.id: str(member) for member in members}
+            except Exception as e:
+                print(f"GATEWAY ERROR (member lookup): {e}", flush=True)
+        for discord_id in batch:
+            waiting[discord_id].set_result(names.get(discord_id))
+
+def activity_keys(activities):
+    return tuple(sorted((activity_kind(activity), getattr(activity, 'name', 'Unknown')) for activity in activities))
+
+def ingest_if_changed(discord_id, shadow, activities):
+    """Ingest the presence unless its activities are the ones already ingested (e.g. an online/idle flip)"""
+    keys = activity_keys(activities)
+    if keys == shadow.activities:
+        return
+    shadow.activities = keys
+    ingest_presence(discord_id, shadow.name, activities)
+
+async def ingest_after_lookup(guild_id, discord_id, activities):
+    name = await lookup_member_name(guild_id, discord_id)
+    if name is None:
+        return  # Left the guild before we could look them up
+    shadow = member_shadows.setdefault(discord_id, MemberShadow(name))
+    ingest_if_changed(discord_id, shadow, activities)
+
+def parse_lean_presence_update(data):
+    """
+    PRESENCE_UPDATE straight from the payload. discord.py drops presences of uncached members,
+    so lean mode parses them itself; the activity objects only live for this one ingestion.
+    """
+    user = data['user']
+    discord_id = int(user['id'])
+    activities = [activity for activity in (create_activity(raw, bot._connection) for raw in data.get('activities') or []) if activity]
+    # Only id is guaranteed - the rest of the user is sent when it changed
+    shadow = remember_member(user) if 'username' in user else member_shadows.get(discord_id)
+    if shadow is None:
+        asyncio.create_task(ingest_after_lookup(int(data['guild_id']), discord_id, activities))
+    else:
+        ingest_if_changed(discord_id, shadow, activities)
+
+def lean_parser(event, after):
+    """Wrap discord.py's parser for event so after(data) also runs on the raw payload"""
+    parse = bot._connection.parsers[event]
+    def parser(data):
+        parse(data)
+        after(data)
+    return parser
+
+def seed_member_shadows(data):
+    """Name every member a GUILD_CREATE carries (online and voice members of large guilds) so they never miss"""
+    if data.get('unavailable') is True:
+        return
+    for member in data.get('members', []):
+        remember_member(member['user'])
+
+def rename_member_shadow(data):
+    if int(data['user']['id']) in member_shadows:
+        remember_member(data['user'])
+
+def install_lean_parsers():
+    parsers = bot._connection.parsers
+    parsers['PRESENCE_UPDATE'] = parse_lean_presence_update
+    parsers['GUILD_CREATE'] = lean_parser('GUILD_CREATE', seed_member_shadows)
+    parsers['GUILD_MEMBER_UPDATE'] = lean_parser('GUILD_MEMBER_UPDATE', rename_member_shadow)
+    parsers['GUILD_MEMBER_REMOVE'] = lean_parser('GUILD_MEMBER_REMOVE', lambda data: member_shadows.pop(int(data['user']['id']), None))
+
+if lean_mode:
+    install_lean_parsers()
+
+@bot.event
+async def setup_hook():
+    refresh_stats_cache.start()
+    await bot.tree.sync()
+
+@tasks.loop(seconds=stats_refresh_seconds)
+async def refresh_stats_cache():
+    snapshot = await asyncio.to_thread(load_stats_snapshot)
+    if snapshot is not None:
+        apply_stats_snapshot(snapshot)
+        print(f"Stats cache: {len(user_totals)} members, {len(game_totals)} games", flush=True)
+
 @bot.event
 async def on_ready():
     print(f"\nBOT READY: {bot.user}\n", flush=True)
+    await asyncio.to_thread(load_interning_caches)
     for guild in bot.guilds:
         print(f"Guild: {guild.name}", flush=True)
         print(f"   Members: {guild.member_count}\n", flush=True)
 
-@bot.event
-async def on_presence_update(before, after):
-    print(f"PRESENCE: {after.name}", flush=True)
+def ingest_presence(discord_id, username, activities):
+    print(f"PRESENCE: {username}", flush=True)
+    track_presence(discord_id, username, activities)
     
     # Run DB operations in separate thread
-    thread = threading.Thread(target=insert_activity, args=(after.id, str(after), after.activities))
+    thread = threading.Thread(target=insert_activity, args=(discord_id, username, activities))
     thread.daemon = True
     thread.start()
 
+@bot.event
+async def on_presence_update(before, after):
+    ingest_presence(after.id, str(after), after.activities)
+
 @bot.event
 async def on_voice_state_update(member, before, after):
     if member.bot:
         return
     
     print(f"VOICE: {member.name}", flush=True)
+    if before.channel != after.channel:
+        track_voice(member.id, str(member), after.channel.name if after.channel else None)
     
     # User joined voice
     if not before.channel and after.channel:
-        thread = threading.Thread(target=insert_voice_event, args=(member.id, str(member), after.channel.name, True))
+        thread = threading.Thread(target=insert_voice_event, args=(member.id, str(member), after.channel.id, after.channel.name, True))
         thread.daemon = True
         thread.start()
     
     # User left voice
     elif before.channel and not after.channel:
-        thread = threading.Thread(target=insert_voice_event, args=(member.id, str(member), before.channel.name, False))
+        thread = threading.Thread(target=insert_voice_event, args=(member.id, str(member), before.channel.id, before.channel.name, False))
         thread.daemon = True
         thread.start()
     
     # User switched channels
     elif before.channel and after.channel and before.channel != after.channel:
-        thread1 = threading.Thread(target=insert_voice_event, args=(member.id, str(member), before.channel.name, False))
-        thread2 = threading.Thread(target=insert_voice_event, args=(member.id, str(member), after.channel.name, True))
+        thread1 = threading.Thread(target=insert_voice_event, args=(member.id, str(member), before.channel.id, before.channel.name, False))
+        thread2 = threading.Thread(target=insert_voice_event, args=(member.id, str(member), after.channel.id, after.channel.name, True))
         thread1.daemon = True
         thread2.daemon = True
         thread1.start()
@@ -207,9 +716,48 @@ async def on_message(message):
     if message.author.bot:
         return
     
-    thread = threading.Thread(target=insert_message, args=(message.author.id, str(message.author), message.channel.name, len(message.content)))
+    track_message(message.author.id, str(message.author))
+    thread = threading.Thread(target=insert_message, args=(message.author.id, str(message.author), message.channel.id, message.channel.name, len(message.content)))
     thread.daemon = True
     thread.start()
 
-print("\n🚀 STARTING BOT...\n", flush=True)
-bot.run(token)
+@bot.event
+async def on_guild_channel_update(before, after):
+    if before.name == after.name:
+        return
+    
+    thread = threading.Thread(target=rename_channel, args=(after.id, after.name))
+    thread.daemon = True
+    thread.start()
+
+async def answer_from_cache(interaction, text, ephemeral=False):
+    if stats_loaded_at is None:
+        await interaction.response.send_message("Stats are still loading - try again in a moment", ephemeral=True)
+    else:
+        await interaction.response.send_message(text, ephemeral=ephemeral)
+
+stats_group = app_commands.Group(name='stats', description='Your tracked stats')
+top_group = app_commands.Group(name='top', description='Server leaderboards')
+
+@stats_group.command(name='me', description='Your gaming, voice and message totals')
+async def stats_me(interaction: discord.Interaction):
+    await answer_from_cache(interaction, stats_me_text(interaction.user.id), ephemeral=True)
+
+@top_group.command(name='games', description='Most played games')
+async def top_games(interaction: discord.Interaction):
+    await answer_from_cache(interaction, top_games_text())
+
+@top_group.command(name='voice', description='Most time spent in voice')
+async def top_voice(interaction: discord.Interaction):
+    await answer_from_cache(interaction, top_voice_text())
+
+@bot.tree.command(name='nowplaying', description='Who is playing what right now')
+async def nowplaying(interaction: discord.Interaction):
+    await answer_from_cache(interaction, now_playing_text())
+
+bot.tree.add_command(stats_group)
+bot.tree.add_command(top_group)
+
+if __name__ == '__main__':
+    print(f"\n🚀 STARTING BOT{' (lean mode)' if lean_mode else ''}...\n", flush=True)
+    bot.run(token)